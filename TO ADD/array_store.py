@@ -0,0 +1,151 @@
+"""Directories of memory-mapped NumPy arrays shared by worker processes.
+
+A store is a directory with one ``.npy`` file per array and a
+``manifest.json`` listing the arrays (file, dtype, shape) next to free-form
+JSON metadata. ``load_arrays`` maps every file read-only, so all processes
+reading a store share the same page-cache pages: adding workers does not add
+copies, and a new worker reads warm pages instead of rebuilding the arrays.
+
+The store path is a symlink to a version directory in a hidden
+``.<name>.versions`` directory next to it. ``save_arrays`` writes a complete
+new version and swaps the link with ``os.replace``, which is atomic, and
+``load_arrays`` resolves the link once, so a reader sees one whole version:
+never a half-written one, nor a manifest of one version with the arrays of
+another. The version before the current one is kept for readers that
+resolved the link just before a swap; older ones are deleted. Processes
+that mapped their files keep reading them until they reload.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+# Age after which a version still missing its manifest is taken as abandoned
+ABANDONED_VERSION_SECONDS = 3600.0
+
+
+def save_arrays(
+  directory: Path | str, arrays: dict[str, np.ndarray], metadata: dict[str, Any] | None = None
+) -> Path:
+  """Write arrays and metadata to a new store version and switch the store to it.
+
+  Args:
+      directory: Store path, a symlink to the current version
+      arrays: Arrays by name; names become file names
+      metadata: JSON-serializable information kept in the manifest
+
+  Returns:
+      Path of the store directory
+
+  """
+  directory = Path(directory)
+  versions = _versions_directory(directory)
+  versions.mkdir(parents=True, exist_ok=True)
+  # Unique per writer, ordered by time
+  writer = f"{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex[:8]}"
+  partial = versions / f"{time.time_ns():020d}-{writer}"
+  partial.mkdir()
+
+  try:
+    manifest = {"format_version": FORMAT_VERSION, "arrays": {}, "metadata": metadata or {}}
+    for name, array in arrays.items():
+      array = np.ascontiguousarray(array)
+      np.save(partial / f"{name}.npy", array, allow_pickle=False)
+      manifest["arrays"][name] = {
+        "file": f"{name}.npy",
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+      }
+    # The manifest goes last: a version without one is never linked
+    with open(partial / MANIFEST_NAME, "w") as f:
+      json.dump(manifest, f)
+  except BaseException:
+    shutil.rmtree(partial, ignore_errors=True)
+    raise
+
+  previous = _linked_version(directory)
+  if directory.exists() and not directory.is_symlink():
+    # A store written before versioning: replaced once, without the atomic swap
+    shutil.rmtree(directory)
+  link = directory.with_name(f".{directory.name}.{writer}.link")
+  os.symlink(Path(versions.name) / partial.name, link, target_is_directory=True)
+  os.replace(link, directory)
+
+  # Delete older versions, except the one just replaced and any another writer
+  # has linked since; versions without a manifest may still be being written
+  keep = {partial.name, previous, _linked_version(directory)}
+  abandoned_before = time.time() - ABANDONED_VERSION_SECONDS
+  for version in versions.iterdir():
+    if version.name in keep or version.name > partial.name:
+      continue
+    if (version / MANIFEST_NAME).exists() or version.stat().st_mtime < abandoned_before:
+      shutil.rmtree(version, ignore_errors=True)
+  return directory
+
+
+def _versions_directory(directory: Path) -> Path:
+  """Directory holding the versions of a store."""
+  return directory.with_name(f".{directory.name}.versions")
+
+
+def _linked_version(directory: Path) -> str | None:
+  """Name of the version a store path links to, None if it is not a link."""
+  if not directory.is_symlink():
+    return None
+  return Path(os.readlink(directory)).name
+
+
+def read_manifest(directory: Path | str) -> dict[str, Any] | None:
+  """Read a store's manifest, or None if there is no complete store."""
+  path = Path(directory) / MANIFEST_NAME
+  if not path.exists():
+    return None
+  with open(path) as f:
+    manifest = json.load(f)
+  if manifest.get("format_version") != FORMAT_VERSION:
+    return None
+  return manifest
+
+
+def load_arrays(
+  directory: Path | str, mmap_mode: str | None = "r"
+) -> tuple[dict[str, np.ndarray], dict[str, Any]]:
+  """Map every array of a store.
+
+  Args:
+      directory: Store directory
+      mmap_mode: Mode passed to ``np.load``, None to read the arrays into memory
+
+  Returns:
+      Tuple of (arrays by name, metadata)
+
+  Raises:
+      FileNotFoundError: If the directory holds no complete store
+      ValueError: If an array file does not match the manifest
+
+  """
+  # Every file comes from the version current when the link is resolved
+  directory = Path(directory).resolve()
+  manifest = read_manifest(directory)
+  if manifest is None:
+    raise FileNotFoundError(f"No array store at {directory}")
+
+  arrays = {}
+  for name, entry in manifest["arrays"].items():
+    # Empty arrays cannot be mapped
+    mode = mmap_mode if np.prod(entry["shape"]) > 0 else None
+    array = np.load(directory / entry["file"], mmap_mode=mode, allow_pickle=False)
+    if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+      raise ValueError(f"Array {name} in {directory} does not match its manifest")
+    arrays[name] = array
+  return arrays, manifest["metadata"]
@@ -0,0 +1,320 @@
+"""Array-backed city graphs for the optimizer hot path.
+
+``CompiledCityGraph`` is built once from a city's NetworkX graph (as produced by
+``graph_builder.build_city_graphs``) and stores the same information as flat
+NumPy arrays:
+- a node id <-> index map, with indices in graph node order
+- CSR adjacency (indptr, indices), destinations sorted within each row
+- per-edge hourly trips, travel times and fares, shape (n_edges, 24), with the
+  ``avg_time`` / ``avg_price`` fallbacks already resolved for hours without trips
+- outgoing demand per node and hour, shape (24, n_nodes)
+
+Lookups become array indexing instead of nested dict access and hashing.
+``save_compiled_graphs`` / ``load_compiled_graphs`` keep the arrays of every
+city in a memory-mapped ``array_store`` directory shared by worker processes.
+"""
+
+import hashlib
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import networkx as nx
+import numpy as np
+
+from app.array_store import load_arrays, save_arrays
+
+HOURS_PER_DAY = 24
+
+# Arrays saved per city, including the derived ones to skip recomputing them
+ARRAY_NAMES = (
+  "indptr",
+  "indices",
+  "hourly_trips",
+  "hourly_time",
+  "hourly_fare",
+  "lat",
+  "lon",
+  "sources",
+  "out_demand",
+)
+
+
+class CompiledCityGraph:
+  """Immutable CSR representation of one city graph."""
+
+  def __init__(
+    self,
+    nodes: list[str],
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    hourly_trips: np.ndarray,
+    hourly_time: np.ndarray,
+    hourly_fare: np.ndarray,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    sources: np.ndarray | None = None,
+    out_demand: np.ndarray | None = None,
+  ):
+    """Wrap prebuilt arrays; use ``from_graph`` to compile a NetworkX graph.
+
+    Args:
+        nodes: Cluster IDs in index order
+        indptr: CSR row pointers, shape (n_nodes + 1,)
+        indices: CSR destination indices, shape (n_edges,)
+        hourly_trips: Trip counts per edge and hour, shape (n_edges, 24)
+        hourly_time: Average travel minutes per edge and hour, shape (n_edges, 24)
+        hourly_fare: Average fare per edge and hour, shape (n_edges, 24)
+        lat: Node latitudes, shape (n_nodes,)
+        lon: Node longitudes, shape (n_nodes,)
+        sources: Row index of every edge, derived from indptr if None
+        out_demand: Outgoing trips per hour and node, derived from hourly_trips if None
+
+    """
+    self.nodes = nodes
+    self.node_index = {node: k for k, node in enumerate(nodes)}
+    self.indptr = indptr
+    self.indices = indices
+    self.hourly_trips = hourly_trips
+    self.hourly_time = hourly_time
+    self.hourly_fare = hourly_fare
+    self.lat = lat
+    self.lon = lon
+
+    # Row index of every edge, and outgoing trips per (hour, node)
+    if sources is None:
+      sources = np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(indptr))
+    self.sources = sources
+    if out_demand is None:
+      out_demand = np.zeros((HOURS_PER_DAY, self.n_nodes))
+      np.add.at(out_demand.T, sources, hourly_trips.astype(np.float64))
+    self.out_demand = out_demand
+
+  @classmethod
+  def from_graph(cls, graph: nx.DiGraph) -> "CompiledCityGraph":
+    """Compile a city graph built by ``graph_builder.build_city_graphs``.
+
+    Args:
+        graph: NetworkX graph for the city
+
+    Returns:
+        Compiled graph with node indices in ``graph.nodes()`` order
+
+    """
+    nodes = list(graph.nodes())
+    node_index = {node: k for k, node in enumerate(nodes)}
+    n_nodes = len(nodes)
+
+    edges = sorted(
+      (node_index[u], node_index[v], data) for u, v, data in graph.edges(data=True)
+    )
+    n_edges = len(edges)
+
+    indptr = np.zeros(n_nodes + 1, dtype=np.int32)
+    indices = np.empty(n_edges, dtype=np.int32)
+    hourly_trips = np.zeros((n_edges, HOURS_PER_DAY), dtype=np.float32)
+    hourly_time = np.empty((n_edges, HOURS_PER_DAY))
+    hourly_fare = np.empty((n_edges, HOURS_PER_DAY))
+
+    for e, (i, j, data) in enumerate(edges):
+      indptr[i + 1] += 1
+      indices[e] = j
+      _fill_edge(data, hourly_trips[e], hourly_time[e], hourly_fare[e])
+    np.cumsum(indptr, out=indptr)
+
+    lat = np.array([float(graph.nodes[node].get("lat", 0.0)) for node in nodes])
+    lon = np.array([float(graph.nodes[node].get("lon", 0.0)) for node in nodes])
+
+    return cls(nodes, indptr, indices, hourly_trips, hourly_time, hourly_fare, lat, lon)
+
+  def with_updates(
+    self, graph: nx.DiGraph, edges: Iterable[tuple[str, str]]
+  ) -> "CompiledCityGraph":
+    """Copy of the compiled graph with some edges re-read from the NetworkX graph.
+
+    Only the rows of the given edges, the positions of their end nodes and
+    the outgoing demand are updated; the arrays are copied first, since they
+    may be shared read-only memory maps. An edge or node the compiled graph
+    does not have yet changes the CSR structure, so the whole graph is
+    recompiled instead.
+
+    Args:
+        graph: NetworkX graph for the city, already holding the new statistics
+        edges: (pickup cluster, dropoff cluster) pairs whose statistics changed
+
+    Returns:
+        New compiled graph; this one is left unchanged
+
+    """
+    edges = list(edges)
+    edge_ids = []
+    for u, v in edges:
+      i, j = self.node_index.get(u), self.node_index.get(v)
+      e = -1 if i is None or j is None else self.edge_id(i, j)
+      if e < 0:
+        return CompiledCityGraph.from_graph(graph)
+      edge_ids.append(e)
+
+    hourly_trips = np.array(self.hourly_trips)
+    hourly_time = np.array(self.hourly_time)
+    hourly_fare = np.array(self.hourly_fare)
+    lat, lon = np.array(self.lat), np.array(self.lon)
+    for (u, v), e in zip(edges, edge_ids, strict=True):
+      hourly_trips[e] = 0
+      _fill_edge(graph.edges[u, v], hourly_trips[e], hourly_time[e], hourly_fare[e])
+      for node in (u, v):
+        lat[self.node_index[node]] = float(graph.nodes[node].get("lat", 0.0))
+        lon[self.node_index[node]] = float(graph.nodes[node].get("lon", 0.0))
+
+    return CompiledCityGraph(
+      self.nodes,
+      self.indptr,
+      self.indices,
+      hourly_trips,
+      hourly_time,
+      hourly_fare,
+      lat,
+      lon,
+      sources=self.sources,
+    )
+
+  def to_arrays(self) -> dict[str, np.ndarray]:
+    """Get the arrays that ``from_arrays`` rebuilds the graph from, by name."""
+    return {name: getattr(self, name) for name in ARRAY_NAMES}
+
+  @classmethod
+  def from_arrays(cls, nodes: list[str], arrays: dict[str, np.ndarray]) -> "CompiledCityGraph":
+    """Wrap arrays saved by ``to_arrays``, possibly read-only memory maps.
+
+    Args:
+        nodes: Cluster IDs in index order
+        arrays: Arrays by name, as returned by ``to_arrays``
+
+    Returns:
+        Compiled graph using the arrays without copying them
+
+    """
+    return cls(nodes, **{name: arrays[name] for name in ARRAY_NAMES})
+
+  @property
+  def n_nodes(self) -> int:
+    """Number of clusters in the city."""
+    return len(self.nodes)
+
+  @property
+  def n_edges(self) -> int:
+    """Number of directed edges, self-edges included."""
+    return len(self.indices)
+
+  def fingerprint(self) -> str:
+    """Content hash of the graph, changing whenever any node or edge statistic does."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update("\x00".join(map(str, self.nodes)).encode())
+    for array in (self.indptr, self.indices, self.hourly_trips, self.hourly_time, self.hourly_fare):
+      digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+  def edge_range(self, i: int) -> slice:
+    """Slice of edge ids leaving node index i."""
+    return slice(int(self.indptr[i]), int(self.indptr[i + 1]))
+
+  def edge_id(self, i: int, j: int) -> int:
+    """Get the edge id of i->j, or -1 if there is no such edge."""
+    start, end = int(self.indptr[i]), int(self.indptr[i + 1])
+    k = start + int(np.searchsorted(self.indices[start:end], j))
+    if k < end and self.indices[k] == j:
+      return k
+    return -1
+
+  def adjacency(self) -> np.ndarray:
+    """Dense boolean adjacency matrix, shape (n_nodes, n_nodes)."""
+    dense = np.zeros((self.n_nodes, self.n_nodes), dtype=bool)
+    dense[self.sources, self.indices] = True
+    return dense
+
+  def to_dense(self, edge_values: np.ndarray, fill: float = 0.0) -> np.ndarray:
+    """Scatter per-edge hourly values into a dense (24, n_nodes, n_nodes) array.
+
+    Args:
+        edge_values: Per-edge values, shape (n_edges, 24)
+        fill: Value for node pairs without an edge
+
+    Returns:
+        Dense hour-indexed array
+
+    """
+    dense = np.full((HOURS_PER_DAY, self.n_nodes, self.n_nodes), fill)
+    dense[:, self.sources, self.indices] = edge_values.T
+    return dense
+
+
+def _fill_edge(
+  data: dict[str, Any], trips: np.ndarray, minutes: np.ndarray, fares: np.ndarray
+) -> None:
+  """Write one edge's hourly rows from its graph attributes.
+
+  Hours without trips keep the edge's overall ``avg_time`` / ``avg_price``.
+  ``trips`` must be zeroed beforehand.
+  """
+  minutes[:] = data.get("avg_time", 0)
+  fares[:] = data.get("avg_price", 0)
+  for hour, count in data.get("hourly_trips", {}).items():
+    trips[hour] = count
+  for hour, value in data.get("hourly_avg_time", {}).items():
+    minutes[hour] = value
+  for hour, fare in data.get("hourly_avg_price", {}).items():
+    fares[hour] = fare
+
+
+def save_compiled_graphs(
+  directory: Path | str, compiled: dict[int, CompiledCityGraph], source: str
+) -> Path:
+  """Write the arrays of every city to a memory-mappable store.
+
+  Args:
+      directory: Store directory
+      compiled: Compiled graph per city
+      source: Signature of the graphs the arrays were compiled from
+
+  Returns:
+      Path of the store directory
+
+  """
+  arrays = {
+    f"{city_id}.{name}": array
+    for city_id, graph in compiled.items()
+    for name, array in graph.to_arrays().items()
+  }
+  metadata: dict[str, Any] = {
+    "source": source,
+    "nodes": {str(city_id): list(graph.nodes) for city_id, graph in compiled.items()},
+  }
+  return save_arrays(directory, arrays, metadata)
+
+
+def load_compiled_graphs(
+  directory: Path | str, source: str
+) -> dict[int, CompiledCityGraph] | None:
+  """Map the compiled graphs of a store, if it was built from the given graphs.
+
+  Args:
+      directory: Store directory
+      source: Signature of the current graphs
+
+  Returns:
+      Compiled graph per city backed by read-only memory maps, or None if
+      there is no store or it was built from other graphs
+
+  """
+  try:
+    arrays, metadata = load_arrays(directory)
+  except FileNotFoundError:
+    return None
+  if metadata.get("source") != source:
+    return None
+  return {
+    int(city_id): CompiledCityGraph.from_arrays(
+      nodes, {name: arrays[f"{city_id}.{name}"] for name in ARRAY_NAMES}
+    )
+    for city_id, nodes in metadata["nodes"].items()
+  }
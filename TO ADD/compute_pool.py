@@ -0,0 +1,226 @@
+"""Process pool tier for CPU-bound optimizer work.
+
+A DP solve holds the GIL for most of its run, so calling it from a coroutine
+stalls every other request on the uvicorn worker. ``OptimizerPool`` runs
+``MobilityOptimizer`` methods in worker processes instead:
+- each worker loads the city dataset and the nightly precomputed
+  recommendations once, in the pool initializer, and compiles every city's
+  DP engine before taking work; calls name the optimizer parameters they
+  need and are served from the worker's registry
+- calls carry the city's current surge, so workers follow live updates
+- calls carry the caller's data version of the city; a worker whose graph
+  differs, because the caller has published completed trips since the
+  workers loaded theirs, refuses the call with ``WorkerGraphMismatchError``
+- at most ``max_pending`` calls are queued or running; further callers wait
+  for a slot (backpressure) and fail with ``ComputePoolBusyError`` if none
+  frees up within ``queue_timeout_seconds``
+- each call is bounded by ``timeout_seconds``
+"""
+
+import asyncio
+import multiprocessing
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+# Set in each worker by the pool initializer; held by every worker during warm-up
+_startup_barrier = None
+
+
+class ComputePoolBusyError(RuntimeError):
+  """Raised when no submission slot frees up in time."""
+
+
+class WorkerGraphMismatchError(RuntimeError):
+  """Raised when a worker's city graph is not the one the caller solves on."""
+
+
+def _init_worker(
+  optimizer_kwargs: dict[str, Any], barrier, setup: Callable[[], None] | None
+) -> None:
+  """Load the dataset of a worker process and warm one optimizer."""
+  from app.dynamic_programming_optimizer import get_optimizer, load_recommendations
+
+  global _startup_barrier
+  _startup_barrier = barrier
+  if setup is not None:
+    setup()
+  load_recommendations()
+  optimizer = get_optimizer(**optimizer_kwargs)
+  for city_id in optimizer.graphs:
+    optimizer._get_engine(city_id)
+
+
+def _worker_ready() -> int:
+  """Return once every worker's initializer has run.
+
+  Each call holds its worker at the barrier until all workers hold one, so
+  the warm-up calls cannot all be served by the first worker to start.
+  """
+  _startup_barrier.wait()
+  return os.getpid()
+
+
+def _call_optimizer(
+  optimizer_kwargs: dict[str, Any],
+  method: str,
+  args: tuple,
+  kwargs: dict[str, Any],
+  surge: tuple[int, dict[int, float]] | None,
+  data_version: tuple[int, str] | None,
+) -> Any:
+  """Run one optimizer method in a worker process."""
+  from app.dynamic_programming_optimizer import get_optimizer
+
+  optimizer = get_optimizer(**optimizer_kwargs)
+  if data_version is not None:
+    city_id, version = data_version
+    if optimizer._data_version(city_id) != version:
+      raise WorkerGraphMismatchError(
+        f"Worker graph of city {city_id} is not at data version {version}"
+      )
+  if surge is not None:
+    city_id, surge_by_hour = surge
+    optimizer.dataset.update_surge(city_id, surge_by_hour)
+  return getattr(optimizer, method)(*args, **kwargs)
+
+
+class OptimizerPool:
+  """Bounded, pre-warmed process pool running optimizer methods."""
+
+  def __init__(
+    self,
+    optimizer_kwargs: dict[str, Any],
+    max_workers: int | None = None,
+    max_pending: int = 64,
+    timeout_seconds: float | None = 30.0,
+    queue_timeout_seconds: float | None = 5.0,
+    worker_setup: Callable[[], None] | None = None,
+  ):
+    """Configure the pool; call ``start`` to launch the workers.
+
+    Args:
+        optimizer_kwargs: ``MobilityOptimizer`` arguments of the optimizer
+          warmed in each worker
+        max_workers: Number of worker processes, one per CPU if None
+        max_pending: Most calls queued or running at once
+        timeout_seconds: Longest a call may take, no limit if None
+        queue_timeout_seconds: Longest a call waits for a submission slot,
+          no limit if None
+        worker_setup: Module-level function each worker runs before loading
+          its dataset, e.g. to serve other data than the ride CSV
+
+    """
+    self.optimizer_kwargs = optimizer_kwargs
+    self.max_workers = max_workers or os.cpu_count() or 1
+    self.max_pending = max_pending
+    self.timeout_seconds = timeout_seconds
+    self.queue_timeout_seconds = queue_timeout_seconds
+    self.worker_setup = worker_setup
+
+    self._executor: ProcessPoolExecutor | None = None
+    self._slots = asyncio.Semaphore(max_pending)
+    self.pending = 0
+    self.completed = 0
+    self.timeouts = 0
+    self.rejected = 0
+
+  @property
+  def running(self) -> bool:
+    """Whether the workers have been started."""
+    return self._executor is not None
+
+  async def start(self) -> None:
+    """Launch the workers and wait until each has loaded its optimizer."""
+    if self._executor is not None:
+      return
+
+    # Forking a process that runs an event loop and threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    self._executor = ProcessPoolExecutor(
+      max_workers=self.max_workers,
+      mp_context=context,
+      initializer=_init_worker,
+      initargs=(self.optimizer_kwargs, context.Barrier(self.max_workers), self.worker_setup),
+    )
+    loop = asyncio.get_running_loop()
+    ready = [
+      loop.run_in_executor(self._executor, _worker_ready) for _ in range(self.max_workers)
+    ]
+    await asyncio.gather(*ready)
+    print(f"✓ Optimizer pool ready ({self.max_workers} workers)")
+
+  async def run(
+    self,
+    optimizer_kwargs: dict[str, Any],
+    method: str,
+    args: tuple = (),
+    kwargs: dict[str, Any] | None = None,
+    surge: tuple[int, dict[int, float]] | None = None,
+    data_version: tuple[int, str] | None = None,
+  ) -> Any:
+    """Run a ``MobilityOptimizer`` method in a worker process.
+
+    Args:
+        optimizer_kwargs: ``MobilityOptimizer`` arguments selecting the optimizer
+        method: Name of the optimizer method
+        args: Positional arguments, must be picklable
+        kwargs: Keyword arguments, must be picklable
+        surge: (city_id, surge multiplier per hour) to apply before the call
+        data_version: (city_id, data version) the worker's graph must match
+
+    Returns:
+        The method's return value
+
+    Raises:
+        ComputePoolBusyError: If no submission slot frees up in time
+        TimeoutError: If the call takes longer than ``timeout_seconds``
+        WorkerGraphMismatchError: If the worker's graph is not at ``data_version``
+
+    """
+    if self._executor is None:
+      raise RuntimeError("Optimizer pool is not started")
+
+    try:
+      await asyncio.wait_for(self._slots.acquire(), self.queue_timeout_seconds)
+    except TimeoutError:
+      self.rejected += 1
+      raise ComputePoolBusyError(
+        f"Optimizer pool busy: {self.max_pending} calls already pending"
+      ) from None
+
+    self.pending += 1
+    try:
+      future = self._executor.submit(
+        _call_optimizer, optimizer_kwargs, method, args, kwargs or {}, surge, data_version
+      )
+      try:
+        result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+      except TimeoutError:
+        # A call already running keeps its worker until it finishes
+        future.cancel()
+        self.timeouts += 1
+        raise
+      self.completed += 1
+      return result
+    finally:
+      self.pending -= 1
+      self._slots.release()
+
+  def stats(self) -> dict[str, Any]:
+    """Report pool size, load and outcome counters."""
+    return {
+      "workers": self.max_workers,
+      "max_pending": self.max_pending,
+      "pending": self.pending,
+      "completed": self.completed,
+      "timeouts": self.timeouts,
+      "rejected": self.rejected,
+    }
+
+  def shutdown(self, wait: bool = True) -> None:
+    """Stop the workers, cancelling calls that have not started."""
+    if self._executor is not None:
+      self._executor.shutdown(wait=wait, cancel_futures=True)
+      self._executor = None
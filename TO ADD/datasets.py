@@ -0,0 +1,303 @@
+"""Lazily loaded input tables, read once per process on first use.
+
+Importing the optimizer or the API must not parse any CSV: with a warm graph
+cache the ride table is never needed. Each ``get_*`` function reads its data
+on the first call and returns the same DataFrame afterwards; callers must
+not modify it. ``loaded_datasets`` reports what a process has read, which
+the startup benchmark (``startup_bench.py``) checks.
+
+The ride CSV is converted once into a columnar typed store, an
+``array_store`` directory next to the graph cache:
+- text columns become categoricals (codes plus categories); pickup and
+  dropoff clusters, and pickup and dropoff hexagons, share their categories
+- timestamps become int64 nanoseconds since the epoch
+- the hour of ``start_time`` is precomputed as ``hour``
+Later loads memory-map the store and only touch the columns they ask for.
+The store is rebuilt whenever the CSV changes.
+
+``iter_rides`` streams the rides in chunks instead, from the store if it is
+up to date and from the CSV otherwise, for histories too large to load.
+"""
+
+import threading
+from collections.abc import Callable, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from app.array_store import load_arrays, read_manifest, save_arrays
+
+RIDES_CSV_PATH = "/workspace/server/data/ride_trips_with_clusters.csv"
+SURGE_CSV_PATH = "data/surge_by_hour.csv"
+RIDES_STORE_PATH = Path(__file__).parent.parent / "data" / "cache" / "rides"
+# Rides per chunk when streaming
+RIDE_CHUNK_ROWS = 1_000_000
+
+# Ride columns parsed as timestamps
+RIDE_TIMESTAMP_COLUMNS = ("start_time", "end_time")
+# Ride columns sharing one set of categories, so that their codes compare
+RIDE_CATEGORY_GROUPS = (("pickup_cluster", "dropoff_cluster"), ("pickup_hex_id9", "drop_hex_id9"))
+
+# (dataset name, path) -> loaded DataFrame
+_datasets: dict[tuple[str, str], pd.DataFrame] = {}
+# Held while loading, so concurrent first uses parse a file only once
+_datasets_lock = threading.Lock()
+
+
+def _get(name: str, path: str, load: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+  """Get a dataset, loading it on first use."""
+  key = (name, str(path))
+  with _datasets_lock:
+    if key not in _datasets:
+      print(f"Loading {name} from {path}...")
+      _datasets[key] = load(path)
+    return _datasets[key]
+
+
+def _file_signature(path: Path | str) -> str:
+  """Identify a version of a file by its path, size and modification time."""
+  stat = Path(path).stat()
+  return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _typed_rides(rides: pd.DataFrame) -> pd.DataFrame:
+  """Convert raw ride columns to categoricals, timestamps and the start hour.
+
+  Args:
+      rides: Ride table as read from the CSV, any subset of its columns
+
+  Returns:
+      Typed ride table, with an ``hour`` column if ``start_time`` is present
+
+  """
+  typed: dict[str, Any] = dict(rides.items())
+  for name in RIDE_TIMESTAMP_COLUMNS:
+    if name in typed:
+      typed[name] = pd.to_datetime(typed[name]).astype("datetime64[ns]")
+
+  for group in RIDE_CATEGORY_GROUPS:
+    present = [name for name in group if name in typed]
+    if present:
+      values = pd.concat([typed[name] for name in present], ignore_index=True).dropna()
+      categories = pd.Index(values.unique()).sort_values()
+      for name in present:
+        typed[name] = typed[name].astype(pd.CategoricalDtype(categories))
+  for name, column in list(typed.items()):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+      continue
+    if pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column):
+      typed[name] = column.astype("category")
+
+  if "start_time" in typed:
+    hour = typed["start_time"].dt.hour
+    typed["hour"] = hour if hour.isna().any() else hour.astype(np.int8)
+  return pd.DataFrame(typed)
+
+
+def _csv_columns(columns: Sequence[str] | None) -> set[str] | None:
+  """CSV columns to read for the given typed columns, all if None."""
+  if columns is None:
+    return None
+  usecols = {name for name in columns if name != "hour"}
+  if "hour" in columns:
+    usecols.add("start_time")
+  return usecols
+
+
+def read_rides_csv(
+  csv_path: str = RIDES_CSV_PATH, columns: Sequence[str] | None = None
+) -> pd.DataFrame:
+  """Parse the ride CSV into a typed table, without using the columnar store.
+
+  Args:
+      csv_path: Ride CSV
+      columns: Columns to return, ``hour`` included, all if None
+
+  Returns:
+      Typed ride table
+
+  """
+  rides = _typed_rides(pd.read_csv(csv_path, usecols=_csv_columns(columns)))
+  return rides if columns is None else rides[list(columns)]
+
+
+def ingest_rides(csv_path: str = RIDES_CSV_PATH, store_path: Path | str = RIDES_STORE_PATH) -> Path:
+  """Convert the ride CSV into the columnar typed store.
+
+  Args:
+      csv_path: Ride CSV
+      store_path: Store directory, replaced atomically
+
+  Returns:
+      Path of the store directory
+
+  """
+  rides = read_rides_csv(csv_path)
+  arrays: dict[str, np.ndarray] = {}
+  kinds: dict[str, str] = {}
+  for name, column in rides.items():
+    if isinstance(column.dtype, pd.CategoricalDtype):
+      arrays[f"{name}.codes"] = column.cat.codes.to_numpy()
+      arrays[f"{name}.categories"] = np.array(column.cat.categories.tolist(), dtype=str)
+      kinds[name] = "categorical"
+    elif name in RIDE_TIMESTAMP_COLUMNS:
+      arrays[name] = column.to_numpy().view(np.int64)
+      kinds[name] = "timestamp"
+    else:
+      arrays[name] = column.to_numpy()
+      kinds[name] = "numeric"
+  metadata = {"source": _file_signature(csv_path), "rows": len(rides), "columns": kinds}
+  return save_arrays(store_path, arrays, metadata)
+
+
+def load_ride_store(
+  columns: Sequence[str] | None = None, store_path: Path | str = RIDES_STORE_PATH
+) -> pd.DataFrame:
+  """Read columns of the ride store from memory-mapped arrays.
+
+  Args:
+      columns: Columns to return, all if None
+      store_path: Store directory
+
+  Returns:
+      Typed ride table, numeric and timestamp columns backed by the mapped files
+
+  Raises:
+      FileNotFoundError: If there is no ride store
+      ValueError: If a column is not in the store
+
+  """
+  arrays, metadata = load_arrays(store_path)
+  kinds = metadata["columns"]
+  missing = [name for name in columns or () if name not in kinds]
+  if missing:
+    raise ValueError(f"Columns {missing} not in the ride store at {store_path}")
+
+  data = {}
+  for name in columns or kinds:
+    if kinds[name] == "categorical":
+      categories = pd.Index(arrays[f"{name}.categories"].tolist(), dtype=object)
+      data[name] = pd.Categorical.from_codes(arrays[f"{name}.codes"], categories=categories)
+    elif kinds[name] == "timestamp":
+      data[name] = arrays[name].view("datetime64[ns]")
+    else:
+      data[name] = arrays[name]
+  return pd.DataFrame(data, copy=False)
+
+
+def iter_ride_store(
+  columns: Sequence[str] | None = None,
+  chunk_rows: int = RIDE_CHUNK_ROWS,
+  store_path: Path | str = RIDES_STORE_PATH,
+) -> Iterator[pd.DataFrame]:
+  """Stream the ride store in row ranges of the memory-mapped arrays.
+
+  Args:
+      columns: Columns to return, all if None
+      chunk_rows: Rides per chunk
+      store_path: Store directory
+
+  Yields:
+      Typed ride tables of at most chunk_rows rides, in store order
+
+  """
+  arrays, metadata = load_arrays(store_path)
+  kinds = metadata["columns"]
+  names = list(columns or kinds)
+  categories = {
+    name: pd.Index(arrays[f"{name}.categories"].tolist(), dtype=object)
+    for name in names
+    if kinds[name] == "categorical"
+  }
+  for start in range(0, metadata["rows"], chunk_rows):
+    rows = slice(start, start + chunk_rows)
+    data = {}
+    for name in names:
+      if kinds[name] == "categorical":
+        codes = np.asarray(arrays[f"{name}.codes"][rows])
+        data[name] = pd.Categorical.from_codes(codes, categories=categories[name])
+      elif kinds[name] == "timestamp":
+        data[name] = np.asarray(arrays[name][rows]).view("datetime64[ns]")
+      else:
+        data[name] = np.asarray(arrays[name][rows])
+    yield pd.DataFrame(data)
+
+
+def iter_rides(
+  csv_path: str = RIDES_CSV_PATH,
+  columns: Sequence[str] | None = None,
+  chunk_rows: int = RIDE_CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+  """Stream the typed ride table in chunks, never holding the whole history.
+
+  Reads the columnar store if it is up to date with the CSV, and the CSV in
+  chunks otherwise; the store is not built here, since that needs the full
+  table in memory.
+
+  Args:
+      csv_path: Ride CSV
+      columns: Columns to return, ``hour`` included, all if None
+      chunk_rows: Rides per chunk
+
+  Yields:
+      Typed ride tables of at most chunk_rows rides
+
+  """
+  manifest = read_manifest(RIDES_STORE_PATH)
+  if manifest is not None and manifest["metadata"].get("source") == _file_signature(csv_path):
+    yield from iter_ride_store(columns, chunk_rows, RIDES_STORE_PATH)
+    return
+
+  with pd.read_csv(csv_path, usecols=_csv_columns(columns), chunksize=chunk_rows) as reader:
+    for chunk in reader:
+      rides = _typed_rides(chunk)
+      yield rides if columns is None else rides[list(columns)]
+
+
+def _load_rides(csv_path: str, columns: Sequence[str] | None) -> pd.DataFrame:
+  """Load rides from the columnar store, ingesting the CSV first if it changed."""
+  manifest = read_manifest(RIDES_STORE_PATH)
+  if manifest is None or manifest["metadata"].get("source") != _file_signature(csv_path):
+    try:
+      print(f"Ingesting {csv_path} into the columnar ride store...")
+      ingest_rides(csv_path, RIDES_STORE_PATH)
+    except OSError as e:
+      print(f"Warning: Failed to write the ride store: {e}, reading the CSV")
+      return read_rides_csv(csv_path, columns)
+  return load_ride_store(columns, RIDES_STORE_PATH)
+
+
+def get_rides(
+  csv_path: str = RIDES_CSV_PATH, columns: Sequence[str] | None = None
+) -> pd.DataFrame:
+  """Get the typed ride trips table with pickup and dropoff clusters.
+
+  Args:
+      csv_path: Ride CSV
+      columns: Columns to load, ``hour`` included, all if None
+
+  Returns:
+      Typed ride table
+
+  """
+  name = "rides" if columns is None else f"rides[{','.join(columns)}]"
+  return _get(name, csv_path, lambda path: _load_rides(path, columns))
+
+
+def get_surge(csv_path: str = SURGE_CSV_PATH) -> pd.DataFrame:
+  """Get the surge multiplier table by city and hour."""
+  return _get("surge", csv_path, pd.read_csv)
+
+
+def loaded_datasets() -> list[str]:
+  """Names and paths of the datasets this process has loaded so far."""
+  with _datasets_lock:
+    return [f"{name}:{path}" for name, path in _datasets]
+
+
+def clear_datasets() -> None:
+  """Drop every loaded dataset, so the next use reads the files again."""
+  with _datasets_lock:
+    _datasets.clear()
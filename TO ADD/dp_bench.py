@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Benchmark the DP backends on the sample cities and on synthetic graphs.
+
+Times one full-table solve per city with the NumPy backend and, when numba is
+installed, with the compiled kernel, and checks that both tables are
+bit-identical. The kernel is compiled before timing starts.
+
+Usage examples:
+    python3 dp_bench.py
+    python3 dp_bench.py --clusters 1000 --out-degree 40 --duration 8 --repeats 3
+"""
+
+import argparse
+import time
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from compiled_graph import HOURS_PER_DAY, CompiledCityGraph
+from dp_engine import DEFAULT_DP_BACKEND, TIME_STEP_MINUTES, CityDPEngine, TimeGrid
+from dynamic_programming_optimizer import MobilityOptimizer
+
+
+def synthetic_city(n_nodes: int, out_degree: int, seed: int = 0) -> CompiledCityGraph:
+  """Build a random city graph with hourly trips, travel times and fares.
+
+  Args:
+      n_nodes: Number of clusters
+      out_degree: Edges leaving each cluster, a self-edge included
+      seed: Random seed
+
+  Returns:
+      Compiled graph
+
+  """
+  rng = np.random.default_rng(seed)
+  out_degree = min(out_degree, n_nodes)
+  # Each cluster keeps a self-edge plus out_degree - 1 random destinations
+  rows = []
+  for i in range(n_nodes):
+    others = rng.choice(np.delete(np.arange(n_nodes), i), out_degree - 1, replace=False)
+    rows.append(np.sort(np.append(others, i)))
+  indices = np.concatenate(rows).astype(np.int32)
+  indptr = np.arange(0, n_nodes * out_degree + 1, out_degree, dtype=np.int32)
+  n_edges = len(indices)
+
+  hourly_trips = rng.poisson(3.0, (n_edges, HOURS_PER_DAY)).astype(np.float32)
+  hourly_time = rng.uniform(3.0, 40.0, (n_edges, HOURS_PER_DAY))
+  hourly_fare = rng.uniform(4.0, 35.0, (n_edges, HOURS_PER_DAY))
+  nodes = [f"s_{k}" for k in range(n_nodes)]
+  return CompiledCityGraph(
+    nodes,
+    indptr,
+    indices,
+    hourly_trips,
+    hourly_time,
+    hourly_fare,
+    np.zeros(n_nodes),
+    np.zeros(n_nodes),
+  )
+
+
+def time_backends(name: str, engine: CityDPEngine, hours: np.ndarray, repeats: int) -> dict:
+  """Time full-table solves of a shift with every available backend.
+
+  Args:
+      name: Label of the city
+      engine: DP engine of the city
+      hours: Hour of day per remaining bucket
+      repeats: Timed solves per backend; the fastest counts
+
+  Returns:
+      Dictionary with the timings, the speedup and whether the tables match
+
+  """
+  weather = np.ones(len(hours))
+  backends = ["numpy"] if DEFAULT_DP_BACKEND == "numpy" else ["numpy", "numba"]
+
+  row = {"city": name, "clusters": len(engine.nodes), "buckets": len(hours) - 1}
+  tables = {}
+  for backend in backends:
+    backend_engine = engine.with_backend(backend)
+    tables[backend] = backend_engine.solve(hours, weather)  # Warm up, compiles the kernel
+    timings = []
+    for _ in range(repeats):
+      started = time.perf_counter()
+      backend_engine.solve(hours, weather)
+      timings.append(time.perf_counter() - started)
+    row[f"{backend}_seconds"] = min(timings)
+
+  if "numba" in tables:
+    row["speedup"] = row["numpy_seconds"] / row["numba_seconds"]
+    row["identical"] = all(
+      np.array_equal(a, b) for a, b in zip(tables["numpy"], tables["numba"], strict=True)
+    )
+  return row
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark the DP backends")
+  parser.add_argument(
+    "--clusters", type=int, default=1000, help="Synthetic graph size (default: 1000)"
+  )
+  parser.add_argument(
+    "--out-degree", type=int, default=40, help="Edges per synthetic cluster (default: 40)"
+  )
+  parser.add_argument("--hour", type=int, default=8, help="Starting hour (0-23, default: 8)")
+  parser.add_argument("--duration", type=int, default=8, help="Work duration in hours (default: 8)")
+  parser.add_argument(
+    "--repeats", type=int, default=3, help="Timed solves per backend (default: 3)"
+  )
+  parser.add_argument(
+    "--date", type=str, default="2023-01-15", help="Shift date for the sample cities"
+  )
+  args = parser.parse_args()
+
+  if DEFAULT_DP_BACKEND == "numpy":
+    print("numba is not installed: timing the NumPy backend only")
+
+  start_date = datetime.strptime(args.date, "%Y-%m-%d")
+  grid = TimeGrid.for_shift(args.duration, TIME_STEP_MINUTES)
+  optimizer = MobilityOptimizer()
+
+  rows = []
+  for city_id in sorted(optimizer.graphs):
+    engine = optimizer._get_engine(city_id)
+    hours, _ = optimizer._shift_conditions(city_id, args.hour, start_date, grid)
+    rows.append(time_backends(f"city {city_id}", engine, hours, args.repeats))
+
+  print(f"Building a synthetic {args.clusters}-cluster graph...")
+  compiled = synthetic_city(args.clusters, args.out_degree)
+  engine = CityDPEngine(compiled, np.ones(HOURS_PER_DAY), optimizer.gamma, optimizer.lambda_floor)
+  rows.append(time_backends("synthetic", engine, grid.hours(args.hour), args.repeats))
+
+  print(pd.DataFrame(rows).to_string(index=False, float_format="%.5f"))
+
+
+if __name__ == "__main__":
+  main()
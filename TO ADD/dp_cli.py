@@ -8,6 +8,8 @@ Usage examples:
     python3 dp_cli.py --city 3 --cluster c_3_2 --hour 8 --duration 8 --date 2023-01-15
     python3 dp_cli.py --city 1 --best-positions --hour 10 --duration 6 --date 2023-02-01
     python3 dp_cli.py --city 3 --compare-schedules --cluster c_3_2 --date 2023-01-15
+    python3 dp_cli.py --city 3 --sweep --gammas 0.8 0.9 0.95 --lambda-floors 0.5 1 --date 2023-01-15
+    python3 dp_cli.py --city 3 --compare-resolutions --steps 1 5 15 30 --date 2023-01-15
 """
 
 import argparse
@@ -15,8 +17,11 @@ import sys
 
 from datetime import datetime, timedelta
 
+import pandas as pd
+
 from advanced_analysis import AdvancedAnalyzer
 from dynamic_programming_optimizer import MobilityOptimizer
+from weather_predictor import forecast_weather_range
 
 
 def parse_date(date_str: str) -> datetime:
@@ -44,6 +49,12 @@ Examples:
   
   # Analyze weekly earnings pattern
   python3 dp_cli.py --city 3 --weekly --cluster c_3_2 --hour 8 --duration 8 --date 2023-01-15
+
+  # Sensitivity of an 8-hour shift at 8 AM to gamma and lambda_floor
+  python3 dp_cli.py --city 3 --sweep --gammas 0.8 0.9 0.95 --lambda-floors 0.5 1 --date 2023-01-15
+
+  # Accuracy and cost of 1/5/15/30-minute time buckets for an 8-hour shift
+  python3 dp_cli.py --city 3 --compare-resolutions --steps 1 5 15 30 --date 2023-01-15
         """,
   )
 
@@ -68,6 +79,12 @@ Examples:
   analysis_group.add_argument(
     "--cluster-popularity", action="store_true", help="Analyze cluster popularity"
   )
+  analysis_group.add_argument(
+    "--sweep", action="store_true", help="Parameter sweep over gammas/lambda-floors/epsilons"
+  )
+  analysis_group.add_argument(
+    "--compare-resolutions", action="store_true", help="Benchmark time bucket lengths (--steps)"
+  )
 
   # Optional parameters
   parser.add_argument("--hour", type=int, default=8, help="Starting hour (0-23, default: 8)")
@@ -84,6 +101,23 @@ Examples:
   parser.add_argument(
     "--lambda-floor", type=float, default=0.5, help="Minimum demand rate (default: 0.5)"
   )
+  parser.add_argument(
+    "--step-minutes", type=int, default=5, help="Time bucket length in minutes (default: 5)"
+  )
+
+  # Parameter sweep grid (defaults to the single values above)
+  parser.add_argument("--gammas", type=float, nargs="+", help="Discount factors to sweep")
+  parser.add_argument(
+    "--lambda-floors", type=float, nargs="+", help="Minimum demand rates to sweep"
+  )
+  parser.add_argument("--epsilons", type=float, nargs="+", help="Smoothing parameters to sweep")
+  parser.add_argument(
+    "--steps",
+    type=int,
+    nargs="+",
+    default=[1, 5, 15, 30],
+    help="Bucket lengths in minutes to compare, finest first (default: 1 5 15 30)",
+  )
 
   # Output options
   parser.add_argument("--json", type=str, help="Export results to JSON file")
@@ -100,12 +134,20 @@ Examples:
     print("Error: Duration must be between 1 and 24 hours")
     sys.exit(1)
 
+  if args.step_minutes < 1 or min(args.steps) < 1:
+    print("Error: Time bucket lengths must be at least 1 minute")
+    sys.exit(1)
+
   # Initialize optimizer
   print(
-    f"Initializing optimizer (ε={args.epsilon}, γ={args.gamma}, λ_floor={args.lambda_floor})..."
+    f"Initializing optimizer (ε={args.epsilon}, γ={args.gamma}, λ_floor={args.lambda_floor}, "
+    f"{args.step_minutes}-minute buckets)..."
   )
   optimizer = MobilityOptimizer(
-    epsilon=args.epsilon, gamma=args.gamma, lambda_floor=args.lambda_floor
+    epsilon=args.epsilon,
+    gamma=args.gamma,
+    lambda_floor=args.lambda_floor,
+    step_minutes=args.step_minutes,
   )
 
   analyzer = AdvancedAnalyzer(optimizer)
@@ -237,8 +279,21 @@ Examples:
         (8, 12),
       ]
 
-      schedule_results = analyzer.compare_work_schedules(
-        args.city, cluster_arg, args.date, schedules
+      # One absolute-clock day table answers every schedule
+      schedule_earnings = optimizer.solve_schedules(args.city, cluster_arg, schedules, args.date)
+      schedule_results = pd.DataFrame(
+        [
+          {
+            "start_hour": start_hour,
+            "work_hours": work_hours,
+            "total_earnings": earnings,
+            "hourly_rate": earnings / work_hours,
+            "path_length": len(path),
+          }
+          for (start_hour, work_hours), (earnings, path) in zip(
+            schedules, schedule_earnings, strict=True
+          )
+        ]
       )
 
       print(schedule_results.to_string(index=False, float_format="%.2f"))
@@ -277,7 +332,24 @@ Examples:
         f"Worst day: {weekly_results.loc[weekly_results['total_earnings'].idxmin(), 'day_of_week']}"
       )
 
+      # Seven daily forecasts from cached transition-matrix powers
+      weather_outlook = pd.DataFrame(
+        [
+          {
+            "date": (args.date + timedelta(days=offset)).date(),
+            **probabilities,
+            "expected_multiplier": expected_multiplier,
+          }
+          for offset, (probabilities, expected_multiplier) in enumerate(
+            forecast_weather_range(args.city, args.date, 7)
+          )
+        ]
+      )
+      print("\nWeather outlook:")
+      print(weather_outlook.to_string(index=False, float_format="%.2f"))
+
       results["weekly_analysis"] = weekly_results.to_dict("records")
+      results["weather_outlook"] = weather_outlook.to_dict("records")
 
     elif args.cluster_popularity:
       print("\n=== CLUSTER POPULARITY ===")
@@ -289,6 +361,50 @@ Examples:
 
       results["cluster_popularity"] = popularity_results.to_dict("records")
 
+    elif args.sweep:
+      print("\n=== PARAMETER SWEEP ===")
+      print(f"City: {args.city}, Date: {args.date.date()}")
+      print(f"Schedule: {args.hour:02d}:00 for {args.duration} hours")
+      print("-" * 70)
+
+      sweep_results = optimizer.sweep(
+        args.city,
+        args.hour,
+        args.duration,
+        args.date,
+        gammas=args.gammas,
+        lambda_floors=args.lambda_floors,
+        epsilons=args.epsilons,
+      )
+
+      # Best starting cluster per parameter combination
+      best = sweep_results.loc[
+        sweep_results.groupby(["gamma", "lambda_floor", "epsilon"], sort=False)[
+          "expected_earnings"
+        ].idxmax()
+      ]
+      print(best.to_string(index=False, float_format="%.2f"))
+
+      if args.verbose:
+        print("\nAll starting clusters:")
+        print(sweep_results.to_string(index=False, float_format="%.2f"))
+
+      results["parameter_sweep"] = sweep_results.to_dict("records")
+
+    elif args.compare_resolutions:
+      print("\n=== TIME RESOLUTION BENCHMARK ===")
+      print(f"City: {args.city}, Date: {args.date.date()}")
+      print(f"Schedule: {args.hour:02d}:00 for {args.duration} hours")
+      print(f"Errors are relative to {args.steps[0]}-minute buckets")
+      print("-" * 70)
+
+      resolution_results = optimizer.compare_resolutions(
+        args.city, args.hour, args.duration, args.date, resolutions=args.steps
+      )
+      print(resolution_results.to_string(index=False, float_format="%.4f"))
+
+      results["resolution_benchmark"] = resolution_results.to_dict("records")
+
     # Export to JSON if requested
     if args.json:
       analyzer.export_results_to_json(args.city, results, args.json)
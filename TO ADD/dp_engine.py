@@ -0,0 +1,799 @@
+"""Vectorized backward-induction engine for the driver earnings DP.
+
+The engine turns a compiled city graph into dense hour-indexed arrays once
+(fare[h, i, j], travel[h, i, j], wait[h, j]) and evaluates every time bucket
+of the value recursion as a single NumPy max over destinations j. It
+reproduces ``MobilityOptimizer.solve_dp`` bucket for bucket, including the
+tie-breaking and path extraction rules of the original loop implementation.
+
+Row r of a value table only depends on rows below it, so after a surge change
+a table is refilled from the first bucket priced at a changed hour and keeps
+every row below that.
+
+``CityDPEngine.solve_reachable`` answers a single start by expanding only the
+(cluster, bucket) states reachable from it, with the same values and policy.
+
+Backward induction runs in a compiled Numba kernel (``dp_kernels``) when
+numba is installed, with bit-identical results, and in NumPy otherwise.
+
+Buckets are ``TIME_STEP_MINUTES`` long by default. A ``TimeGrid`` describes
+other resolutions, including multi-resolution shifts with short buckets for
+the first hour and longer ones after it.
+"""
+
+import copy
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+from app import dp_kernels
+from app.compiled_graph import HOURS_PER_DAY, CompiledCityGraph
+
+TIME_STEP_MINUTES = 5
+
+# Backward induction implementations; the compiled one is used when available
+DP_BACKENDS = ("numpy", "numba")
+DEFAULT_DP_BACKEND = "numba" if dp_kernels.fill_table is not None else "numpy"
+
+# Bucket length in minutes, or (minutes into the shift, bucket length) breakpoints
+StepSchedule = int | tuple[tuple[int, int], ...]
+
+
+class ValueTable(NamedTuple):
+  """Filled DP table, indexed by remaining time buckets then node index."""
+
+  values: np.ndarray  # (n_steps + 1, n_nodes) expected earnings
+  next_node: np.ndarray  # (n_steps + 1, n_nodes) best next node index, -1 to stop
+  next_steps: np.ndarray  # (n_steps + 1, n_nodes) buckets consumed by that move
+
+
+class TimeGrid:
+  """Time buckets of a shift, indexed like a value table.
+
+  Row r has ``minutes[r]`` minutes of the shift left, so row 0 is the end of
+  the shift and row ``n_steps`` its start. A move made at row r has its
+  duration rounded to that row's bucket length and lands on the last row
+  not after its arrival.
+  """
+
+  def __init__(self, elapsed_minutes: list[int]):
+    """Wrap bucket boundaries; use ``for_shift`` to build them.
+
+    Args:
+        elapsed_minutes: Bucket boundaries in minutes since the shift start,
+          strictly increasing from 0
+
+    """
+    elapsed = np.asarray(elapsed_minutes, dtype=np.int64)
+    self.n_steps = len(elapsed) - 1
+    self.minutes = elapsed[-1] - elapsed[::-1]
+    self.bucket_minutes = np.diff(self.minutes, prepend=0)
+    steps = set(self.bucket_minutes[1:].tolist())
+    # Uniform grids run on an engine of their bucket length without lookups
+    self.step_minutes = steps.pop() if len(steps) == 1 else None
+
+  @classmethod
+  def for_shift(cls, work_hours: int, schedule: StepSchedule = TIME_STEP_MINUTES) -> "TimeGrid":
+    """Build the buckets of a shift.
+
+    Args:
+        work_hours: Shift length in hours
+        schedule: Bucket length in minutes, or (minutes into the shift, bucket
+          length) breakpoints starting at 0, e.g. ((0, 1), (60, 15)) for
+          1-minute buckets during the first hour and 15-minute ones after it
+
+    Returns:
+        Grid of whole buckets fitting in the shift
+
+    """
+    breakpoints = validate_step_schedule(schedule)
+    work_minutes = work_hours * 60
+    elapsed = [0]
+    k = 0
+    while True:
+      while k + 1 < len(breakpoints) and breakpoints[k + 1][0] <= elapsed[-1]:
+        k += 1
+      step = breakpoints[k][1]
+      if elapsed[-1] + step > work_minutes:
+        return cls(elapsed)
+      elapsed.append(elapsed[-1] + step)
+
+  @property
+  def elapsed_minutes(self) -> np.ndarray:
+    """Minutes since the shift start of every row, shape (n_steps + 1,)."""
+    return self.minutes[-1] - self.minutes
+
+  def hours(self, start_hour: int) -> np.ndarray:
+    """Hour of day of every row; row 0, the end of the shift, reads 0."""
+    hours = (start_hour + self.elapsed_minutes // 60) % HOURS_PER_DAY
+    hours[0] = 0
+    return hours
+
+  def landing_rows(self, r: int, buckets: np.ndarray) -> np.ndarray:
+    """Row reached from row r by moves of the given bucket counts, -1 past the end."""
+    landing = self.minutes[r] - buckets * self.bucket_minutes[r]
+    return np.searchsorted(self.minutes, landing, side="right") - 1
+
+
+def validate_step_schedule(schedule: StepSchedule) -> tuple[tuple[int, int], ...]:
+  """Check a time resolution and return it as (minutes into the shift, bucket length) pairs.
+
+  Args:
+      schedule: Bucket length in minutes, or breakpoints as in ``TimeGrid.for_shift``
+
+  Returns:
+      Breakpoints sorted by start minute
+
+  Raises:
+      ValueError: If a bucket length is not positive or the first breakpoint
+        does not start at minute 0
+
+  """
+  if isinstance(schedule, int):
+    schedule = ((0, schedule),)
+  breakpoints = tuple(sorted((int(start), int(step)) for start, step in schedule))
+  if not breakpoints or breakpoints[0][0] != 0:
+    raise ValueError(f"Step schedule {schedule} must start at minute 0")
+  if any(step <= 0 for _, step in breakpoints):
+    raise ValueError(f"Step schedule {schedule} has a non-positive bucket length")
+  return breakpoints
+
+
+class CityDPEngine:
+  """Dense per-city DP arrays for one set of optimizer parameters.
+
+  Arrays are built once per city and reused by every solve:
+  - fare[h, i, j]: average fare of edge i->j at hour h, surge applied
+  - travel[h, i, j]: average travel time of edge i->j at hour h
+  - wait[h, j]: expected wait at j, 60 / max(outgoing trips of j at h, λ_floor)
+  - steps[h, i, j]: travel + wait rounded to whole time buckets
+  """
+
+  def __init__(
+    self,
+    graph: CompiledCityGraph,
+    surge_by_hour: np.ndarray,
+    gamma: float,
+    lambda_floor: float,
+    step_minutes: int = TIME_STEP_MINUTES,
+    backend: str = DEFAULT_DP_BACKEND,
+  ):
+    """Build the dense arrays for a city.
+
+    Args:
+        graph: Compiled graph for the city
+        surge_by_hour: Surge multiplier per hour of day, shape (24,)
+        gamma: Discount factor for future earnings
+        lambda_floor: Minimum demand rate to prevent division by zero
+        step_minutes: Length of one time bucket in minutes
+        backend: "numba" for the compiled kernel, or "numpy"
+
+    Raises:
+        ValueError: If the backend is unknown, or "numba" without numba installed
+
+    """
+    self._check_backend(backend)
+    self.backend = backend
+    self.step_minutes = step_minutes
+    self.nodes = graph.nodes
+    self.node_index = graph.node_index
+    self.gamma = gamma
+    self.adjacency = graph.adjacency()
+
+    self.base_fare = graph.to_dense(graph.hourly_fare)
+    travel = graph.to_dense(graph.hourly_time)
+
+    # Surge is applied before weather, matching fare = base * surge * weather
+    self.surge_by_hour = np.array(surge_by_hour, dtype=float)
+    self.fare = self.base_fare * self.surge_by_hour[:, None, None]
+    self.travel = travel
+    self.out_demand = graph.out_demand
+    self._set_lambda_floor(lambda_floor)
+
+  def _set_lambda_floor(self, lambda_floor: float) -> None:
+    """Compute the wait and bucket arrays for a minimum demand rate."""
+    self.lambda_floor = lambda_floor
+    self.wait = 60.0 / np.maximum(self.out_demand, lambda_floor)
+    self.steps = self._round_to_buckets(self.step_minutes)
+    # Bucket length -> steps array, for time grids other than the engine's own
+    self._steps_by_length = {self.step_minutes: self.steps}
+
+  def _round_to_buckets(self, step_minutes: int) -> np.ndarray:
+    """Travel plus wait time of every move in whole buckets of a given length."""
+    return np.rint((self.travel + self.wait[:, None, :]) / float(step_minutes)).astype(np.int64)
+
+  def bucket_steps(self, step_minutes: int) -> np.ndarray:
+    """Get the steps array for buckets of a given length, shape (24, n_nodes, n_nodes)."""
+    if step_minutes not in self._steps_by_length:
+      self._steps_by_length[step_minutes] = self._round_to_buckets(step_minutes)
+    return self._steps_by_length[step_minutes]
+
+  def with_lambda_floor(self, lambda_floor: float) -> "CityDPEngine":
+    """Copy of the engine for another λ_floor, sharing the fare and travel arrays."""
+    engine = copy.copy(self)
+    engine._set_lambda_floor(lambda_floor)
+    return engine
+
+  def with_step_minutes(self, step_minutes: int) -> "CityDPEngine":
+    """Copy of the engine on another time grid, sharing the fare and travel arrays."""
+    engine = copy.copy(self)
+    engine.step_minutes = step_minutes
+    engine._set_lambda_floor(self.lambda_floor)
+    return engine
+
+  def with_backend(self, backend: str) -> "CityDPEngine":
+    """Copy of the engine running another backend, sharing every array."""
+    self._check_backend(backend)
+    engine = copy.copy(self)
+    engine.backend = backend
+    return engine
+
+  @staticmethod
+  def _check_backend(backend: str) -> None:
+    """Reject unknown backends and the compiled one if numba is missing."""
+    if backend not in DP_BACKENDS:
+      raise ValueError(f"Unknown DP backend {backend!r}, expected one of {DP_BACKENDS}")
+    if backend == "numba" and dp_kernels.fill_table is None:
+      raise ValueError("The numba DP backend needs numba installed")
+
+  def with_surge(self, surge_by_hour: np.ndarray) -> "CityDPEngine":
+    """Copy of the engine repriced for a new hourly surge table.
+
+    The fare array is copied and only the changed hours are repriced. This
+    engine is left as it was, so solves still running on it read consistent
+    prices.
+
+    Args:
+        surge_by_hour: Surge multiplier per hour of day, shape (24,)
+
+    Returns:
+        Engine sharing every array but the fares with this one
+
+    """
+    surge_by_hour = np.array(surge_by_hour, dtype=float)
+    engine = copy.copy(self)
+    engine.fare = self.fare.copy()
+    for hour in np.flatnonzero(surge_by_hour != self.surge_by_hour):
+      engine.fare[hour] = self.base_fare[hour] * surge_by_hour[hour]
+    engine.surge_by_hour = surge_by_hour
+    return engine
+
+  def with_fares_of(self, other: "CityDPEngine") -> "CityDPEngine":
+    """Copy of the engine using the surge and fare array of another engine of the city."""
+    engine = copy.copy(self)
+    engine.surge_by_hour = other.surge_by_hour
+    engine.fare = other.fare
+    return engine
+
+  def solve(
+    self,
+    hours: np.ndarray,
+    weather: np.ndarray,
+    reuse: ValueTable | None = None,
+    from_bucket: int = 1,
+    grid: TimeGrid | None = None,
+  ) -> ValueTable:
+    """Fill the value table by backward induction over remaining time buckets.
+
+    V_r(i) = max(0, max over j: fare_ij * weather_r + γ * V_{r - steps_ij}(j))
+
+    Args:
+        hours: Hour of day for each remaining-bucket count r, shape (n_steps + 1,)
+        weather: Weather multiplier for each r, shape (n_steps + 1,)
+        reuse: Earlier table of the same shift whose rows below from_bucket
+          are still valid
+        from_bucket: First row to fill when reusing a table
+        grid: Time buckets of the shift, uniform buckets of the engine's
+          length if None
+
+    Returns:
+        Filled value table with the optimal policy; next_steps counts rows
+
+    """
+    if reuse is not None:
+      reuse = ValueTable(*(array[:, None] for array in reuse))
+    table = self._sweep(
+      np.asarray(hours)[:, None], np.asarray(weather)[:, None], reuse, from_bucket, grid=grid
+    )
+    return ValueTable(table.values[:, 0], table.next_node[:, 0], table.next_steps[:, 0])
+
+  def solve_gammas(
+    self,
+    hours: np.ndarray,
+    weather: np.ndarray,
+    gammas: np.ndarray,
+    grid: TimeGrid | None = None,
+  ) -> ValueTable:
+    """Fill one value table per discount factor in a single batched sweep.
+
+    Args:
+        hours: Hour of day for each remaining-bucket count r, shape (n_steps + 1,)
+        weather: Weather multiplier for each r, shape (n_steps + 1,)
+        gammas: Discount factors, shape (n_gammas,)
+        grid: Time buckets of the shift, uniform buckets of the engine's
+          length if None
+
+    Returns:
+        Value table with arrays of shape (n_steps + 1, n_gammas, n_nodes)
+
+    """
+    gammas = np.asarray(gammas, dtype=float)
+    batch_hours = np.repeat(np.asarray(hours)[:, None], len(gammas), axis=1)
+    batch_weather = np.repeat(np.asarray(weather)[:, None], len(gammas), axis=1)
+    return self._sweep(batch_hours, batch_weather, gammas=gammas, grid=grid)
+
+  def solve_deadlines(
+    self,
+    deadlines: np.ndarray,
+    n_steps: int,
+    weather: float,
+    reuse: ValueTable | None = None,
+    from_bucket: int = 1,
+  ) -> ValueTable:
+    """Fill the value tables of several shift deadlines in one backward sweep.
+
+    Deadlines are absolute, in time buckets since midnight of the shift date.
+    With r buckets left before deadline D the clock reads D - r, so one column
+    serves every shift ending at D: the shift starting at D - T reads its
+    value at r = T.
+
+    Args:
+        deadlines: Shift end times in buckets since midnight, shape (n_deadlines,)
+        n_steps: Longest shift to cover, in time buckets
+        weather: Weather multiplier applied to the whole table
+        reuse: Earlier tables of the same deadlines whose rows below
+          from_bucket are still valid
+        from_bucket: First row to fill when reusing tables
+
+    Returns:
+        Value table with arrays of shape (n_steps + 1, n_deadlines, n_nodes)
+
+    """
+    hours = deadline_hours(deadlines, n_steps, self.step_minutes)
+    return self._sweep(hours, np.full(hours.shape, weather), reuse, from_bucket)
+
+  def _sweep(
+    self,
+    hours: np.ndarray,
+    weather: np.ndarray,
+    reuse: ValueTable | None = None,
+    from_bucket: int = 1,
+    gammas: np.ndarray | None = None,
+    grid: TimeGrid | None = None,
+  ) -> ValueTable:
+    """Run backward induction for a batch of value tables side by side.
+
+    Args:
+        hours: Hour of day per remaining-bucket count and batch row,
+          shape (n_steps + 1, n_batch)
+        weather: Weather multiplier per remaining-bucket count and batch row,
+          shape (n_steps + 1, n_batch)
+        reuse: Table of the same shape whose rows below from_bucket are copied
+        from_bucket: First row to fill when reusing a table
+        gammas: Discount factor per batch row, the engine's gamma if None
+        grid: Time buckets of the rows, uniform buckets of the engine's length if None
+
+    Returns:
+        Value table with arrays of shape (n_steps + 1, n_batch, n_nodes)
+
+    """
+    if grid is not None and grid.step_minutes == self.step_minutes:
+      grid = None
+
+    shape = (*hours.shape, len(self.nodes))
+    table = ValueTable(
+      np.zeros(shape), np.full(shape, -1, dtype=np.int64), np.zeros(shape, dtype=np.int64)
+    )
+    if reuse is None:
+      from_bucket = 1
+    else:
+      for array, previous in zip(table, reuse, strict=True):
+        array[:from_bucket] = previous[:from_bucket]
+
+    if grid is None and self.backend == "numba":
+      dp_kernels.fill_table(
+        *table,
+        self.fare,
+        self.steps,
+        self.adjacency,
+        np.ascontiguousarray(hours, dtype=np.int64),
+        np.ascontiguousarray(weather, dtype=np.float64),
+        np.full(hours.shape[1], self.gamma) if gammas is None else np.asarray(gammas, dtype=float),
+        from_bucket,
+      )
+      return table
+
+    for r in range(from_bucket, hours.shape[0]):
+      self.fill_bucket(table, r, hours[r], weather[r], gammas, grid)
+    return table
+
+  def fill_bucket(
+    self,
+    table: ValueTable,
+    r: int,
+    hours: np.ndarray,
+    weather: np.ndarray,
+    gammas: np.ndarray | None = None,
+    grid: TimeGrid | None = None,
+  ) -> None:
+    """Fill row r of a batched value table from its rows below r.
+
+    Args:
+        table: Batched value table, arrays of shape (n_steps + 1, n_batch, n_nodes)
+        r: Remaining time buckets of the row to fill
+        hours: Hour of day per batch row, shape (n_batch,)
+        weather: Weather multiplier per batch row, shape (n_batch,)
+        gammas: Discount factor per batch row, the engine's gamma if None
+        grid: Time buckets of the rows, uniform buckets of the engine's length if None
+
+    """
+    gamma = self.gamma if gammas is None else np.asarray(gammas)[:, None, None]
+    values, next_node, next_steps = table
+    batch = np.arange(len(hours))[:, None, None]
+    cols = np.arange(len(self.nodes))[None, None, :]
+
+    fare = self.fare[hours] * np.asarray(weather)[:, None, None]
+    steps, target = self._moves(r, hours, grid)
+    feasible = self.adjacency & (target >= 0)
+
+    # values[r] is still all zeros here, which is what zero-bucket moves see
+    future = values[np.where(feasible, target, 0), batch, cols]
+    candidate = np.where(feasible, fare + gamma * future, -np.inf)
+    best = candidate.argmax(axis=2)
+    best_value = np.take_along_axis(candidate, best[:, :, None], axis=2)[:, :, 0]
+
+    values[r] = np.where(best_value > 0.0, best_value, 0.0)
+    next_node[r] = np.where(best_value > 0.0, best, -1)
+    next_steps[r] = np.where(
+      best_value > 0.0, np.take_along_axis(steps, best[:, :, None], axis=2)[:, :, 0], 0
+    )
+
+    zero_moves = np.tril(feasible & (steps == 0), k=-1)
+    for b in np.flatnonzero(zero_moves.any(axis=(1, 2))):
+      self._settle_zero_step_moves(
+        r,
+        self.gamma if gammas is None else float(gammas[b]),
+        zero_moves[b],
+        fare[b],
+        steps[b],
+        candidate[b],
+        values[:, b],
+        next_node[:, b],
+        next_steps[:, b],
+      )
+
+  def _moves(
+    self,
+    r: int,
+    hours: np.ndarray,
+    grid: TimeGrid | None = None,
+    nodes: np.ndarray | None = None,
+  ) -> tuple[np.ndarray, np.ndarray]:
+    """Rows consumed by, and landing row of, every move made at row r.
+
+    Args:
+        r: Remaining time buckets where the moves start
+        hours: Hour of day, a scalar or per batch row
+        grid: Time buckets of the rows, uniform buckets of the engine's length if None
+        nodes: Source node indices to restrict to, all nodes if None; only
+          for a scalar hour
+
+    Returns:
+        Tuple of (steps, target), each of shape (*hours.shape, n_sources, n_nodes)
+
+    """
+    steps = self.steps if grid is None else self.bucket_steps(int(grid.bucket_minutes[r]))
+    steps = steps[hours] if nodes is None else steps[hours, nodes]
+    if grid is None:
+      return steps, r - steps
+    target = grid.landing_rows(r, steps)
+    return r - target, target
+
+  def solve_reachable(
+    self,
+    start: int,
+    hours: np.ndarray,
+    weather: np.ndarray,
+    grid: TimeGrid | None = None,
+  ) -> tuple[ValueTable, int]:
+    """Fill only the cells of the value table reachable from one starting node.
+
+    A forward pass expands (node, row) labels from the start, latest rows
+    first; labels reaching the same node at the same row are merged and moves
+    running past the end of the shift are dropped. The backward pass then
+    evaluates the recursion on the reachable labels alone. Every successor of
+    a reachable cell is reachable, so those cells, and the path from the
+    start, match ``solve`` exactly.
+
+    Args:
+        start: Starting node index
+        hours: Hour of day for each remaining-bucket count r, shape (n_steps + 1,)
+        weather: Weather multiplier for each r, shape (n_steps + 1,)
+        grid: Time buckets of the shift, uniform buckets of the engine's
+          length if None
+
+    Returns:
+        Tuple of (value_table, n_labels); cells not reachable from the start
+        read 0 with no move
+
+    """
+    if grid is not None and grid.step_minutes == self.step_minutes:
+      grid = None
+    n_steps = len(hours) - 1
+    n_nodes = len(self.nodes)
+
+    reachable = np.zeros((n_steps + 1, n_nodes), dtype=bool)
+    reachable[n_steps, start] = True
+    for r in range(n_steps, 0, -1):
+      frontier = np.flatnonzero(reachable[r])
+      # Zero-bucket moves add labels to row r itself, which expand in turn
+      while len(frontier):
+        _, target = self._moves(r, hours[r], grid, frontier)
+        rows, cols = np.nonzero(self.adjacency[frontier] & (target >= 0))
+        landing = target[rows, cols]
+        added = np.unique(cols[(landing == r) & ~reachable[r, cols]])
+        reachable[landing, cols] = True
+        frontier = added
+
+    values = np.zeros((n_steps + 1, n_nodes))
+    next_node = np.full((n_steps + 1, n_nodes), -1, dtype=np.int64)
+    next_steps = np.zeros((n_steps + 1, n_nodes), dtype=np.int64)
+    cols = np.arange(n_nodes)[None, :]
+
+    for r in range(1, n_steps + 1):
+      nodes = np.flatnonzero(reachable[r])
+      if not len(nodes):
+        continue
+      steps, target = self._moves(r, hours[r], grid, nodes)
+      feasible = self.adjacency[nodes] & (target >= 0)
+      fare = self.fare[hours[r]][nodes] * weather[r]
+
+      # values[r] is still all zeros here, which is what zero-bucket moves see
+      future = values[np.where(feasible, target, 0), cols]
+      candidate = np.where(feasible, fare + self.gamma * future, -np.inf)
+      best = candidate.argmax(axis=1)
+      best_value = candidate[np.arange(len(nodes)), best]
+
+      values[r, nodes] = np.where(best_value > 0.0, best_value, 0.0)
+      next_node[r, nodes] = np.where(best_value > 0.0, best, -1)
+      next_steps[r, nodes] = np.where(
+        best_value > 0.0, steps[np.arange(len(nodes)), best], 0
+      )
+
+      # Settle zero-bucket moves to earlier nodes in node order, as ``fill_bucket`` does
+      zero_moves = feasible & (steps == 0) & (cols < nodes[:, None])
+      for k in np.flatnonzero(zero_moves.any(axis=1)):
+        targets = np.flatnonzero(zero_moves[k])
+        candidate[k, targets] = fare[k, targets] + self.gamma * values[r, targets]
+        best_k = int(candidate[k].argmax())
+        if candidate[k, best_k] > 0.0:
+          values[r, nodes[k]] = candidate[k, best_k]
+          next_node[r, nodes[k]] = best_k
+          next_steps[r, nodes[k]] = steps[k, best_k]
+
+    return ValueTable(values, next_node, next_steps), int(reachable[1:].sum())
+
+  def _settle_zero_step_moves(
+    self,
+    r: int,
+    gamma: float,
+    zero_moves: np.ndarray,
+    fare: np.ndarray,
+    steps: np.ndarray,
+    candidate: np.ndarray,
+    values: np.ndarray,
+    next_node: np.ndarray,
+    next_steps: np.ndarray,
+  ) -> None:
+    """Re-evaluate rows whose moves take zero buckets.
+
+    Such a move lands in the bucket being filled. Nodes are filled in graph
+    order, so a destination j earlier than i already holds its value for this
+    bucket while later ones still read as zero.
+    """
+    for i in np.flatnonzero(zero_moves.any(axis=1)):
+      targets = np.flatnonzero(zero_moves[i])
+      candidate[i, targets] = fare[i, targets] + gamma * values[r, targets]
+      best = int(candidate[i].argmax())
+      if candidate[i, best] > 0.0:
+        values[r, i] = candidate[i, best]
+        next_node[r, i] = best
+        next_steps[r, i] = steps[i, best]
+
+  def extract_path(self, table: ValueTable, start: int, n_steps: int, max_moves: int) -> list[str]:
+    """Follow the optimal policy forward from a starting node.
+
+    Args:
+        table: Filled value table
+        start: Starting node index
+        n_steps: Shift length in time buckets
+        max_moves: Upper bound on path length to guard against cycles
+
+    Returns:
+        List of cluster IDs visited
+
+    """
+    path = []
+    node = start
+    remaining = n_steps
+
+    while remaining > 0:
+      path.append(self.nodes[node])
+
+      next_index = int(table.next_node[remaining, node])
+      steps = int(table.next_steps[remaining, node])
+      if next_index < 0 or steps >= remaining:
+        break
+
+      node = next_index
+      remaining -= steps
+
+      if len(path) > max_moves:
+        break
+
+    return path
+
+
+def shift_hours(
+  start_hour: int, n_steps: int, step_minutes: int = TIME_STEP_MINUTES
+) -> np.ndarray:
+  """Hour of day of every remaining-bucket count of a shift, shape (n_steps + 1,).
+
+  Row 0, the end of the shift, is never priced and reads 0.
+  """
+  elapsed_minutes = (n_steps - np.arange(n_steps + 1)) * step_minutes
+  hours = (start_hour + elapsed_minutes // 60) % HOURS_PER_DAY
+  hours[0] = 0
+  return hours
+
+
+def deadline_hours(
+  deadlines: np.ndarray, n_steps: int, step_minutes: int = TIME_STEP_MINUTES
+) -> np.ndarray:
+  """Hour of day of every remaining-bucket count before each deadline.
+
+  Args:
+      deadlines: Shift end times in buckets since midnight, shape (n_deadlines,)
+      n_steps: Number of buckets before the deadlines to cover
+      step_minutes: Length of one time bucket in minutes
+
+  Returns:
+      Hours of shape (n_steps + 1, n_deadlines)
+
+  """
+  remaining = np.arange(n_steps + 1)[:, None]
+  clock_minutes = (np.asarray(deadlines)[None, :] - remaining) * step_minutes
+  return (clock_minutes // 60) % HOURS_PER_DAY
+
+
+def first_affected_bucket(hours: np.ndarray, changed_hours: set[int]) -> int | None:
+  """Lowest remaining-bucket count r >= 1 priced at one of the changed hours.
+
+  Args:
+      hours: Hour of day per remaining-bucket count, shape (n_steps + 1, ...)
+      changed_hours: Hours of day whose prices changed
+
+  Returns:
+      First row to refill, or None if the table is unaffected
+
+  """
+  hit = np.isin(hours[1:], list(changed_hours))
+  rows = np.flatnonzero(hit.reshape(len(hit), -1).any(axis=1))
+  return int(rows[0]) + 1 if len(rows) else None
+
+
+class DayValueTable:
+  """Absolute-clock value tables answering any (start_hour, work_hours) of one day.
+
+  Columns are indexed by shift deadline, so every shift ending at the same
+  time shares one column and all requested shifts come from a single sweep.
+  The engine's bucket length must divide an hour, so that every shift starts
+  on a bucket boundary.
+  """
+
+  def __init__(
+    self,
+    engine: CityDPEngine,
+    day: datetime,
+    schedules: set[tuple[int, int]],
+    start_weather: float,
+    weather: float,
+  ):
+    """Solve the tables for a set of shifts.
+
+    Args:
+        engine: DP engine of the city
+        day: Midnight of the shift date
+        schedules: (start_hour, work_hours) pairs the table must answer
+        start_weather: Weather multiplier at the first bucket of a shift
+        weather: Weather multiplier for the rest of the shift
+
+    """
+    self.engine = engine
+    self.day = day
+    self.schedules = frozenset(schedules)
+    self.start_weather = start_weather
+    self.weather = weather
+
+    deadlines = sorted({self._deadline(start, hours) for start, hours in schedules})
+    self.deadlines = np.array(deadlines)
+    self.deadline_index = {deadline: k for k, deadline in enumerate(deadlines)}
+    self.n_steps = max(hours for _, hours in schedules) * 60 // engine.step_minutes
+    self.table = engine.solve_deadlines(self.deadlines, self.n_steps, weather)
+    # First row invalidated by a surge change since the last solve
+    self.stale_from: int | None = None
+
+  @property
+  def nbytes(self) -> int:
+    """Bytes held by the value and policy arrays."""
+    return sum(array.nbytes for array in self.table)
+
+  def _deadline(self, start_hour: int, work_hours: int) -> int:
+    """Shift end in time buckets since midnight."""
+    return (start_hour + work_hours) * 60 // self.engine.step_minutes
+
+  def covers(self, schedules: set[tuple[int, int]]) -> bool:
+    """Whether every given (start_hour, work_hours) pair can be answered."""
+    return schedules <= self.schedules
+
+  def mark_stale(self, changed_hours: set[int], engine: CityDPEngine | None = None) -> bool:
+    """Record that prices changed at some hours of day.
+
+    Args:
+        changed_hours: Hours of day whose surge changed
+        engine: Engine repriced for the change, used by the next refresh; the
+          current one if None
+
+    Returns:
+        Whether any row of the table is affected
+
+    """
+    if engine is not None:
+      self.engine = engine
+    first = first_affected_bucket(
+      deadline_hours(self.deadlines, self.n_steps, self.engine.step_minutes), changed_hours
+    )
+    if first is None:
+      return False
+    self.stale_from = first if self.stale_from is None else min(self.stale_from, first)
+    return True
+
+  def refresh(self) -> None:
+    """Refill the rows invalidated since the last solve, reusing the rows below them."""
+    if self.stale_from is not None:
+      self.table = self.engine.solve_deadlines(
+        self.deadlines, self.n_steps, self.weather, reuse=self.table, from_bucket=self.stale_from
+      )
+      self.stale_from = None
+
+  def shift_table(self, start_hour: int, work_hours: int) -> tuple[ValueTable, int]:
+    """Get the value table of one shift.
+
+    The first bucket of a shift is priced with the forecast at the exact start
+    time, which can differ from the rest of the day, so that row is refilled.
+
+    Args:
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work
+
+    Returns:
+        Tuple of (value_table, n_steps) in the layout of ``CityDPEngine.solve``
+
+    """
+    self.refresh()
+    n_steps = work_hours * 60 // self.engine.step_minutes
+    column = self.deadline_index[self._deadline(start_hour, work_hours)]
+    table = ValueTable(
+      *(array[: n_steps + 1, column : column + 1].copy() for array in self.table)
+    )
+
+    if self.start_weather != self.weather:
+      table.values[n_steps] = 0.0
+      table.next_node[n_steps] = -1
+      table.next_steps[n_steps] = 0
+      self.engine.fill_bucket(
+        table, n_steps, np.array([start_hour % HOURS_PER_DAY]), np.array([self.start_weather])
+      )
+
+    return ValueTable(*(array[:, 0] for array in table)), n_steps
@@ -0,0 +1,83 @@
+"""Optional Numba kernel for the DP backward induction.
+
+``fill_table`` runs the whole value recursion of ``CityDPEngine._sweep`` as
+compiled loops over (batch row, bucket, node, destination), with no Python
+overhead per bucket. It follows the NumPy path operation for operation:
+- fare * weather + gamma * future, with the same rounding
+- the first maximum wins ties, and only values above 0 are kept
+- a zero-bucket move reads its destination's value for the same bucket if
+  the destination comes earlier in node order, and 0 otherwise
+
+so both backends give bit-identical tables. Numba is optional: without it
+``fill_table`` is None and the engine keeps using NumPy.
+"""
+
+import numpy as np
+
+try:
+  from numba import njit
+except ImportError:
+  njit = None
+
+
+def _fill_table(
+  values: np.ndarray,
+  next_node: np.ndarray,
+  next_steps: np.ndarray,
+  fare: np.ndarray,
+  steps: np.ndarray,
+  adjacency: np.ndarray,
+  hours: np.ndarray,
+  weather: np.ndarray,
+  gammas: np.ndarray,
+  from_bucket: int,
+) -> None:
+  """Fill rows from_bucket onwards of a batched value table in place.
+
+  Args:
+      values: Expected earnings, shape (n_steps + 1, n_batch, n_nodes)
+      next_node: Best next node index or -1, same shape
+      next_steps: Buckets consumed by the best move, same shape
+      fare: Surge-priced fares, shape (24, n_nodes, n_nodes)
+      steps: Buckets per move, shape (24, n_nodes, n_nodes)
+      adjacency: Edge mask, shape (n_nodes, n_nodes)
+      hours: Hour of day per row and batch column, shape (n_steps + 1, n_batch)
+      weather: Weather multiplier per row and batch column, same shape
+      gammas: Discount factor per batch column, shape (n_batch,)
+      from_bucket: First row to fill
+
+  """
+  n_rows, n_batch, n_nodes = values.shape
+  for b in range(n_batch):
+    gamma = gammas[b]
+    for r in range(from_bucket, n_rows):
+      h = hours[r, b]
+      w = weather[r, b]
+      for i in range(n_nodes):
+        best = -1
+        best_value = -np.inf
+        for j in range(n_nodes):
+          if not adjacency[i, j]:
+            continue
+          target = r - steps[h, i, j]
+          if target < 0:
+            continue
+          future = values[target, b, j]
+          if target == r and j >= i:
+            # Not filled yet for this bucket
+            future = 0.0
+          candidate = fare[h, i, j] * w + gamma * future
+          if candidate > best_value:
+            best = j
+            best_value = candidate
+        if best_value > 0.0:
+          values[r, b, i] = best_value
+          next_node[r, b, i] = best
+          next_steps[r, b, i] = steps[h, i, best]
+        else:
+          values[r, b, i] = 0.0
+          next_node[r, b, i] = -1
+          next_steps[r, b, i] = 0
+
+
+fill_table = njit(cache=True, nogil=True)(_fill_table) if njit is not None else None
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Nightly precompute of recommendation tables for the API.
+
+Solves every city x start hour x shift length x date of a horizon with the
+DP optimizer and writes the ranked start clusters, values and paths, and the
+value and policy table of every shift, to a memory-mapped
+``RecommendationStore``. The API loads the store at startup and answers
+matching requests by lookup, falling back to live DP for anything else.
+With --redis the store is also copied into the Redis result cache shared
+by every worker.
+
+Usage examples:
+    python3 dp_precompute.py --start-date 2023-01-15 --days 7
+    python3 dp_precompute.py --start-date 2023-01-15 --days 1 --cities 1 3 --durations 4 8
+    python3 dp_precompute.py --start-date 2023-01-15 --redis
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from dynamic_programming_optimizer import get_db_manager, get_optimizer
+from recommendation_store import DEFAULT_STORE_PATH, RecommendationStore
+
+
+def parse_date(date_str: str) -> datetime:
+  """Parse date string in YYYY-MM-DD format."""
+  try:
+    return datetime.strptime(date_str, "%Y-%m-%d")
+  except ValueError:
+    raise argparse.ArgumentTypeError(f"Invalid date format: {date_str}. Use YYYY-MM-DD")
+
+
+def precompute(
+  optimizer,
+  cities: list[int],
+  start_date: datetime,
+  days: int,
+  start_hours: list[int],
+  durations: list[int],
+  max_workers: int | None = None,
+) -> RecommendationStore:
+  """Solve every shift of the horizon and pack the results into a store.
+
+  Shifts whose forecast, surge and parameters match share one row, and each
+  distinct shift fills a single value table for all of its start clusters;
+  the same table is written to the store, so no shift is solved twice.
+
+  Args:
+      optimizer: MobilityOptimizer with the serving parameters
+      cities: City identifiers
+      start_date: First date of the horizon
+      days: Number of dates
+      start_hours: Starting hours (0-23)
+      durations: Shift lengths in hours
+      max_workers: Solver threads, one per CPU if None
+
+  Returns:
+      Store of every distinct shift
+
+  """
+  # Shift key -> (city_id, start_hour, work_hours, date) of its first occurrence
+  shifts: dict[str, tuple[int, int, int, datetime]] = {}
+  for city_id in cities:
+    for offset in range(days):
+      date = start_date + timedelta(days=offset)
+      for start_hour in start_hours:
+        for work_hours in durations:
+          scenario = optimizer._get_scenario_key(city_id, start_hour, work_hours, date)
+          key = RecommendationStore.shift_key(city_id, start_hour, work_hours, scenario)
+          shifts.setdefault(key, (city_id, start_hour, work_hours, date))
+
+  nodes = {city_id: list(optimizer.compiled[city_id].nodes) for city_id in cities}
+  n_clusters = sum(len(nodes[city_id]) for city_id, *_ in shifts.values())
+  print(f"Solving {len(shifts)} distinct shifts ({n_clusters} start clusters)...")
+  # Build engines up front so that threads do not race to create them
+  for city_id, _, work_hours, _ in shifts.values():
+    optimizer._grid_engine(city_id, optimizer._time_grid(work_hours))
+
+  def solve_shift(item):
+    key, (city_id, start_hour, work_hours, date) = item
+    table, shift_results = optimizer._solve_shift(city_id, start_hour, work_hours, date)
+    clusters = nodes[city_id]
+    # Sort by expected earnings (descending), ties in graph order
+    order = sorted(range(len(clusters)), key=lambda k: shift_results[k][0], reverse=True)
+    return key, city_id, [(clusters[k], *shift_results[k]) for k in order], table
+
+  metadata = {
+    "built_at": datetime.now().isoformat(timespec="seconds"),
+    "start_date": start_date.strftime("%Y-%m-%d"),
+    "days": days,
+    "start_hours": start_hours,
+    "durations": durations,
+    "gamma": optimizer.gamma,
+    "lambda_floor": optimizer.lambda_floor,
+  }
+  workers = max(1, min(len(shifts), max_workers or os.cpu_count() or 1))
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    return RecommendationStore.build(executor.map(solve_shift, shifts.items()), nodes, metadata)
+
+
+async def load_into_redis(store: RecommendationStore) -> int:
+  """Copy a store into the Redis result cache."""
+  db = get_db_manager()
+  await db.init_redis()
+  try:
+    return await store.load_into_redis(db)
+  finally:
+    await db.close_redis()
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description="Precompute DP recommendation tables for the API",
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+  )
+  parser.add_argument(
+    "--start-date",
+    type=parse_date,
+    default=datetime.now().replace(hour=0, minute=0, second=0, microsecond=0),
+    help="First date in YYYY-MM-DD format (default: today)",
+  )
+  parser.add_argument("--days", type=int, default=7, help="Dates to cover (default: 7)")
+  parser.add_argument("--cities", type=int, nargs="+", help="City IDs (default: all)")
+  parser.add_argument(
+    "--start-hours", type=int, nargs="+", default=list(range(24)), help="Starting hours (0-23)"
+  )
+  parser.add_argument(
+    "--durations", type=int, nargs="+", default=list(range(1, 13)), help="Shift lengths in hours"
+  )
+  parser.add_argument(
+    "--output", type=str, default=str(DEFAULT_STORE_PATH), help="Store directory to write"
+  )
+  parser.add_argument("--redis", action="store_true", help="Also load the store into Redis")
+  parser.add_argument("--workers", type=int, help="Solver threads (default: one per CPU)")
+
+  # Optimizer parameters, which must match the API's for its lookups to hit
+  parser.add_argument(
+    "--epsilon", type=float, default=0.1, help="Laplace smoothing parameter (default: 0.1)"
+  )
+  parser.add_argument("--gamma", type=float, default=0.95, help="Discount factor (default: 0.95)")
+  parser.add_argument(
+    "--lambda-floor", type=float, default=0.5, help="Minimum demand rate (default: 0.5)"
+  )
+
+  args = parser.parse_args()
+
+  if any(hour < 0 or hour > 23 for hour in args.start_hours):
+    print("Error: Hours must be between 0 and 23")
+    sys.exit(1)
+
+  if any(hours < 1 or hours > 24 for hours in args.durations):
+    print("Error: Durations must be between 1 and 24 hours")
+    sys.exit(1)
+
+  optimizer = get_optimizer(epsilon=args.epsilon, gamma=args.gamma, lambda_floor=args.lambda_floor)
+  cities = args.cities or sorted(optimizer.graphs)
+  unknown = [city_id for city_id in cities if city_id not in optimizer.graphs]
+  if unknown:
+    print(f"Error: Cities {unknown} not found. Available cities: {list(optimizer.graphs.keys())}")
+    sys.exit(1)
+
+  started = time.perf_counter()
+  store = precompute(
+    optimizer,
+    cities,
+    args.start_date,
+    args.days,
+    args.start_hours,
+    args.durations,
+    max_workers=args.workers,
+  )
+  path = store.save(args.output)
+  print(
+    f"✓ Wrote {len(store)} shifts to {path} ({store.stats()['bytes'] / 1024:.0f} KiB) "
+    f"in {time.perf_counter() - started:.1f}s"
+  )
+
+  if args.redis:
+    print(f"✓ Loaded {asyncio.run(load_into_redis(store))} shifts into Redis")
+
+
+if __name__ == "__main__":
+  main()
@@ -6,24 +6,78 @@ over a given time horizon in a city-hour mobility graph system.
 The algorithm uses backward induction to compute the optimal expected earnings
 for a driver starting at a specific cluster and hour, planning to work for L hours.
 
-PERFORMANCE OPTIMIZATIONS:
-- Singleton pattern to prevent graph rebuilding
-- Graph serialization to pickle/Redis for fast loading
-- Transition probability caching per (city, hour)
-- DP result memoization with configurable TTL
+Architecture:
+- CityDataset: graphs, surge and their compiled arrays (compiled_graph), loaded
+  once per process from the graph cache and shared by every optimizer; applies
+  live surge and completed-trip updates
+- MobilityOptimizer: solver parameters, result caches and the solve API, one
+  instance per parameter set (OptimizerRegistry)
+- dp_engine: vectorized backward induction over a city's arrays on a time
+  grid, with an optional Numba kernel (dp_kernels)
+- Results are keyed by shift scenario (forecast weather, surge, data version)
+  and served from bounded in-process caches, Redis and the nightly
+  precomputed store (recommendation_store) before solving; concurrent async
+  solves are coalesced and may run in worker processes (compute_pool)
 """
 
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import ClassVar
+from typing import Any, NamedTuple
+import asyncio
+import hashlib
+import inspect
+import os
 import pickle
+import threading
+import time
+import weakref
 from pathlib import Path
 
 import networkx as nx
+import numpy as np
 import pandas as pd
 
-from app.graph_builder import build_city_graphs, rides
+from app.compiled_graph import (
+  HOURS_PER_DAY,
+  CompiledCityGraph,
+  load_compiled_graphs,
+  save_compiled_graphs,
+)
+from app.compute_pool import OptimizerPool, WorkerGraphMismatchError
+from app.dp_engine import (
+  TIME_STEP_MINUTES,
+  CityDPEngine,
+  DayValueTable,
+  StepSchedule,
+  TimeGrid,
+  ValueTable,
+  first_affected_bucket,
+  validate_step_schedule,
+)
+from app.datasets import RIDES_CSV_PATH, get_rides, get_surge, iter_rides
+from app.graph_builder import (
+  GRAPH_COLUMNS,
+  HEX_COLUMNS,
+  HexKey,
+  build_city_graphs,
+  build_city_graphs_streaming,
+  build_hex_index,
+)
+from app.recommendation_store import DEFAULT_STORE_PATH, RecommendationStore
+from app.result_cache import BoundedCache
+from app.ride_accumulator import EdgeKey, RideAccumulator
+from app.single_flight import SingleFlight, redis_single_flight
 from app.weather_predictor import get_weather_for_date
 
+# Ride CSVs larger than this build the graphs in streamed chunks
+STREAMING_BUILD_MIN_BYTES = 1024**3
+# Minimum seconds between republishing a city's graph with new completed trips
+TRIP_PUBLISH_SECONDS = 60.0
+# Seconds a live hexagon surge reading counts, as long as Redis keeps it
+LIVE_SURGE_TTL_SECONDS = 300.0
+
 # Import db_manager for Redis caching (lazy import to avoid circular dependency)
 _db_manager = None
 
@@ -38,61 +92,51 @@ def get_db_manager():
   return _db_manager
 
 
-class MobilityOptimizer:
-  """Dynamic Programming optimizer for ride-sharing driver earnings.
+class CityDataset:
+  """City graphs, surge table and compiled arrays shared by optimizer instances.
 
-  This class implements the city-hour mobility graph concept where:
-  - Nodes represent pickup/dropoff clusters
-  - Edges store hourly statistics (trip counts, fares, durations)
-  - DP computes optimal L-hour strategies starting from any cluster/hour
-
-  SINGLETON PATTERN: Only one instance is created to avoid rebuilding graphs.
+  Loading and compiling the graphs is the expensive part of building an
+  optimizer, and none of it depends on the solver parameters, so one dataset
+  per process serves every parameter set. Surge changes and graphs updated
+  with completed trips are pushed to every optimizer built on the dataset.
   """
 
-  _instance: ClassVar["MobilityOptimizer | None"] = None
-  _initialized: ClassVar[bool] = False
-
-  def __new__(cls, *args, **kwargs):
-    """Implement singleton pattern to prevent multiple graph loads."""
-    if cls._instance is None:
-      cls._instance = super().__new__(cls)
-    return cls._instance
-
-  def __init__(
-    self,
-    epsilon: float = 0.1,
-    gamma: float = 0.95,
-    lambda_floor: float = 0.5,
-    weather_multipliers: dict[str, float] | None = None,
-    use_cache: bool = True,
-  ):
-    """Initialize the optimizer with parameters.
+  def __init__(self, use_cache: bool = True):
+    """Load and compile the city graphs.
 
     Args:
-        epsilon: Laplace smoothing parameter for transition probabilities
-        gamma: Discount factor for future earnings (0 < gamma <= 1)
-        lambda_floor: Minimum demand rate to prevent division by zero
-        weather_multipliers: Dictionary mapping weather conditions to multipliers
         use_cache: Whether to use cached graphs (default: True)
 
     """
-    # Only initialize once (singleton pattern)
-    if MobilityOptimizer._initialized:
-      return
-
-    self.epsilon = epsilon
-    self.gamma = gamma
-    self.lambda_floor = lambda_floor
     self.use_cache = use_cache
-
-    # Caches for intermediate results
-    self._transition_prob_cache: dict = {}  # (city_id, hour) -> transition_probs
-    self._dp_cache: dict = {}  # For in-memory DP result caching
+    # (city_id, hour) -> hexagon_id -> (latest live surge multiplier, time.monotonic() received)
+    self._live_surge: dict[tuple[int, int], dict[str, tuple[float, float]]] = {}
+    # (city_id, hour) -> multiplier before the live readings, restored once they all expire
+    self._base_surge: dict[tuple[int, int], float] = {}
+    self.live_surge_ttl_seconds = LIVE_SURGE_TTL_SECONDS
+    # city_id -> update counter, odd while a surge or graph update is being
+    # applied (see ``is_current``); local to this process, never part of a key
+    self.city_versions: dict[int, int] = {}
+    # Guards live surge and trip updates, which arrive from threads and timers
+    self._live_lock = threading.RLock()
+    # (task, city_id) -> pending timer of a deferred update
+    self._timers: dict[tuple[str, int], threading.Timer] = {}
+    # Optimizers to notify of surge changes
+    self._subscribers: weakref.WeakSet = weakref.WeakSet()
+    # Nightly precomputed results, checked before solving
+    self.recommendations: RecommendationStore | None = None
+    # Ride sums behind the graphs and the hexagon index, built on the first completed trip
+    self._trip_stats: RideAccumulator | None = None
+    self._hex_index: dict[HexKey, tuple[str, float, float]] | None = None
+    # city_id -> edges with completed trips not yet published to the graphs
+    self._pending_edges: dict[int, set[EdgeKey]] = {}
+    # city_id -> time.monotonic() of the last publish
+    self._published_at: dict[int, float] = {}
+    self.trip_publish_seconds = TRIP_PUBLISH_SECONDS
 
     # Load data (with caching)
     self._load_data()
-
-    MobilityOptimizer._initialized = True
+    self._compile_graphs()
 
   def _get_cache_path(self) -> Path:
     """Get path for cached graph pickle file."""
@@ -119,10 +163,14 @@ class MobilityOptimizer:
 
     # Build from scratch
     print("Building mobility graphs from CSV...")
-    self.graphs = build_city_graphs(rides)
+    if os.path.getsize(RIDES_CSV_PATH) > STREAMING_BUILD_MIN_BYTES:
+      # Too large to load at once: fold the rides into running sums chunk by chunk
+      self.graphs = build_city_graphs_streaming(iter_rides(columns=GRAPH_COLUMNS))
+    else:
+      self.graphs = build_city_graphs(get_rides(columns=GRAPH_COLUMNS))
 
     print("Loading surge pricing data...")
-    self.surge_data = pd.read_csv("data/surge_by_hour.csv")
+    self.surge_data = get_surge()
     # Create surge lookup: (city_id, hour) -> multiplier
     self.surge_lookup = {}
     for _, row in self.surge_data.iterrows():
@@ -132,362 +180,1730 @@ class MobilityOptimizer:
 
     # Save to cache for next time
     if self.use_cache:
+      self._save_graph_cache()
+
+  def _save_graph_cache(self) -> None:
+    """Write the graphs and surge table to the graph cache, replacing it atomically.
+
+    Live surge readings are transient, so the multipliers from before them
+    are saved instead.
+    """
+    cache_path = self._get_cache_path()
+    # Unique per writer: trip publishes of several cities may save at once
+    partial = cache_path.with_name(
+      f".{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    try:
+      print(f"Caching graphs to {cache_path}...")
+      with open(partial, "wb") as f:
+        pickle.dump(
+          {
+            "graphs": self.graphs,
+            "surge_lookup": {**self.surge_lookup, **self._base_surge},
+          },
+          f,
+          protocol=pickle.HIGHEST_PROTOCOL,
+        )
+      os.replace(partial, cache_path)
+      print("✓ Graph cache saved")
+    except Exception as e:
+      print(f"Warning: Failed to save cache: {e}")
+
+  def _compile_graphs(self):
+    """Build the array-backed view of every city graph used on the hot path.
+
+    With caching on, the arrays live in a memory-mapped store next to the
+    graph cache: the first process compiles and writes it, and every other
+    worker maps the same read-only pages instead of compiling its own copy.
+    """
+    cache_path = self._get_cache_path()
+    store_path = cache_path.with_name("compiled_graphs")
+    source = None
+    if self.use_cache and cache_path.exists():
+      # The store is only valid for the graph cache file it was compiled from
+      stat = cache_path.stat()
+      source = f"{cache_path.name}:{stat.st_size}:{stat.st_mtime_ns}"
       try:
-        print(f"Caching graphs to {cache_path}...")
-        with open(cache_path, "wb") as f:
-          pickle.dump(
-            {
-              "graphs": self.graphs,
-              "surge_lookup": self.surge_lookup,
-            },
-            f,
-            protocol=pickle.HIGHEST_PROTOCOL,
-          )
-        print("✓ Graph cache saved")
+        compiled = load_compiled_graphs(store_path, source)
+        if compiled is not None and compiled.keys() == self.graphs.keys():
+          self.compiled = compiled
+          print(f"✓ Mapped compiled graphs from {store_path}")
+          return
       except Exception as e:
-        print(f"Warning: Failed to save cache: {e}")
+        print(f"Compiled graph store load failed: {e}, recompiling...")
+
+    self.compiled = {
+      city_id: CompiledCityGraph.from_graph(graph) for city_id, graph in self.graphs.items()
+    }
+    if source is not None:
+      try:
+        save_compiled_graphs(store_path, self.compiled, source)
+      except Exception as e:
+        print(f"Warning: Failed to save compiled graphs: {e}")
 
   def get_surge_multiplier(self, city_id: int, hour: int) -> float:
     """Get surge multiplier for a city and hour."""
     return self.surge_lookup.get((city_id, hour), 1.0)
 
+  def surge_by_hour(self, city_id: int) -> np.ndarray:
+    """Get the surge multiplier of every hour of day for a city, shape (24,)."""
+    return np.array([self.get_surge_multiplier(city_id, hour) for hour in range(HOURS_PER_DAY)])
+
+  def subscribe(self, optimizer: "MobilityOptimizer") -> None:
+    """Register an optimizer to be told about surge changes."""
+    self._subscribers.add(optimizer)
+
+  def update_surge(self, city_id: int, surge_by_hour: dict[int, float]) -> set[int]:
+    """Set surge multipliers of a city and notify every subscribed optimizer.
+
+    Args:
+        city_id: City identifier
+        surge_by_hour: New surge multiplier per hour of day
+
+    Returns:
+        Hours whose multiplier changed
+
+    """
+    with self._live_lock:
+      changed = {
+        hour % HOURS_PER_DAY
+        for hour, multiplier in surge_by_hour.items()
+        if float(multiplier) != self.get_surge_multiplier(city_id, hour % HOURS_PER_DAY)
+      }
+      if not changed:
+        return changed
+
+      previous = self.surge_by_hour(city_id)
+      with self._city_update(city_id):
+        for hour, multiplier in surge_by_hour.items():
+          self.surge_lookup[(city_id, hour % HOURS_PER_DAY)] = float(multiplier)
+        for optimizer in list(self._subscribers):
+          optimizer._reprice_engines(city_id)
+          optimizer._invalidate_surge(city_id, changed, previous)
+      return changed
+
+  @contextmanager
+  def _city_update(self, city_id: int) -> Iterator[None]:
+    """Bracket an update of a city's surge or graph, keeping its version odd meanwhile."""
+    self.city_versions[city_id] = self.city_versions.get(city_id, 0) + 1
+    try:
+      yield
+    finally:
+      self.city_versions[city_id] += 1
+
+  def city_version(self, city_id: int) -> int:
+    """Update counter of a city, to read before a solve and pass to ``is_current``."""
+    return self.city_versions.get(city_id, 0)
+
+  def is_current(self, city_id: int, version: int) -> bool:
+    """Whether no update of the city started since ``city_version`` returned version.
+
+    A solve may read prices and graphs of two versions if an update lands
+    while it runs, so its result is only cached if this holds afterwards.
+    """
+    return version % 2 == 0 and self.city_versions.get(city_id, 0) == version
+
+  def record_hexagon_surge(
+    self, city_id: int, hexagon_id: str, surge_multiplier: float, timestamp: datetime
+  ) -> set[int]:
+    """Fold a live per-hexagon surge reading into the city's hourly surge.
+
+    Surge is priced per (city, hour), so the city multiplier for the reading's
+    hour becomes the mean of the latest reading of every hexagon reported at
+    that hour. Readings count for ``live_surge_ttl_seconds``; once every
+    reading of an hour has expired, the hour returns to its multiplier from
+    before the live readings, so a reading does not reprice that hour on
+    later dates.
+
+    Args:
+        city_id: City identifier
+        hexagon_id: Hexagon zone identifier
+        surge_multiplier: Current surge multiplier of the hexagon
+        timestamp: Time of the reading
+
+    Returns:
+        Hours whose multiplier changed
+
+    """
+    with self._live_lock:
+      hour = timestamp.hour
+      self._base_surge.setdefault((city_id, hour), self.get_surge_multiplier(city_id, hour))
+      readings = self._live_surge.setdefault((city_id, hour), {})
+      readings[hexagon_id] = (float(surge_multiplier), time.monotonic())
+      self._schedule("surge", city_id, self.live_surge_ttl_seconds, self.expire_live_surge)
+      return self._refresh_live_surge(city_id)
+
+  def _refresh_live_surge(self, city_id: int) -> set[int]:
+    """Drop expired readings of a city and reset every hour with readings to their mean."""
+    now = time.monotonic()
+    surge_by_hour = {}
+    for (reading_city, hour), readings in list(self._live_surge.items()):
+      if reading_city != city_id:
+        continue
+      for hexagon_id, (_, received_at) in list(readings.items()):
+        if now - received_at >= self.live_surge_ttl_seconds:
+          del readings[hexagon_id]
+      if readings:
+        surge_by_hour[hour] = float(np.mean([multiplier for multiplier, _ in readings.values()]))
+      else:
+        del self._live_surge[city_id, hour]
+        surge_by_hour[hour] = self._base_surge.pop((city_id, hour))
+    return self.update_surge(city_id, surge_by_hour)
+
+  def expire_live_surge(self, city_id: int) -> set[int]:
+    """Drop the expired live surge readings of a city, restoring hours left without any.
+
+    Runs on a timer after each reading, and again until no reading is left.
+
+    Args:
+        city_id: City identifier
+
+    Returns:
+        Hours whose multiplier changed
+
+    """
+    with self._live_lock:
+      changed = self._refresh_live_surge(city_id)
+      received = [
+        received_at
+        for (reading_city, _), readings in self._live_surge.items()
+        if reading_city == city_id
+        for _, received_at in readings.values()
+      ]
+      if received:
+        delay = min(received) + self.live_surge_ttl_seconds - time.monotonic()
+        self._schedule("surge", city_id, max(delay, 0.0), self.expire_live_surge)
+      return changed
+
+  def _schedule(
+    self, task: str, city_id: int, delay: float, callback: Callable[[int], Any]
+  ) -> None:
+    """Run callback(city_id) on a daemon timer after delay seconds, unless already pending."""
+    key = (task, city_id)
+    with self._live_lock:
+      if key in self._timers:
+        return
+
+      def run():
+        with self._live_lock:
+          self._timers.pop(key, None)
+        try:
+          callback(city_id)
+        except Exception as e:
+          print(f"Warning: Deferred {task} update of city {city_id} failed: {e}")
+
+      timer = threading.Timer(delay, run)
+      timer.daemon = True
+      self._timers[key] = timer
+      timer.start()
+
+  def _load_hex_index(self) -> dict[HexKey, tuple[str, float, float]]:
+    """Map the hexagons of the ride history to clusters (see ``build_hex_index``)."""
+    print("Indexing ride hexagons...")
+    if os.path.getsize(RIDES_CSV_PATH) > STREAMING_BUILD_MIN_BYTES:
+      return build_hex_index(iter_rides(columns=HEX_COLUMNS))
+    return build_hex_index([get_rides(columns=HEX_COLUMNS)])
+
+  def record_completed_trip(
+    self,
+    city_id: int,
+    pickup_hex: str,
+    drop_hex: str,
+    start_time: datetime,
+    duration_mins: float,
+    fare_amount: float,
+  ) -> EdgeKey | None:
+    """Add a completed trip to the running per-edge, per-hour ride sums.
+
+    The update itself is O(1). The first call recovers the sums from the
+    loaded graphs and indexes the ride hexagons, which reads the ride data;
+    call it off the event loop. The city's graphs are republished with the
+    trip right away if the last publish is at least ``trip_publish_seconds``
+    old, and otherwise by a timer once it is.
+
+    Args:
+        city_id: City identifier
+        pickup_hex: Pickup hexagon
+        drop_hex: Drop-off hexagon
+        start_time: Start of the trip
+        duration_mins: Trip duration in minutes
+        fare_amount: Trip fare
+
+    Returns:
+        (city_id, pickup cluster, dropoff cluster) of the updated edge, or None
+        if a hexagon is not in the ride history
+
+    """
+    with self._live_lock:
+      if self._hex_index is None:
+        self._hex_index = self._load_hex_index()
+      pickup = self._hex_index.get((city_id, pickup_hex))
+      dropoff = self._hex_index.get((city_id, drop_hex))
+      if pickup is None or dropoff is None:
+        return None
+
+      if self._trip_stats is None:
+        self._trip_stats = RideAccumulator.from_graphs(self.graphs)
+      key = self._trip_stats.add_trip(
+        city_id,
+        pickup[0],
+        dropoff[0],
+        start_time.hour,
+        duration_mins,
+        fare_amount,
+        pickup[1:],
+        dropoff[1:],
+      )
+      self._pending_edges.setdefault(city_id, set()).add(key)
+
+      published_at = self._published_at.get(city_id)
+      wait = 0.0
+      if published_at is not None:
+        wait = published_at + self.trip_publish_seconds - time.monotonic()
+      if wait <= 0:
+        self.publish_trip_updates(city_id)
+      else:
+        # Quiet cities still get their trips published once the window ends
+        self._schedule("trips", city_id, wait, self.publish_trip_updates)
+      return key
+
+  def publish_trip_updates(self, city_id: int) -> int:
+    """Write the pending completed trips of a city into its graphs.
+
+    The updated edges and their end nodes get new attributes in the
+    NetworkX graph, the compiled graph is replaced by a copy with those rows
+    updated (see ``CompiledCityGraph.with_updates``), and every subscribed
+    optimizer drops what it derived from the old graph. The new content
+    changes the city's data version, so DP results of the old graph, cached
+    or precomputed, are no longer looked up. With caching on, the graph
+    cache is rewritten, so the next process starts from the updated graphs.
+
+    Args:
+        city_id: City identifier
+
+    Returns:
+        Number of edges updated
+
+    """
+    with self._live_lock:
+      self._published_at[city_id] = time.monotonic()
+      edges = sorted(self._pending_edges.pop(city_id, ()))
+      if not edges:
+        return 0
+
+      graph = self.graphs[city_id]
+      with self._city_update(city_id):
+        for key in edges:
+          _, pickup, dropoff = key
+          for node in (pickup, dropoff):
+            lat, lon = self._trip_stats.node_position((city_id, node))
+            graph.add_node(node, lat=lat, lon=lon)
+          graph.add_edge(pickup, dropoff, **self._trip_stats.edge_attributes(key))
+        self.compiled[city_id] = self.compiled[city_id].with_updates(
+          graph, [(pickup, dropoff) for _, pickup, dropoff in edges]
+        )
+        for optimizer in list(self._subscribers):
+          optimizer._invalidate_graph(city_id)
+
+      if self.use_cache:
+        self._save_graph_cache()
+      return len(edges)
+
+
+# solve_dp solvers: the full value table, or labels reachable from the start
+DP_SOLVERS = ("grid", "labels")
+
+# Coarse time grids tried by anytime solves, in minutes, before the full grid
+ANYTIME_STEP_LADDER = (30, 15, 10)
+
+
+class AnytimeResult(NamedTuple):
+  """Best strategy an anytime solve found within its latency budget."""
+
+  earnings: float
+  path: list[str]
+  step_minutes: StepSchedule  # time grid the result was solved on
+  exact: bool  # whether it is the full-resolution optimum
+
+
+class DPQuery(NamedTuple):
+  """One ``solve_dp`` call of a batch."""
+
+  city_id: int
+  start_cluster: str
+  start_hour: int
+  work_hours: int
+  start_date: datetime
+
+
+# One dataset per use_cache setting, shared by every optimizer in the process
+_datasets: dict[bool, CityDataset] = {}
+_datasets_lock = threading.Lock()
+
+
+def get_dataset(use_cache: bool = True) -> CityDataset:
+  """Get the process-wide city dataset, loading it on first use."""
+  with _datasets_lock:
+    if use_cache not in _datasets:
+      _datasets[use_cache] = CityDataset(use_cache=use_cache)
+    return _datasets[use_cache]
+
+
+def load_recommendations(path: Path | str = DEFAULT_STORE_PATH) -> RecommendationStore | None:
+  """Serve the nightly precomputed store from the process-wide dataset, if it exists.
+
+  Args:
+      path: Store written by ``dp_precompute.py``
+
+  Returns:
+      The loaded store, or None if there is no store file
+
+  """
+  path = Path(path)
+  if not path.exists():
+    print(f"No precomputed recommendations at {path}, using live DP only")
+    return None
+  store = RecommendationStore.load(path)
+  get_dataset().recommendations = store
+  print(f"✓ Loaded {len(store)} precomputed shifts from {path}")
+  return store
+
+
+class MobilityOptimizer:
+  """Dynamic Programming optimizer for ride-sharing driver earnings.
+
+  This class implements the city-hour mobility graph concept where:
+  - Nodes represent pickup/dropoff clusters
+  - Edges store hourly statistics (trip counts, fares, durations)
+  - DP computes optimal L-hour strategies starting from any cluster/hour
+
+  Instances are lightweight: graphs come from a shared ``CityDataset`` and
+  each instance only holds its own solver parameters, DP arrays and result
+  caches. Use ``get_optimizer`` to reuse one instance per parameter set.
+  """
+
+  def __init__(
+    self,
+    epsilon: float = 0.1,
+    gamma: float = 0.95,
+    lambda_floor: float = 0.5,
+    weather_multipliers: dict[str, float] | None = None,
+    use_cache: bool = True,
+    cache_max_entries: int | None = 10_000,
+    cache_max_bytes: int | None = 64 * 1024 * 1024,
+    cache_ttl_seconds: float | None = 3600.0,
+    redis_lock_ttl_seconds: float | None = None,
+    step_minutes: StepSchedule = TIME_STEP_MINUTES,
+    dataset: CityDataset | None = None,
+  ):
+    """Initialize the optimizer with parameters.
+
+    Args:
+        epsilon: Laplace smoothing parameter for transition probabilities
+        gamma: Discount factor for future earnings (0 < gamma <= 1)
+        lambda_floor: Minimum demand rate to prevent division by zero
+        weather_multipliers: Dictionary mapping weather conditions to multipliers
+        use_cache: Whether to use cached graphs (default: True)
+        cache_max_entries: Entry limit of each in-memory result cache
+        cache_max_bytes: Estimated byte limit of each in-memory result cache
+        cache_ttl_seconds: Time to live of in-memory results, None for no expiry
+        redis_lock_ttl_seconds: If set, async solves also coalesce across worker
+          processes through a Redis lock with this expiry
+        step_minutes: Time bucket length in minutes, or a multi-resolution
+          schedule of (minutes into the shift, bucket length) pairs such as
+          ((0, 1), (60, 15)); see ``TimeGrid.for_shift``
+        dataset: Graphs to solve on, the process-wide dataset if None
+
+    """
+    self.dataset = dataset if dataset is not None else get_dataset(use_cache)
+    self.epsilon = epsilon
+    self.gamma = gamma
+    self.lambda_floor = lambda_floor
+    validate_step_schedule(step_minutes)
+    self.step_minutes = step_minutes
+    self.use_cache = use_cache
+    self.redis_lock_ttl_seconds = redis_lock_ttl_seconds
+    # Arguments that select this optimizer in a compute pool worker
+    self._worker_kwargs = {
+      "epsilon": epsilon,
+      "gamma": gamma,
+      "lambda_floor": lambda_floor,
+      "weather_multipliers": weather_multipliers,
+      "use_cache": use_cache,
+      "cache_max_entries": cache_max_entries,
+      "cache_max_bytes": cache_max_bytes,
+      "cache_ttl_seconds": cache_ttl_seconds,
+      "step_minutes": step_minutes,
+    }
+    self.compute_pool: OptimizerPool | None = None
+    # Cities whose graph has changed since the pool workers loaded theirs
+    self._local_cities: set[int] = set()
+
+    # Bounded caches for intermediate results
+    cache_limits = {
+      "max_entries": cache_max_entries,
+      "max_bytes": cache_max_bytes,
+      "ttl_seconds": cache_ttl_seconds,
+    }
+    # (city_id, hour) -> transition matrix
+    self._transition_prob_cache = BoundedCache("transition_probs", **cache_limits)
+    # DP cache key -> (earnings, path)
+    self._dp_cache = BoundedCache("dp_results", **cache_limits)
+    # (city_id, start_date, start_hour, work_hours, city update counter) -> scenario key
+    self._scenario_keys = BoundedCache("scenario_keys", **cache_limits)
+    # (city_id, date) -> absolute-clock value tables
+    self._day_tables = BoundedCache("day_tables", **cache_limits)
+    # (city_id, start_hour, work_hours, weather key, surge key, data version)
+    #   -> (value table, stale_from)
+    self._value_tables = BoundedCache("value_tables", **cache_limits)
+    self._engines: dict[int, CityDPEngine] = {}  # city_id -> dense DP arrays
+    # (city_id, step_minutes) -> engines on other time grids, sharing fare arrays
+    self._coarse_engines: dict[tuple[int, int], CityDPEngine] = {}
+    # Full-resolution solves left running by anytime solves
+    self._background_solves: set[asyncio.Task] = set()
+    self._data_versions: dict[int, str] = {}  # city_id -> graph/parameter fingerprint
+    # Cache key -> in-flight async computation
+    self._inflight = SingleFlight("async_solves")
+
+    self.dataset.subscribe(self)
+
+  @property
+  def graphs(self) -> dict[int, nx.DiGraph]:
+    """City graphs of the shared dataset."""
+    return self.dataset.graphs
+
+  @property
+  def compiled(self) -> dict[int, CompiledCityGraph]:
+    """Compiled city graphs of the shared dataset."""
+    return self.dataset.compiled
+
+  @property
+  def surge_lookup(self) -> dict[tuple[int, int], float]:
+    """(city_id, hour) -> surge multiplier of the shared dataset."""
+    return self.dataset.surge_lookup
+
+  def get_surge_multiplier(self, city_id: int, hour: int) -> float:
+    """Get surge multiplier for a city and hour."""
+    return self.dataset.get_surge_multiplier(city_id, hour)
+
+  def _get_compiled(self, graph: nx.DiGraph, city_id: int | None) -> CompiledCityGraph:
+    """Get the compiled form of a graph, reusing the prebuilt one for known cities."""
+    if city_id is not None and self.graphs.get(city_id) is graph:
+      return self.compiled[city_id]
+    return CompiledCityGraph.from_graph(graph)
+
+  def _get_engine(self, city_id: int, step_minutes: int = TIME_STEP_MINUTES) -> CityDPEngine:
+    """Get the dense DP engine for a city and time grid, building it on first use."""
+    if city_id not in self._engines:
+      self._engines[city_id] = CityDPEngine(
+        self.compiled[city_id], self.dataset.surge_by_hour(city_id), self.gamma, self.lambda_floor
+      )
+    if step_minutes == TIME_STEP_MINUTES:
+      return self._engines[city_id]
+
+    # Engines on other grids share the fare arrays of the current engine
+    engine = self._engines[city_id]
+    key = (city_id, step_minutes)
+    coarse = self._coarse_engines.get(key)
+    if coarse is None:
+      coarse = self._coarse_engines[key] = engine.with_step_minutes(step_minutes)
+    elif coarse.fare is not engine.fare:
+      # Repriced by a surge update since it was built
+      coarse = self._coarse_engines[key] = coarse.with_fares_of(engine)
+    return coarse
+
+  def _time_grid(self, work_hours: int, step_minutes: StepSchedule | None = None) -> TimeGrid:
+    """Time buckets of a shift at this optimizer's resolution, or another one."""
+    schedule = self.step_minutes if step_minutes is None else step_minutes
+    return TimeGrid.for_shift(work_hours, schedule)
+
+  def _grid_engine(self, city_id: int, grid: TimeGrid) -> CityDPEngine:
+    """Get the engine solving on a time grid: one of its bucket length if uniform."""
+    return self._get_engine(city_id, grid.step_minutes or TIME_STEP_MINUTES)
+
+  def _shift_conditions(
+    self, city_id: int, start_hour: int, start_date: datetime, grid: TimeGrid
+  ) -> tuple[np.ndarray, np.ndarray]:
+    """Get hour of day and weather multiplier for every bucket of a shift.
+
+    Both arrays are indexed by the number of remaining time buckets, the same
+    way the DP value table is.
+
+    Args:
+        city_id: City identifier
+        start_hour: Starting hour (0-23)
+        start_date: Starting date for weather lookup
+        grid: Time buckets of the shift
+
+    Returns:
+        Tuple of (hours, weather_multipliers), each of shape (n_steps + 1,)
+
+    """
+    hours = grid.hours(start_hour)
+    weather = np.ones(grid.n_steps + 1)
+
+    elapsed = grid.elapsed_minutes.tolist()
+    for remaining in range(1, grid.n_steps + 1):
+      current_date = start_date + timedelta(minutes=elapsed[remaining])
+      _, weather[remaining] = get_weather_for_date(city_id, current_date)
+
+    return hours, weather
+
   def compute_transition_probabilities(
     self, graph: nx.DiGraph, hour: int, city_id: int | None = None
   ) -> dict[str, dict[str, float]]:
     """Compute transition probabilities P_h(i->j) for a given hour.
 
-    Uses Laplace smoothing: P_h(i->j) = (count_ij[h] + ε) / (Σ_k count_ik[h] + ε·|V|)
+    Uses Laplace smoothing: P_h(i->j) = (count_ij[h] + ε) / (Σ_k count_ik[h] + ε·|V|)
+
+    OPTIMIZED: Caches results per (city_id, hour) to avoid recomputation.
+
+    Args:
+        graph: NetworkX graph for the city
+        hour: Hour of day (0-23)
+        city_id: Optional city ID for cache key
+
+    Returns:
+        Dictionary where P[i][j] = probability of going from cluster i to j
+
+    """
+    compiled = self._get_compiled(graph, city_id)
+    probs = self._transition_matrix(compiled, hour, city_id)
+
+    return {
+      i: dict(zip(compiled.nodes, row.tolist(), strict=True))
+      for i, row in zip(compiled.nodes, probs, strict=True)
+    }
+
+  def _transition_matrix(
+    self, compiled: CompiledCityGraph, hour: int, city_id: int | None = None
+  ) -> np.ndarray:
+    """Compute the dense smoothed transition matrix P_h, shape (n_nodes, n_nodes).
+
+    Results are cached per (city_id, hour) when a city ID is given.
+    """
+    # Check cache first
+    if city_id is not None:
+      cache_key = (city_id, hour)
+      cached = self._transition_prob_cache.get(cache_key)
+      if cached is not None:
+        return cached
+
+    probs = self._smoothed_transitions(compiled, hour, self.epsilon)
+
+    # Cache the result
+    if city_id is not None:
+      self._transition_prob_cache[cache_key] = probs
+
+    return probs
+
+  @staticmethod
+  def _smoothed_transitions(compiled: CompiledCityGraph, hour: int, epsilon: float) -> np.ndarray:
+    """Laplace-smoothed transition matrix P_h for a smoothing parameter."""
+    n_nodes = compiled.n_nodes
+
+    # Dense hourly counts; node pairs without an edge count as zero trips
+    counts = np.zeros((n_nodes, n_nodes))
+    counts[compiled.sources, compiled.indices] = compiled.hourly_trips[:, hour]
+
+    # Apply Laplace smoothing
+    denominator = compiled.out_demand[hour] + epsilon * n_nodes
+    return (counts + epsilon) / denominator[:, None]
+
+  def compute_earning_rate(
+    self, graph: nx.DiGraph, cluster: str, hour: int, city_id: int, date: datetime
+  ) -> float:
+    """Compute the earning rate (€/hour) for a driver at a specific cluster and hour.
+
+    Args:
+        graph: NetworkX graph for the city
+        cluster: Starting cluster ID
+        hour: Hour of day (0-23)
+        city_id: City identifier
+        date: Date for weather lookup
+
+    Returns:
+        Expected earning rate in €/hour
+
+    """
+    compiled = self._get_compiled(graph, city_id)
+
+    if cluster not in compiled.node_index:
+      return 0.0  # Cluster not in graph
+    i = compiled.node_index[cluster]
+
+    # Get transition probabilities for this hour (with caching)
+    P = self._transition_matrix(compiled, hour, city_id)
+
+    # Get surge and weather multipliers
+    surge_mult = self.get_surge_multiplier(city_id, hour)
+    _, weather_mult = get_weather_for_date(city_id, date)
+
+    return self._earning_rate_at(compiled, i, hour, P, surge_mult, weather_mult, self.lambda_floor)
+
+  @staticmethod
+  def _earning_rate_at(
+    compiled: CompiledCityGraph,
+    i: int,
+    hour: int,
+    P: np.ndarray,
+    surge_mult: float,
+    weather_mult: float,
+    lambda_floor: float,
+  ) -> float:
+    """Earning rate (€/hour) at node index i, given transitions and multipliers."""
+    # Compute expected fare over the outgoing edges of the cluster
+    edges = compiled.edge_range(i)
+    probs = P[i, compiled.indices[edges]]
+
+    expected_fare = float(
+      np.sum(probs * compiled.hourly_fare[edges, hour] * surge_mult * weather_mult)
+    )
+    expected_travel_time = float(np.sum(probs * compiled.hourly_time[edges, hour]))
+    total_outgoing_demand = float(compiled.out_demand[hour, i])
+
+    # Compute expected wait time
+    demand_rate = max(total_outgoing_demand, lambda_floor)
+    expected_wait_time = 60.0 / demand_rate  # minutes
+
+    # Total expected time per trip
+    total_time_minutes = expected_travel_time + expected_wait_time
+
+    if total_time_minutes <= 0:
+      return 0.0
+
+    # Convert to earning rate (€/hour)
+    earning_rate = expected_fare / (total_time_minutes / 60.0)
+
+    return earning_rate
+
+  def cache_stats(self) -> dict[str, dict]:
+    """Report size and hit/miss/eviction counters of the in-memory caches."""
+    stats = {
+      cache.name: cache.stats()
+      for cache in (
+        self._transition_prob_cache,
+        self._dp_cache,
+        self._scenario_keys,
+        self._day_tables,
+        self._value_tables,
+      )
+    }
+    stats[self._inflight.name] = self._inflight.stats()
+    if self.compute_pool is not None:
+      stats["compute_pool"] = self.compute_pool.stats()
+    return stats
+
+  async def start_compute_pool(
+    self,
+    max_workers: int | None = None,
+    max_pending: int = 64,
+    timeout_seconds: float | None = 30.0,
+    queue_timeout_seconds: float | None = 5.0,
+    worker_setup: Callable[[], None] | None = None,
+  ) -> OptimizerPool:
+    """Start worker processes that run the async solves in parallel across cores.
+
+    Each worker loads the dataset and compiles every city for this instance's
+    parameters before the pool is reported ready.
+
+    Args:
+        max_workers: Number of worker processes, one per CPU if None
+        max_pending: Most solves queued or running at once
+        timeout_seconds: Longest a solve may take, no limit if None
+        queue_timeout_seconds: Longest a solve waits for a submission slot
+        worker_setup: Module-level function each worker runs before loading
+          its dataset, see ``OptimizerPool``
+
+    Returns:
+        The running pool
+
+    """
+    if self.compute_pool is None:
+      self._local_cities.clear()
+      self.compute_pool = OptimizerPool(
+        self._worker_kwargs,
+        max_workers=max_workers,
+        max_pending=max_pending,
+        timeout_seconds=timeout_seconds,
+        queue_timeout_seconds=queue_timeout_seconds,
+        worker_setup=worker_setup,
+      )
+    await self.compute_pool.start()
+    return self.compute_pool
+
+  def stop_compute_pool(self) -> None:
+    """Stop the compute pool; async solves then run in a thread again."""
+    if self.compute_pool is not None:
+      self.compute_pool.shutdown()
+      self.compute_pool = None
+
+  async def _run_blocking(self, method: str, city_id: int, *args, **kwargs) -> Any:
+    """Run a synchronous optimizer method without blocking the event loop.
+
+    Uses the compute pool when started, else a thread of the default executor.
+    Pool workers get this optimizer's parameters and the city's current surge
+    with each call, so live surge updates reach them too. Completed trips do
+    not: once this process has published trips of a city, workers refuse its
+    calls (their graph is at another data version) and the city is solved
+    here, on the graph its results are keyed on.
+    """
+    pool = self.compute_pool
+    if pool is not None and pool.running and city_id not in self._local_cities:
+      surge = (city_id, dict(enumerate(self.dataset.surge_by_hour(city_id).tolist())))
+      try:
+        return await pool.run(
+          self._worker_kwargs,
+          method,
+          (city_id, *args),
+          kwargs,
+          surge=surge,
+          data_version=(city_id, self._data_version(city_id)),
+        )
+      except WorkerGraphMismatchError:
+        self._local_cities.add(city_id)
+    return await asyncio.to_thread(getattr(self, method), city_id, *args, **kwargs)
+
+  def _get_dp_cache_key(
+    self,
+    city_id: int,
+    start_cluster: str,
+    start_hour: int,
+    work_hours: int,
+    start_date: datetime,
+    scenario: str | None = None,
+  ) -> str:
+    """Generate cache key for DP result.
+
+    The key is built from what actually drives the result rather than the
+    calendar date, so days with the same forecast share cached results.
+
+    Args:
+        city_id: City identifier
+        start_cluster: Starting cluster ID
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work
+        start_date: Starting date
+        scenario: The shift's ``_get_scenario_key``, computed if None
+
+    Returns:
+        Cache key string
+
+    """
+    if scenario is None:
+      scenario = self._get_scenario_key(city_id, start_hour, work_hours, start_date)
+    return f"dp:{city_id}:{start_cluster}:{start_hour}:{work_hours}:{scenario}"
+
+  def _get_scenario_key(
+    self, city_id: int, start_hour: int, work_hours: int, start_date: datetime
+  ) -> str:
+    """Canonical key of a shift's inputs, apart from city, hours and start cluster.
+
+    Combines the run-length encoded weather and surge multipliers over the
+    shift with a version of the city's graph and solver parameters. The key
+    only depends on these values, so every worker process, Redis and the
+    nightly store agree on it, and a multiplier returning to an earlier value
+    finds the results cached under it again. Keys are cached per shift until
+    the city's next surge or graph update.
+
+    Args:
+        city_id: City identifier
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work
+        start_date: Starting date
+
+    Returns:
+        Key string such as "w1.0x96:s1.02x12,0.98x84:v3f2a..."
+
+    """
+    if city_id not in self.graphs:
+      raise ValueError(f"City {city_id} not found in graphs")
+
+    # The counter is read first: a key computed while an update lands is
+    # stored under the old count and never reused
+    cache_key = (city_id, start_date, start_hour, work_hours, self.dataset.city_version(city_id))
+    cached = self._scenario_keys.get(cache_key)
+    if cached is not None:
+      return cached
+
+    grid = self._time_grid(work_hours)
+    n_steps = grid.n_steps
+    hours, weather = self._shift_conditions(city_id, start_hour, start_date, grid)
+
+    weather_key = self._run_length_key(weather[n_steps:0:-1].tolist())
+    surge_key = self._surge_key(self.dataset.surge_by_hour(city_id), hours, n_steps)
+    scenario = f"w{weather_key}:s{surge_key}:v{self._data_version(city_id)}"
+    self._scenario_keys[cache_key] = scenario
+    return scenario
+
+  def _surge_key(self, surge_by_hour: np.ndarray, hours: np.ndarray, n_steps: int) -> str:
+    """Run-length encoded surge multipliers of the hours a shift covers, in elapsed-time order."""
+    return self._run_length_key(surge_by_hour[hours[n_steps:0:-1]].tolist())
+
+  @staticmethod
+  def _run_length_key(values: list[float]) -> str:
+    """Encode multipliers in elapsed-time order as "value x run length" pairs."""
+    runs: list[list] = []
+    for value in values:
+      if runs and runs[-1][0] == value:
+        runs[-1][1] += 1
+      else:
+        runs.append([value, 1])
+    return ",".join(f"{value!r}x{count}" for value, count in runs)
+
+  def _cache_if_current(
+    self, cache: BoundedCache, key: Any, value: Any, city_id: int, version: int
+  ) -> bool:
+    """Cache a solve's result unless the city was updated since the solve started.
+
+    Args:
+        cache: Cache to write to
+        key: Cache key, computed before the solve
+        value: Result of the solve
+        city_id: City identifier
+        version: ``CityDataset.city_version`` read before the key
+
+    Returns:
+        Whether the result was cached
+
+    """
+    if not self.dataset.is_current(city_id, version):
+      return False
+    cache[key] = value
+    return True
+
+  def _data_version(self, city_id: int) -> str:
+    """Fingerprint of the city graph and solver parameters that DP results depend on."""
+    if city_id not in self._data_versions:
+      digest = hashlib.blake2b(digest_size=8)
+      digest.update(self.compiled[city_id].fingerprint().encode())
+      digest.update(np.array([self.gamma, self.lambda_floor]).tobytes())
+      digest.update(repr(validate_step_schedule(self.step_minutes)).encode())
+      self._data_versions[city_id] = digest.hexdigest()
+    return self._data_versions[city_id]
+
+  async def solve_dp_async(
+    self,
+    city_id: int,
+    start_cluster: str,
+    start_hour: int,
+    work_hours: int,
+    start_date: datetime,
+    solver: str = "grid",
+  ) -> tuple[float, list[str]]:
+    """Async version of solve_dp with Redis caching.
+
+    Checks Redis cache before computing, stores result after computation.
+    Concurrent calls for the same shift share one computation.
+
+    Args:
+        city_id: City identifier
+        start_cluster: Starting cluster ID
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work (L)
+        start_date: Starting date for weather lookup
+        solver: Solver on a cache miss, see ``solve_dp``
+
+    Returns:
+        Tuple of (total_expected_earnings, optimal_strategy)
+
+    """
+    version = self.dataset.city_version(city_id)
+    cache_key = self._get_dp_cache_key(city_id, start_cluster, start_hour, work_hours, start_date)
+
+    async def read_cached():
+      try:
+        db = get_db_manager()
+        cached = await db.get_dp_result(cache_key)
+        if cached:
+          return (cached["earnings"], cached["path"])
+      except Exception as e:
+        print(f"Redis cache read error: {e}")
+      return None
+
+    async def compute():
+      result = self._dp_cache.get(cache_key)
+      if result is None:
+        result = await self._run_blocking(
+          "solve_dp", city_id, start_cluster, start_hour, work_hours, start_date, solver=solver
+        )
+        # Solved across an update of the city: the result may not match its key
+        if not self._cache_if_current(self._dp_cache, cache_key, result, city_id, version):
+          return result
+      try:
+        db = get_db_manager()
+        await db.set_dp_result(cache_key, result[0], result[1], ttl_seconds=3600)
+      except Exception as e:
+        print(f"Redis cache write error: {e}")
+      return result
+
+    return await self._coalesced(cache_key, read_cached, compute)
+
+  async def _coalesced(self, cache_key: str, read_cached, compute):
+    """Serve a Redis-cached result, computing it at most once per key at a time.
+
+    Concurrent callers in this process share one computation. With
+    ``redis_lock_ttl_seconds`` set, one worker process computes while the
+    others wait for the value to reach Redis.
+
+    Args:
+        cache_key: Redis cache key of the result
+        read_cached: Async function returning the cached result, or None
+        compute: Async function computing the result and writing it to Redis
+
+    Returns:
+        The cached or computed result
+
+    """
+
+    async def load():
+      cached = await read_cached()
+      if cached is not None:
+        return cached
+      if self.redis_lock_ttl_seconds is None:
+        return await compute()
+      return await redis_single_flight(
+        get_db_manager().redis,
+        cache_key,
+        read_cached,
+        compute,
+        lock_ttl_seconds=self.redis_lock_ttl_seconds,
+      )
+
+    return await self._inflight.do(cache_key, load)
+
+  async def solve_dp_anytime(
+    self,
+    city_id: int,
+    start_cluster: str,
+    start_hour: int,
+    work_hours: int,
+    start_date: datetime,
+    budget_seconds: float = 0.2,
+    step_ladder: tuple[int, ...] = ANYTIME_STEP_LADDER,
+  ) -> AnytimeResult:
+    """Best strategy available within a latency budget, for interactive endpoints.
+
+    Starts the full-resolution solve (``solve_dp_async``, which caches its
+    result) and meanwhile solves on coarse time grids, coarsest first. When
+    the budget runs out the finest result so far is returned and the full
+    solve keeps running in the background, so the next call hits the cache.
+    If not even the coarsest level finishes within the budget, whichever of
+    it and the full solve finishes first is returned; if a coarse level
+    fails, the full solve's result is awaited instead.
+
+    Args:
+        city_id: City identifier
+        start_cluster: Starting cluster ID
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work (L)
+        start_date: Starting date for weather lookup
+        budget_seconds: Latency budget
+        step_ladder: Coarse bucket lengths in minutes to try before the full grid
+
+    Returns:
+        AnytimeResult with the time grid it was solved on
+
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget_seconds
+
+    cache_key = self._get_dp_cache_key(city_id, start_cluster, start_hour, work_hours, start_date)
+    cached = self._dp_cache.get(cache_key)
+    if cached is not None:
+      return AnytimeResult(*cached, self.step_minutes, True)
+    if start_cluster not in self.compiled[city_id].node_index:
+      raise ValueError(f"Cluster {start_cluster} not found in city {city_id}")
+
+    full = asyncio.ensure_future(
+      self.solve_dp_async(city_id, start_cluster, start_hour, work_hours, start_date)
+    )
+    self._background_solves.add(full)
+    full.add_done_callback(self._forget_background_solve)
+
+    best = None
+    late = None  # (coarse solve still running when the budget ran out, its step)
+    finest = min(step for _, step in validate_step_schedule(self.step_minutes))
+    coarse_steps = sorted({step for step in step_ladder if step > finest}, reverse=True)
+    for step_minutes in coarse_steps:
+      remaining = deadline - loop.time()
+      if full.done() or (best is not None and remaining <= 0):
+        break
+      coarse = asyncio.ensure_future(
+        asyncio.to_thread(
+          self._solve_on_grid,
+          city_id,
+          start_cluster,
+          start_hour,
+          work_hours,
+          start_date,
+          step_minutes,
+        )
+      )
+      try:
+        result = await asyncio.wait_for(asyncio.shield(coarse), max(remaining, 0.0))
+      except TimeoutError:
+        # The thread cannot be stopped; its result is still used if nothing better comes
+        self._background_solves.add(coarse)
+        coarse.add_done_callback(self._forget_background_solve)
+        late = (coarse, step_minutes)
+        break
+      except Exception as e:
+        print(f"Warning: Anytime solve on {step_minutes}-minute buckets failed: {e}")
+        break
+      best = AnytimeResult(*result, step_minutes, False)
+
+    remaining = deadline - loop.time()
+    if best is None:
+      if late is not None:
+        coarse, step_minutes = late
+        await asyncio.wait({coarse, full}, return_when=asyncio.FIRST_COMPLETED)
+        if not full.done() and coarse.exception() is None:
+          return AnytimeResult(*coarse.result(), step_minutes, False)
+      return AnytimeResult(*await full, self.step_minutes, True)
+    if not full.done() and remaining > 0:
+      await asyncio.wait({full}, timeout=remaining)
+    if full.done() and not full.cancelled() and full.exception() is None:
+      return AnytimeResult(*full.result(), self.step_minutes, True)
+    return best
+
+  def _forget_background_solve(self, task: asyncio.Task) -> None:
+    """Drop a finished background solve, reporting its error if nobody awaited it."""
+    self._background_solves.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+      print(f"Background solve failed: {task.exception()}")
+
+  def _solve_on_grid(
+    self,
+    city_id: int,
+    start_cluster: str,
+    start_hour: int,
+    work_hours: int,
+    start_date: datetime,
+    step_minutes: int,
+  ) -> tuple[float, list[str]]:
+    """Solve a shift on a coarser time grid; an approximation of ``solve_dp``.
+
+    Args:
+        city_id: City identifier
+        start_cluster: Starting cluster ID
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work (L)
+        start_date: Starting date for weather lookup
+        step_minutes: Length of one time bucket in minutes
+
+    Returns:
+        Tuple of (total_expected_earnings, optimal_strategy)
+
+    """
+    engine = self._get_engine(city_id, step_minutes)
+    grid = self._time_grid(work_hours, step_minutes)
+    n_steps = grid.n_steps
+    hours, weather = self._shift_conditions(city_id, start_hour, start_date, grid)
+    table = engine.solve(hours, weather)
+    start_index = engine.node_index[start_cluster]
+    path = engine.extract_path(table, start_index, n_steps, max_moves=work_hours * 4)
+    return float(table.values[n_steps, start_index]), path
+
+  def solve_dp(
+    self,
+    city_id: int,
+    start_cluster: str,
+    start_hour: int,
+    work_hours: int,
+    start_date: datetime,
+    solver: str = "grid",
+  ) -> tuple[float, list[str]]:
+    """Solve the dynamic programming problem for optimal L-hour strategy.
+
+    Now includes time-aware transitions that track cumulative travel and wait times.
+
+    V_t(i) = best over j: fare_ij + γ * V_{t+time_ij}(j)
+    where time_ij includes both travel time and expected wait time
+
+    OPTIMIZED: Results are cached in-memory to avoid recomputation, and each
+    time bucket is evaluated as one vectorized max over destinations.
 
-    OPTIMIZED: Caches results per (city_id, hour) to avoid recomputation.
+    Both solvers give the same result. "grid" fills the value table of every
+    starting cluster, which is cached and shared with other starts and surge
+    refills. "labels" only evaluates the (cluster, bucket) states reachable
+    from start_cluster, less work for a one-off start in a large city.
 
     Args:
-        graph: NetworkX graph for the city
-        hour: Hour of day (0-23)
-        city_id: Optional city ID for cache key
+        city_id: City identifier
+        start_cluster: Starting cluster ID
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work (L)
+        start_date: Starting date for weather lookup
+        solver: "grid" or "labels"
 
     Returns:
-        Dictionary where P[i][j] = probability of going from cluster i to j
+        Tuple of (total_expected_earnings, optimal_strategy)
 
     """
-    # Check cache first
-    if city_id is not None:
-      cache_key = (city_id, hour)
-      if cache_key in self._transition_prob_cache:
-        return self._transition_prob_cache[cache_key]
-
-    nodes = list(graph.nodes())
-    n_nodes = len(nodes)
-    P = {}
+    if solver not in DP_SOLVERS:
+      raise ValueError(f"Unknown solver {solver!r}, expected one of {DP_SOLVERS}")
 
-    for i in nodes:
-      P[i] = {}
-
-      # Get all outgoing edges from node i at this hour
-      total_outgoing = 0
-      hourly_counts = {}
+    # Check in-memory cache first
+    version = self.dataset.city_version(city_id)
+    scenario = self._get_scenario_key(city_id, start_hour, work_hours, start_date)
+    cache_key = self._get_dp_cache_key(
+      city_id, start_cluster, start_hour, work_hours, start_date, scenario
+    )
+    cached = self._dp_cache.get(cache_key)
+    if cached is not None:
+      return cached
 
-      for j in nodes:
-        if graph.has_edge(i, j):
-          edge_data = graph[i][j]
-          hourly_trips = edge_data.get("hourly_trips", {})
-          count_ij = hourly_trips.get(hour, 0)
-        else:
-          count_ij = 0
+    if city_id not in self.graphs:
+      raise ValueError(f"City {city_id} not found in graphs")
 
-        hourly_counts[j] = count_ij
-        total_outgoing += count_ij
+    engine = self._get_engine(city_id)
 
-      # Apply Laplace smoothing
-      denominator = total_outgoing + self.epsilon * n_nodes
+    if start_cluster not in engine.node_index:
+      raise ValueError(f"Cluster {start_cluster} not found in city {city_id}")
 
-      for j in nodes:
-        numerator = hourly_counts[j] + self.epsilon
-        P[i][j] = numerator / denominator
+    # Then the nightly precomputed tables
+    store = self.dataset.recommendations
+    if store is not None:
+      precomputed = store.lookup(city_id, start_cluster, start_hour, work_hours, scenario)
+      if precomputed is not None:
+        self._dp_cache[cache_key] = precomputed
+        return precomputed
+
+    start_index = engine.node_index[start_cluster]
+    if solver == "labels":
+      grid = self._time_grid(work_hours)
+      hours, weather = self._shift_conditions(city_id, start_hour, start_date, grid)
+      table, _ = self._grid_engine(city_id, grid).solve_reachable(
+        start_index, hours, weather, grid
+      )
+      n_steps = grid.n_steps
+    else:
+      table, n_steps = self._solve_table(city_id, start_hour, work_hours, start_date)
+    total_earnings = float(table.values[n_steps, start_index])
+    optimal_path = engine.extract_path(table, start_index, n_steps, max_moves=work_hours * 4)
 
-    # Cache the result
-    if city_id is not None:
-      self._transition_prob_cache[cache_key] = P
+    # Cache the result before returning
+    result = (total_earnings, optimal_path)
+    self._cache_if_current(self._dp_cache, cache_key, result, city_id, version)
 
-    return P
+    return result
 
-  def compute_earning_rate(
-    self, graph: nx.DiGraph, cluster: str, hour: int, city_id: int, date: datetime
-  ) -> float:
-    """Compute the earning rate (€/hour) for a driver at a specific cluster and hour.
+  def _solve_table(
+    self, city_id: int, start_hour: int, work_hours: int, start_date: datetime
+  ) -> tuple[ValueTable, int]:
+    """Fill the DP value table of a shift for every starting cluster at once.
 
     Args:
-        graph: NetworkX graph for the city
-        cluster: Starting cluster ID
-        hour: Hour of day (0-23)
         city_id: City identifier
-        date: Date for weather lookup
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work (L)
+        start_date: Starting date for weather lookup
 
     Returns:
-        Expected earning rate in €/hour
+        Tuple of (value_table, n_steps), where values[n_steps] holds the expected
+        earnings of starting the shift at each cluster
 
     """
-    nodes = list(graph.nodes())
+    # Work in buckets of remaining time at the optimizer's resolution
+    version = self.dataset.city_version(city_id)
+    grid = self._time_grid(work_hours)
+    n_steps = grid.n_steps
+    hours, weather = self._shift_conditions(city_id, start_hour, start_date, grid)
+
+    # A surge update copies the tables it affects to their new surge key,
+    # marked stale from their first repriced row
+    table_key = (
+      city_id,
+      start_hour,
+      work_hours,
+      self._run_length_key(weather[n_steps:0:-1].tolist()),
+      self._surge_key(self.dataset.surge_by_hour(city_id), hours, n_steps),
+      self._data_version(city_id),
+    )
+    engine = self._grid_engine(city_id, grid)
+    cached = self._value_tables.get(table_key)
+    if cached is not None and cached[1] is None:
+      return cached[0], n_steps
+
+    # Nightly precomputed tables are read in place from the shared store
+    store = self.dataset.recommendations
+    if cached is None and store is not None:
+      scenario = self._get_scenario_key(city_id, start_hour, work_hours, start_date)
+      table = store.value_table(city_id, start_hour, work_hours, scenario)
+      if table is not None:
+        self._value_tables[table_key] = (table, None)
+        return table, n_steps
+
+    if cached is None:
+      table = engine.solve(hours, weather, grid=grid)
+    else:
+      table = engine.solve(hours, weather, reuse=cached[0], from_bucket=cached[1], grid=grid)
+    self._cache_if_current(self._value_tables, table_key, (table, None), city_id, version)
+    return table, n_steps
+
+  def solve_many(
+    self, queries: list[DPQuery | tuple], max_workers: int | None = None
+  ) -> list[tuple[float, list[str]]]:
+    """Solve a batch of DP queries, sharing work between queries of the same shift.
+
+    Queries are grouped by (city, date, start_hour, work_hours). Each group
+    fills one value table and reads every start cluster off it, and groups
+    run in parallel on a thread pool; the compiled DP kernel and large NumPy
+    operations release the GIL.
 
-    # Get transition probabilities for this hour (with caching)
-    P = self.compute_transition_probabilities(graph, hour, city_id)
+    Args:
+        queries: (city_id, start_cluster, start_hour, work_hours, start_date)
+          tuples, as taken by ``solve_dp``
+        max_workers: Threads to use, one per CPU if None
 
-    if cluster not in P:
-      return 0.0  # Cluster not in graph
+    Returns:
+        List of (total_expected_earnings, optimal_strategy), in query order
 
-    # Get surge and weather multipliers
-    surge_mult = self.get_surge_multiplier(city_id, hour)
-    _, weather_mult = get_weather_for_date(city_id, date)
+    """
+    queries, groups = self._group_queries(queries)
+    # Build engines up front so that threads do not race to create them
+    for city_id, _, _, work_hours in groups:
+      self._grid_engine(city_id, self._time_grid(work_hours))
+
+    def solve_group(item):
+      (city_id, start_date, start_hour, work_hours), indices = item
+      clusters = [queries[k].start_cluster for k in indices]
+      return self._solve_group(city_id, start_hour, work_hours, start_date, clusters)
+
+    workers = min(len(groups), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+      outputs = [solve_group(item) for item in groups.items()]
+    else:
+      with ThreadPoolExecutor(max_workers=workers) as executor:
+        outputs = list(executor.map(solve_group, groups.items()))
+
+    return self._scatter_results(len(queries), groups, outputs)
+
+  async def solve_many_async(
+    self, queries: list[DPQuery | tuple]
+  ) -> list[tuple[float, list[str]]]:
+    """Async version of solve_many, running groups in the compute pool if started.
 
-    # Compute expected fare from cluster
-    expected_fare = 0.0
-    expected_travel_time = 0.0
-    total_outgoing_demand = 0.0
+    Args:
+        queries: (city_id, start_cluster, start_hour, work_hours, start_date)
+          tuples, as taken by ``solve_dp``
 
-    for j in nodes:
-      prob_ij = P[cluster][j]
+    Returns:
+        List of (total_expected_earnings, optimal_strategy), in query order
 
-      if graph.has_edge(cluster, j):
-        edge_data = graph[cluster][j]
-        hourly_fares = edge_data.get("hourly_avg_price", {})
-        hourly_times = edge_data.get("hourly_avg_time", {})
-        hourly_trips = edge_data.get("hourly_trips", {})
+    """
+    queries, groups = self._group_queries(queries)
+    outputs = await asyncio.gather(
+      *(
+        self._run_blocking(
+          "_solve_group",
+          city_id,
+          start_hour,
+          work_hours,
+          start_date,
+          [queries[k].start_cluster for k in indices],
+        )
+        for (city_id, start_date, start_hour, work_hours), indices in groups.items()
+      )
+    )
+    return self._scatter_results(len(queries), groups, outputs)
 
-        fare_ij = hourly_fares.get(hour, edge_data.get("avg_price", 0))
-        time_ij = hourly_times.get(hour, edge_data.get("avg_time", 0))
-        trips_ij = hourly_trips.get(hour, 0)
+  def _group_queries(
+    self, queries: list[DPQuery | tuple]
+  ) -> tuple[list[DPQuery], dict[tuple, list[int]]]:
+    """Validate a batch and group query positions by (city, date, start_hour, work_hours).
 
-        expected_fare += prob_ij * fare_ij * surge_mult * weather_mult
-        expected_travel_time += prob_ij * time_ij
-        total_outgoing_demand += trips_ij
+    Raises:
+        ValueError: If a query names an unknown city or cluster
 
-    # Compute expected wait time
-    demand_rate = max(total_outgoing_demand, self.lambda_floor)
-    expected_wait_time = 60.0 / demand_rate  # minutes
+    """
+    queries = [DPQuery(*query) for query in queries]
+    groups: dict[tuple, list[int]] = {}
+    for k, query in enumerate(queries):
+      if query.city_id not in self.graphs:
+        raise ValueError(f"City {query.city_id} not found in graphs")
+      if query.start_cluster not in self.compiled[query.city_id].node_index:
+        raise ValueError(f"Cluster {query.start_cluster} not found in city {query.city_id}")
+      key = (query.city_id, query.start_date, query.start_hour, query.work_hours)
+      groups.setdefault(key, []).append(k)
+    return queries, groups
+
+  @staticmethod
+  def _scatter_results(
+    n_queries: int, groups: dict[tuple, list[int]], outputs: list[list]
+  ) -> list[tuple[float, list[str]]]:
+    """Put per-group results back in query order."""
+    results: list = [None] * n_queries
+    for indices, group_results in zip(groups.values(), outputs, strict=True):
+      for k, result in zip(indices, group_results, strict=True):
+        results[k] = result
+    return results
+
+  def _solve_group(
+    self,
+    city_id: int,
+    start_hour: int,
+    work_hours: int,
+    start_date: datetime,
+    clusters: list[str],
+  ) -> list[tuple[float, list[str]]]:
+    """Solve one shift for several start clusters from a single value table.
 
-    # Total expected time per trip
-    total_time_minutes = expected_travel_time + expected_wait_time
+    Args:
+        city_id: City identifier
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work (L)
+        start_date: Starting date for weather lookup
+        clusters: Start clusters, repeats allowed
 
-    if total_time_minutes <= 0:
-      return 0.0
+    Returns:
+        List of (total_expected_earnings, optimal_strategy), in cluster order
 
-    # Convert to earning rate (€/hour)
-    earning_rate = expected_fare / (total_time_minutes / 60.0)
+    """
+    version = self.dataset.city_version(city_id)
+    scenario = self._get_scenario_key(city_id, start_hour, work_hours, start_date)
+    results = {}
+    missing = []
+    for cluster in dict.fromkeys(clusters):
+      cache_key = self._get_dp_cache_key(
+        city_id, cluster, start_hour, work_hours, start_date, scenario
+      )
+      cached = self._dp_cache.get(cache_key)
+      if cached is None:
+        missing.append((cluster, cache_key))
+      else:
+        results[cluster] = cached
 
-    return earning_rate
+    if missing:
+      table, n_steps = self._solve_table(city_id, start_hour, work_hours, start_date)
+      engine = self._get_engine(city_id)
+      for cluster, cache_key in missing:
+        start_index = engine.node_index[cluster]
+        path = engine.extract_path(table, start_index, n_steps, max_moves=work_hours * 4)
+        results[cluster] = (float(table.values[n_steps, start_index]), path)
+        self._cache_if_current(self._dp_cache, cache_key, results[cluster], city_id, version)
 
-  def _get_dp_cache_key(
-    self, city_id: int, start_cluster: str, start_hour: int, work_hours: int, start_date: datetime
-  ) -> str:
-    """Generate cache key for DP result.
+    return [results[cluster] for cluster in clusters]
+
+  def _solve_shift(
+    self, city_id: int, start_hour: int, work_hours: int, start_date: datetime
+  ) -> tuple[ValueTable, list[tuple[float, list[str]]]]:
+    """Fill a shift's value table and read every start cluster off it.
 
     Args:
         city_id: City identifier
-        start_cluster: Starting cluster ID
         start_hour: Starting hour (0-23)
-        work_hours: Number of hours to work
-        start_date: Starting date
+        work_hours: Number of hours to work (L)
+        start_date: Starting date for weather lookup
 
     Returns:
-        Cache key string
+        Tuple of (value_table, results), with one (total_expected_earnings,
+        optimal_strategy) per cluster in compiled graph order
 
     """
-    date_str = start_date.strftime("%Y-%m-%d")
-    return f"dp:{city_id}:{start_cluster}:{start_hour}:{work_hours}:{date_str}"
+    table, n_steps = self._solve_table(city_id, start_hour, work_hours, start_date)
+    engine = self._get_engine(city_id)
+    results = [
+      (
+        float(table.values[n_steps, start_index]),
+        engine.extract_path(table, start_index, n_steps, max_moves=work_hours * 4),
+      )
+      for start_index in range(self.compiled[city_id].n_nodes)
+    ]
+    return table, results
 
-  async def solve_dp_async(
-    self, city_id: int, start_cluster: str, start_hour: int, work_hours: int, start_date: datetime
-  ) -> tuple[float, list[str]]:
-    """Async version of solve_dp with Redis caching.
+  def apply_surge_update(self, city_id: int, surge_by_hour: dict[int, float]) -> dict:
+    """Apply live surge multipliers and invalidate only what they affect.
 
-    Checks Redis cache before computing, stores result after computation.
+    The new multipliers go to the shared dataset, which passes the changed
+    hours to every optimizer built on it (see ``_invalidate_surge``).
 
     Args:
         city_id: City identifier
-        start_cluster: Starting cluster ID
-        start_hour: Starting hour (0-23)
-        work_hours: Number of hours to work (L)
-        start_date: Starting date for weather lookup
+        surge_by_hour: New surge multiplier per hour of day
 
     Returns:
-        Tuple of (total_expected_earnings, optimal_strategy)
+        Dictionary with the city and the hours whose multiplier changed
 
     """
-    cache_key = self._get_dp_cache_key(city_id, start_cluster, start_hour, work_hours, start_date)
-
-    # Check Redis cache first
-    try:
-      db = get_db_manager()
-      cached = await db.get_dp_result(cache_key)
-      if cached:
-        return (cached["earnings"], cached["path"])
-    except Exception as e:
-      print(f"Redis cache read error: {e}")
+    if city_id not in self.graphs:
+      raise ValueError(f"City {city_id} not found in graphs")
 
-    # Compute using sync method
-    result = self.solve_dp(city_id, start_cluster, start_hour, work_hours, start_date)
+    changed = self.dataset.update_surge(city_id, surge_by_hour)
+    return {"city_id": city_id, "changed_hours": sorted(changed)}
 
-    # Cache in Redis
-    try:
-      db = get_db_manager()
-      await db.set_dp_result(cache_key, result[0], result[1], ttl_seconds=3600)
-    except Exception as e:
-      print(f"Redis cache write error: {e}")
+  def record_hexagon_surge(
+    self, city_id: int, hexagon_id: str, surge_multiplier: float, timestamp: datetime
+  ) -> dict:
+    """Fold a live per-hexagon surge reading into the city's hourly surge.
 
-    return result
+    Args:
+        city_id: City identifier
+        hexagon_id: Hexagon zone identifier
+        surge_multiplier: Current surge multiplier of the hexagon
+        timestamp: Time of the reading
 
-  def solve_dp(
-    self, city_id: int, start_cluster: str, start_hour: int, work_hours: int, start_date: datetime
-  ) -> tuple[float, list[str]]:
-    """Solve the dynamic programming problem for optimal L-hour strategy.
+    Returns:
+        Dictionary with the city and the hours whose multiplier changed
 
-    Now includes time-aware transitions that track cumulative travel and wait times.
+    """
+    if city_id not in self.graphs:
+      raise ValueError(f"City {city_id} not found in graphs")
 
-    V_t(i) = best over j: fare_ij + γ * V_{t+time_ij}(j)
-    where time_ij includes both travel time and expected wait time
+    changed = self.dataset.record_hexagon_surge(city_id, hexagon_id, surge_multiplier, timestamp)
+    return {"city_id": city_id, "changed_hours": sorted(changed)}
 
-    OPTIMIZED: Results are cached in-memory to avoid recomputation.
+  def record_completed_trip(
+    self,
+    city_id: int,
+    pickup_hex: str,
+    drop_hex: str,
+    start_time: datetime,
+    duration_mins: float,
+    fare_amount: float,
+  ) -> dict:
+    """Fold a completed trip into the city's graph statistics.
 
     Args:
         city_id: City identifier
-        start_cluster: Starting cluster ID
-        start_hour: Starting hour (0-23)
-        work_hours: Number of hours to work (L)
-        start_date: Starting date for weather lookup
+        pickup_hex: Pickup hexagon
+        drop_hex: Drop-off hexagon
+        start_time: Start of the trip
+        duration_mins: Trip duration in minutes
+        fare_amount: Trip fare
 
     Returns:
-        Tuple of (total_expected_earnings, optimal_strategy)
+        Dictionary with the city and the updated edge, None if the trip's
+        hexagons are not in the ride history
 
     """
-    # Check in-memory cache first
-    cache_key = self._get_dp_cache_key(city_id, start_cluster, start_hour, work_hours, start_date)
-    if cache_key in self._dp_cache:
-      return self._dp_cache[cache_key]
-
     if city_id not in self.graphs:
       raise ValueError(f"City {city_id} not found in graphs")
 
-    graph = self.graphs[city_id]
-    nodes = list(graph.nodes())
+    key = self.dataset.record_completed_trip(
+      city_id, pickup_hex, drop_hex, start_time, duration_mins, fare_amount
+    )
+    return {"city_id": city_id, "edge": None if key is None else list(key[1:])}
 
-    if start_cluster not in nodes:
-      raise ValueError(f"Cluster {start_cluster} not found in city {city_id}")
+  def _invalidate_graph(self, city_id: int) -> dict:
+    """Drop this optimizer's DP arrays and cached results of a city whose graph changed.
+
+    Unlike a surge change, new trip statistics reach every hour and bucket,
+    so nothing derived from the old graph is reused.
 
-    # Convert work_hours to minutes for more precise tracking
-    total_work_minutes = work_hours * 60
+    Args:
+        city_id: City identifier
+
+    Returns:
+        Dictionary with the number of dropped entries per cache
 
-    # Initialize value function V[time_remaining_minutes][cluster]
-    # Use 5-minute intervals to balance precision and computation
-    time_intervals = list(range(0, total_work_minutes + 5, 5))
+    """
+    self._engines.pop(city_id, None)
+    for key in list(self._coarse_engines):
+      if key[0] == city_id:
+        self._coarse_engines.pop(key, None)
+    self._data_versions.pop(city_id, None)
+
+    summary = {}
+    for cache in (self._transition_prob_cache, self._value_tables, self._day_tables):
+      keys = [key for key in cache.keys() if key[0] == city_id]
+      for key in keys:
+        cache.pop(key)
+      summary[cache.name] = len(keys)
+    keys = [key for key in self._dp_cache.keys() if int(key.split(":")[1]) == city_id]
+    for key in keys:
+      self._dp_cache.pop(key)
+    summary[self._dp_cache.name] = len(keys)
+
+    print(
+      f"Graph update for city {city_id} (γ={self.gamma}): "
+      + ", ".join(f"{count} {name}" for name, count in summary.items())
+      + " dropped"
+    )
+    return summary
+
+  def _reprice_engines(self, city_id: int) -> None:
+    """Replace a city's engines by copies priced with its current surge.
+
+    Engines are not updated in place, so solves still running on them keep
+    reading consistent prices; engines on other time grids pick up the new
+    fares on their next use (see ``_get_engine``).
+    """
+    if city_id in self._engines:
+      self._engines[city_id] = self._engines[city_id].with_surge(
+        self.dataset.surge_by_hour(city_id)
+      )
 
-    V = {}
-    strategy = {}  # Store optimal next cluster and transition time
+  def _invalidate_surge(self, city_id: int, changed: set[int], previous: np.ndarray) -> dict:
+    """Reprice this optimizer's DP arrays and caches after a surge change.
 
-    # Terminal condition: V[0][i] = 0 for all i (no time left)
-    V[0] = dict.fromkeys(nodes, 0.0)
+    Runs after ``_reprice_engines``. Cached value tables of the previous
+    surge that cover a changed hour are copied to their new surge key,
+    marked stale from their first bucket priced at that hour; the rows below
+    it stay valid and are reused by the next solve. Entries under the old
+    keys are kept: they are still right for the old multipliers, which live
+    readings return to once they expire.
 
-    # Forward building the value function
-    for time_remaining in time_intervals[1:]:  # Skip 0, already initialized
-      V[time_remaining] = {}
-      strategy[time_remaining] = {}
+    Args:
+        city_id: City identifier
+        changed: Hours of day whose surge changed
+        previous: Surge multiplier per hour of day before the change, shape (24,)
 
-      for i in nodes:
-        best_value = 0.0  # Option to do nothing (earn 0)
-        best_next_cluster = None
-        best_transition_time = 0
+    Returns:
+        Dictionary with the number of refreshed entries per cache
 
-        # Try all possible transitions from cluster i
-        for j in nodes:
-          if graph.has_edge(i, j):
-            # Get current hour based on time elapsed
-            minutes_elapsed = total_work_minutes - time_remaining
-            current_hour = (start_hour + minutes_elapsed // 60) % 24
-            current_date = start_date + timedelta(minutes=minutes_elapsed)
+    """
+    summary = {"value_tables": 0, "day_tables": 0}
+    current = self.dataset.surge_by_hour(city_id)
 
-            edge_data = graph[i][j]
-            hourly_fares = edge_data.get("hourly_avg_price", {})
-            hourly_times = edge_data.get("hourly_avg_time", {})
-            hourly_trips = edge_data.get("hourly_trips", {})
+    for key in self._value_tables.keys():
+      if key[0] != city_id:
+        continue
+      start_hour, work_hours = key[1], key[2]
+      grid = self._time_grid(work_hours)
+      hours = grid.hours(start_hour)
+      first = first_affected_bucket(hours, changed)
+      if first is None or key[4] != self._surge_key(previous, hours, grid.n_steps):
+        continue
+      cached = self._value_tables.peek(key)
+      new_key = (*key[:4], self._surge_key(current, hours, grid.n_steps), *key[5:])
+      if cached is not None and new_key not in self._value_tables:
+        stale_from = first if cached[1] is None else min(cached[1], first)
+        self._value_tables[new_key] = (cached[0], stale_from)
+        summary["value_tables"] += 1
+
+    for key in self._day_tables.keys():
+      day_table = self._day_tables.peek(key)
+      if key[0] != city_id or day_table is None:
+        continue
+      if day_table.mark_stale(changed, self._get_engine(city_id, day_table.engine.step_minutes)):
+        summary["day_tables"] += 1
 
-            # Get transition data for this hour
-            base_fare = hourly_fares.get(current_hour, edge_data.get("avg_price", 0))
-            travel_time = hourly_times.get(current_hour, edge_data.get("avg_time", 0))
-            trips_count = hourly_trips.get(current_hour, 0)
+    print(
+      f"Surge update for city {city_id}, hours {sorted(changed)} (γ={self.gamma}): "
+      f"{summary['value_tables']} value tables, {summary['day_tables']} day tables refreshed"
+    )
+    return summary
 
-            # Apply surge and weather multipliers
-            surge_mult = self.get_surge_multiplier(city_id, current_hour)
-            _, weather_mult = get_weather_for_date(city_id, current_date)
-            fare = base_fare * surge_mult * weather_mult
+  def solve_day(
+    self,
+    city_id: int,
+    start_date: datetime,
+    schedules: list[tuple[int, int]] | None = None,
+  ) -> DayValueTable:
+    """Get the absolute-clock value table of a city and date.
 
-            # Calculate wait time at destination j
-            total_outgoing_demand_j = 0
-            for k in nodes:
-              if graph.has_edge(j, k):
-                k_trips = graph[j][k].get("hourly_trips", {}).get(current_hour, 0)
-                total_outgoing_demand_j += k_trips
+    One table answers every (start_hour, work_hours) shift of the day by lookup.
+    Tables are cached per (city, date) and re-solved only when a query needs a
+    shift they do not cover.
 
-            wait_time_j = 60.0 / max(total_outgoing_demand_j, self.lambda_floor)
+    Args:
+        city_id: City identifier
+        start_date: Shift date; shifts are clocked from its midnight
+        schedules: (start_hour, work_hours) pairs to cover, every start hour and
+          shift length up to 24h if omitted
 
-            # Total transition time (travel + wait at destination)
-            total_transition_time = travel_time + wait_time_j
+    Returns:
+        Day value table for the city
 
-            # Round to nearest 5-minute interval
-            transition_minutes = int(round(total_transition_time / 5.0)) * 5
+    Raises:
+        ValueError: If the city is unknown, or the optimizer's time resolution
+          is not a uniform bucket length dividing an hour
 
-            # Check if we have enough time for this transition
-            if transition_minutes <= time_remaining:
-              remaining_after_transition = time_remaining - transition_minutes
+    """
+    if city_id not in self.graphs:
+      raise ValueError(f"City {city_id} not found in graphs")
+    if not self._has_day_tables():
+      raise ValueError(
+        f"Day value tables need uniform buckets dividing an hour, not {self.step_minutes}"
+      )
 
-              # Get future value from destination after transition
-              future_value = V[remaining_after_transition].get(j, 0.0)
+    if schedules is None:
+      schedules = [(start, hours) for start in range(HOURS_PER_DAY) for hours in range(1, 25)]
+    wanted = set(schedules)
 
-              # Total value = immediate fare + discounted future value
-              total_value = fare + self.gamma * future_value
+    day = datetime(start_date.year, start_date.month, start_date.day)
+    cache_key = (city_id, day.strftime("%Y-%m-%d"))
+    cached = self._day_tables.get(cache_key)
+    if cached is not None and cached.covers(wanted):
+      return cached
+    if cached is not None:
+      wanted |= cached.schedules
 
-              if total_value > best_value:
-                best_value = total_value
-                best_next_cluster = j
-                best_transition_time = transition_minutes
+    # Shifts of at most 24h never reach the next day's forecast after their first bucket
+    _, start_weather = get_weather_for_date(city_id, day)
+    engine = self._get_engine(city_id, self.step_minutes)
+    _, weather = get_weather_for_date(city_id, day + timedelta(minutes=engine.step_minutes))
 
-        V[time_remaining][i] = best_value
-        strategy[time_remaining][i] = (best_next_cluster, best_transition_time)
+    table = DayValueTable(engine, day, wanted, start_weather, weather)
+    self._day_tables[cache_key] = table
+    return table
 
-    # Extract optimal strategy path by forward simulation
-    optimal_path = []
-    current_cluster = start_cluster
-    time_remaining = total_work_minutes
-    total_earnings = V[time_remaining][current_cluster]
+  def _has_day_tables(self) -> bool:
+    """Whether shifts at this optimizer's resolution can be read from day value tables."""
+    return isinstance(self.step_minutes, int) and 60 % self.step_minutes == 0
 
-    while time_remaining > 0:
-      optimal_path.append(current_cluster)
+  def solve_schedules(
+    self,
+    city_id: int,
+    start_cluster: str,
+    schedules: list[tuple[int, int]],
+    start_date: datetime,
+  ) -> list[tuple[float, list[str]]]:
+    """Solve several (start_hour, work_hours) shifts from one day value table.
 
-      if current_cluster in strategy[time_remaining]:
-        next_cluster, transition_time = strategy[time_remaining][current_cluster]
+    Gives the same results as calling ``solve_dp`` per shift from midnight of
+    ``start_date``, with a single backward sweep for all of them. Resolutions
+    day value tables cannot represent fall back to one solve per shift.
 
-        if next_cluster is None or transition_time >= time_remaining:
-          # No viable transition or not enough time
-          break
+    Args:
+        city_id: City identifier
+        start_cluster: Starting cluster ID
+        schedules: (start_hour, work_hours) pairs to evaluate
+        start_date: Shift date
 
-        # Move to next state
-        current_cluster = next_cluster
-        time_remaining -= transition_time
+    Returns:
+        List of (total_expected_earnings, optimal_strategy), in schedule order
 
-        # Prevent infinite loops
-        if len(optimal_path) > work_hours * 4:  # Reasonable upper bound
-          break
-      else:
-        break
+    """
+    if not self._has_day_tables():
+      day = datetime(start_date.year, start_date.month, start_date.day)
+      return [
+        self.solve_dp(city_id, start_cluster, start_hour, work_hours, day)
+        for start_hour, work_hours in schedules
+      ]
+
+    version = self.dataset.city_version(city_id)
+    day_table = self.solve_day(city_id, start_date, schedules)
+    engine = day_table.engine
+
+    if start_cluster not in engine.node_index:
+      raise ValueError(f"Cluster {start_cluster} not found in city {city_id}")
+    start_index = engine.node_index[start_cluster]
 
-    # Cache the result before returning
-    result = (total_earnings, optimal_path)
-    self._dp_cache[cache_key] = result
+    results = []
+    for start_hour, work_hours in schedules:
+      cache_key = self._get_dp_cache_key(
+        city_id, start_cluster, start_hour, work_hours, day_table.day
+      )
+      result = self._dp_cache.get(cache_key)
+      if result is None:
+        table, n_steps = day_table.shift_table(start_hour, work_hours)
+        path = engine.extract_path(table, start_index, n_steps, max_moves=work_hours * 4)
+        result = (float(table.values[n_steps, start_index]), path)
+        self._cache_if_current(self._dp_cache, cache_key, result, city_id, version)
+      results.append(result)
 
-    return result
+    return results
 
   async def analyze_best_starting_positions_async(
     self, city_id: int, start_hour: int, work_hours: int, start_date: datetime, top_k: int = 5
   ) -> list[tuple[str, float, list[str]]]:
     """Async analyze best starting positions with Redis caching.
 
+    Concurrent calls for the same scenario share one computation.
+
     Args:
         city_id: City identifier
         start_hour: Starting hour (0-23)
@@ -499,31 +1915,38 @@ class MobilityOptimizer:
         List of (cluster, expected_earnings, optimal_path) tuples, sorted by earnings
 
     """
-    date_str = start_date.strftime("%Y-%m-%d")
-
-    # Check Redis cache first
-    try:
-      db = get_db_manager()
-      cached = await db.get_best_starting_positions(city_id, start_hour, work_hours, date_str)
-      if cached:
-        return cached[:top_k]
-    except Exception as e:
-      print(f"Redis cache read error: {e}")
+    # Days with the same forecast share cached rankings
+    version = self.dataset.city_version(city_id)
+    scenario_key = self._get_scenario_key(city_id, start_hour, work_hours, start_date)
 
-    # Compute using sync method
-    results = self.analyze_best_starting_positions(
-      city_id, start_hour, work_hours, start_date, top_k=100
-    )  # Cache more than requested
+    cache_key = f"best:{city_id}:{start_hour}:{work_hours}:{scenario_key}"
 
-    # Cache in Redis
-    try:
-      db = get_db_manager()
-      await db.set_best_starting_positions(
-        city_id, start_hour, work_hours, date_str, results, ttl_seconds=3600
-      )
-    except Exception as e:
-      print(f"Redis cache write error: {e}")
+    async def read_cached():
+      try:
+        db = get_db_manager()
+        cached = await db.get_best_starting_positions(city_id, start_hour, work_hours, scenario_key)
+        if cached:
+          return cached
+      except Exception as e:
+        print(f"Redis cache read error: {e}")
+      return None
+
+    async def compute():
+      results = await self._run_blocking(
+        "analyze_best_starting_positions", city_id, start_hour, work_hours, start_date, top_k=100
+      )  # Cache more than requested
+      if not self.dataset.is_current(city_id, version):
+        return results
+      try:
+        db = get_db_manager()
+        await db.set_best_starting_positions(
+          city_id, start_hour, work_hours, scenario_key, results, ttl_seconds=3600
+        )
+      except Exception as e:
+        print(f"Redis cache write error: {e}")
+      return results
 
+    results = await self._coalesced(cache_key, read_cached, compute)
     return results[:top_k]
 
   def analyze_best_starting_positions(
@@ -531,6 +1954,9 @@ class MobilityOptimizer:
   ) -> list[tuple[str, float, list[str]]]:
     """Analyze the best starting positions for a given scenario.
 
+    OPTIMIZED: Fills the DP table once and reads off every start, instead of
+    solving once per cluster.
+
     Args:
         city_id: City identifier
         start_hour: Starting hour (0-23)
@@ -545,25 +1971,190 @@ class MobilityOptimizer:
     if city_id not in self.graphs:
       raise ValueError(f"City {city_id} not found in graphs")
 
-    graph = self.graphs[city_id]
-    nodes = list(graph.nodes())
+    version = self.dataset.city_version(city_id)
+    engine = self._get_engine(city_id)
+    nodes = engine.nodes
+    scenario = self._get_scenario_key(city_id, start_hour, work_hours, start_date)
 
-    results = []
+    store = self.dataset.recommendations
+    if store is not None:
+      precomputed = store.best_starting_positions(
+        city_id, start_hour, work_hours, scenario, top_k
+      )
+      if precomputed is not None:
+        return precomputed
 
     print(f"Analyzing {len(nodes)} starting positions...")
 
-    for cluster in nodes:
-      try:
-        earnings, path = self.solve_dp(city_id, cluster, start_hour, work_hours, start_date)
-        results.append((cluster, earnings, path))
-      except Exception as e:
-        print(f"Error analyzing cluster {cluster}: {e}")
-        continue
+    # One table holds the value of every starting cluster; only paths differ
+    table, n_steps = self._solve_table(city_id, start_hour, work_hours, start_date)
+    start_values = table.values[n_steps].tolist()
 
-    # Sort by expected earnings (descending)
-    results.sort(key=lambda x: x[1], reverse=True)
+    # Sort by expected earnings (descending), ties in graph order
+    ranked = sorted(range(len(nodes)), key=lambda k: start_values[k], reverse=True)
 
-    return results[:top_k]
+    results = []
+    for start_index in ranked[:top_k]:
+      cluster = nodes[start_index]
+      path = engine.extract_path(table, start_index, n_steps, max_moves=work_hours * 4)
+      results.append((cluster, start_values[start_index], path))
+
+      cache_key = self._get_dp_cache_key(
+        city_id, cluster, start_hour, work_hours, start_date, scenario
+      )
+      result = (start_values[start_index], path)
+      self._cache_if_current(self._dp_cache, cache_key, result, city_id, version)
+
+    return results
+
+  def sweep(
+    self,
+    city_id: int,
+    start_hour: int,
+    work_hours: int,
+    start_date: datetime,
+    gammas: list[float] | None = None,
+    lambda_floors: list[float] | None = None,
+    epsilons: list[float] | None = None,
+  ) -> pd.DataFrame:
+    """Evaluate a grid of optimizer parameters for one shift.
+
+    Weather, hours and the dense fare/travel arrays are shared by every grid
+    point. Each λ_floor needs its own bucket arrays and one batched backward
+    sweep covers all gammas. Epsilon only affects the smoothed transition
+    probabilities, so it changes the earning rate column and not the DP values.
+
+    Args:
+        city_id: City identifier
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work
+        start_date: Starting date for weather lookup
+        gammas: Discount factors, this optimizer's gamma if None
+        lambda_floors: Minimum demand rates, this optimizer's λ_floor if None
+        epsilons: Laplace smoothing parameters, this optimizer's epsilon if None
+
+    Returns:
+        DataFrame with one row per (gamma, lambda_floor, epsilon, start_cluster)
+        and columns expected_earnings, hourly_rate and earning_rate (€/h at the
+        start cluster and hour)
+
+    """
+    if city_id not in self.graphs:
+      raise ValueError(f"City {city_id} not found in graphs")
+
+    gammas = [self.gamma] if gammas is None else list(gammas)
+    lambda_floors = [self.lambda_floor] if lambda_floors is None else list(lambda_floors)
+    epsilons = [self.epsilon] if epsilons is None else list(epsilons)
+
+    compiled = self.compiled[city_id]
+    grid = self._time_grid(work_hours)
+    engine = self._grid_engine(city_id, grid)
+    n_steps = grid.n_steps
+    hours, weather = self._shift_conditions(city_id, start_hour, start_date, grid)
+
+    hour = start_hour % HOURS_PER_DAY
+    surge_mult = self.get_surge_multiplier(city_id, hour)
+    _, weather_mult = get_weather_for_date(city_id, start_date)
+    transitions = {
+      epsilon: self._smoothed_transitions(compiled, hour, epsilon) for epsilon in epsilons
+    }
+
+    rows = []
+    for lambda_floor in lambda_floors:
+      floor_engine = (
+        engine if lambda_floor == engine.lambda_floor else engine.with_lambda_floor(lambda_floor)
+      )
+      start_values = floor_engine.solve_gammas(hours, weather, gammas, grid).values[n_steps]
+
+      for epsilon in epsilons:
+        earning_rates = [
+          self._earning_rate_at(
+            compiled, i, hour, transitions[epsilon], surge_mult, weather_mult, lambda_floor
+          )
+          for i in range(compiled.n_nodes)
+        ]
+        for g, gamma in enumerate(gammas):
+          for i, cluster in enumerate(compiled.nodes):
+            rows.append(
+              {
+                "gamma": gamma,
+                "lambda_floor": lambda_floor,
+                "epsilon": epsilon,
+                "start_cluster": cluster,
+                "expected_earnings": float(start_values[g, i]),
+                "hourly_rate": float(start_values[g, i]) / work_hours,
+                "earning_rate": earning_rates[i],
+              }
+            )
+
+    return pd.DataFrame(rows)
+
+  def compare_resolutions(
+    self,
+    city_id: int,
+    start_hour: int,
+    work_hours: int,
+    start_date: datetime,
+    resolutions: list[StepSchedule] | None = None,
+  ) -> pd.DataFrame:
+    """Benchmark the accuracy and cost of solving one shift at several time resolutions.
+
+    Every resolution is solved from scratch, bypassing the result caches, and
+    compared with the first one, which should be the finest.
+
+    Args:
+        city_id: City identifier
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work
+        start_date: Starting date for weather lookup
+        resolutions: Bucket lengths in minutes or multi-resolution schedules,
+          1/5/15/30-minute buckets if None
+
+    Returns:
+        DataFrame with one row per resolution and columns buckets, solve_seconds,
+        table_mb, best_cluster, best_earnings, and the mean/max absolute and max
+        relative error of the start values against the reference resolution
+
+    """
+    if city_id not in self.graphs:
+      raise ValueError(f"City {city_id} not found in graphs")
+
+    resolutions = [1, 5, 15, 30] if resolutions is None else list(resolutions)
+    nodes = self.compiled[city_id].nodes
+
+    rows = []
+    reference = None
+    for resolution in resolutions:
+      grid = self._time_grid(work_hours, resolution)
+      engine = self._grid_engine(city_id, grid)
+      for length in set(grid.bucket_minutes[1:].tolist()):
+        engine.bucket_steps(length)  # Keep array setup out of the timing
+      hours, weather = self._shift_conditions(city_id, start_hour, start_date, grid)
+
+      started = time.perf_counter()
+      table = engine.solve(hours, weather, grid=grid)
+      solve_seconds = time.perf_counter() - started
+
+      start_values = table.values[grid.n_steps]
+      if reference is None:
+        reference = start_values
+      error = np.abs(start_values - reference)
+      best = int(start_values.argmax())
+      rows.append(
+        {
+          "resolution": resolution,
+          "buckets": grid.n_steps,
+          "solve_seconds": solve_seconds,
+          "table_mb": sum(array.nbytes for array in table) / 1e6,
+          "best_cluster": nodes[best],
+          "best_earnings": float(start_values[best]),
+          "mean_abs_error": float(error.mean()),
+          "max_abs_error": float(error.max()),
+          "max_rel_error": float((error / np.maximum(np.abs(reference), 1e-9)).max()),
+        }
+      )
+
+    return pd.DataFrame(rows)
 
   def analyze_path_timing(
     self, city_id: int, path: list[str], start_hour: int, start_date: datetime
@@ -583,7 +2174,7 @@ class MobilityOptimizer:
     if city_id not in self.graphs:
       raise ValueError(f"City {city_id} not found in graphs")
 
-    graph = self.graphs[city_id]
+    compiled = self.compiled[city_id]
     analysis = []
     cumulative_minutes = 0
     cumulative_earnings = 0.0
@@ -595,15 +2186,17 @@ class MobilityOptimizer:
       current_hour = (start_hour + cumulative_minutes // 60) % 24
       current_date = start_date + timedelta(minutes=cumulative_minutes)
 
-      if graph.has_edge(current_cluster, next_cluster):
-        edge_data = graph[current_cluster][next_cluster]
-        hourly_fares = edge_data.get("hourly_avg_price", {})
-        hourly_times = edge_data.get("hourly_avg_time", {})
-        hourly_trips = edge_data.get("hourly_trips", {})
+      i = compiled.node_index.get(current_cluster)
+      j = compiled.node_index.get(next_cluster)
+      edge = compiled.edge_id(i, j) if i is not None and j is not None else -1
+
+      if edge >= 0:
+        # cumulative_minutes turns fractional after the first step
+        hour_index = int(current_hour)
 
         # Get transition data
-        base_fare = hourly_fares.get(current_hour, edge_data.get("avg_price", 0))
-        travel_time = hourly_times.get(current_hour, edge_data.get("avg_time", 0))
+        base_fare = float(compiled.hourly_fare[edge, hour_index])
+        travel_time = float(compiled.hourly_time[edge, hour_index])
 
         # Apply multipliers
         surge_mult = self.get_surge_multiplier(city_id, current_hour)
@@ -611,12 +2204,7 @@ class MobilityOptimizer:
         fare = base_fare * surge_mult * weather_mult
 
         # Calculate wait time at destination
-        total_outgoing_demand = 0
-        nodes = list(graph.nodes())
-        for k in nodes:
-          if graph.has_edge(next_cluster, k):
-            k_trips = graph[next_cluster][k].get("hourly_trips", {}).get(current_hour, 0)
-            total_outgoing_demand += k_trips
+        total_outgoing_demand = float(compiled.out_demand[hour_index, j])
 
         wait_time = 60.0 / max(total_outgoing_demand, self.lambda_floor)
         total_time = travel_time + wait_time
@@ -650,6 +2238,108 @@ class MobilityOptimizer:
     return analysis
 
 
+class OptimizerRegistry:
+  """Optimizer instances keyed by their parameters, all sharing one dataset.
+
+  Several parameter sets (e.g. A/B tests of gamma) can be served from one
+  process without loading or compiling the graphs more than once. Each
+  instance keeps its own DP arrays and result caches.
+  """
+
+  def __init__(self, dataset: CityDataset | None = None):
+    """Create an empty registry.
+
+    Args:
+        dataset: Graphs shared by the optimizers, the process-wide dataset of
+          each optimizer's ``use_cache`` setting if None
+
+    """
+    self._dataset = dataset
+    self._optimizers: dict[tuple, MobilityOptimizer] = {}
+    self._lock = threading.Lock()
+
+  @property
+  def dataset(self) -> CityDataset:
+    """Shared dataset, the cached process-wide one if none was given, loaded on first use."""
+    return self._dataset_for(use_cache=True)
+
+  def _dataset_for(self, use_cache: bool) -> CityDataset:
+    """Dataset of optimizers with a use_cache setting.
+
+    Raises:
+        ValueError: If the registry's dataset was loaded with another setting
+
+    """
+    if self._dataset is None:
+      return get_dataset(use_cache)
+    if self._dataset.use_cache != use_cache:
+      raise ValueError(
+        f"Registry dataset has use_cache={self._dataset.use_cache}, requested {use_cache}"
+      )
+    return self._dataset
+
+  def get(self, **params) -> MobilityOptimizer:
+    """Get the optimizer for a parameter set, creating it on first use.
+
+    Args:
+        **params: ``MobilityOptimizer`` keyword arguments other than ``dataset``;
+          omitted ones take their defaults, so equal settings share an instance
+
+    Returns:
+        Optimizer instance for these parameters
+
+    Raises:
+        ValueError: If use_cache does not match a dataset given to the registry
+
+    """
+    key = self._key(params)
+    with self._lock:
+      if key not in self._optimizers:
+        dataset = self._dataset_for(dict(key)["use_cache"])
+        self._optimizers[key] = MobilityOptimizer(**params, dataset=dataset)
+      return self._optimizers[key]
+
+  def optimizers(self) -> list[MobilityOptimizer]:
+    """Snapshot of the optimizers created so far."""
+    with self._lock:
+      return list(self._optimizers.values())
+
+  def __len__(self) -> int:
+    """Number of parameter sets served."""
+    return len(self._optimizers)
+
+  @staticmethod
+  def _key(params: dict[str, Any]) -> tuple:
+    """Hashable key of a parameter set, with defaults filled in."""
+    bound = inspect.signature(MobilityOptimizer).bind(**params)
+    bound.apply_defaults()
+    return tuple(
+      (name, tuple(sorted(value.items())) if isinstance(value, dict) else value)
+      for name, value in bound.arguments.items()
+      if name != "dataset"
+    )
+
+
+# Registry used by the API and the compute pool workers
+_registry: OptimizerRegistry | None = None
+
+
+def get_optimizer(**params) -> MobilityOptimizer:
+  """Get the optimizer for a parameter set from the process-wide registry.
+
+  Args:
+      **params: ``MobilityOptimizer`` keyword arguments other than ``dataset``
+
+  Returns:
+      Optimizer instance sharing the process-wide dataset of its use_cache setting
+
+  """
+  global _registry
+  if _registry is None:
+    _registry = OptimizerRegistry()
+  return _registry.get(**params)
+
+
 def example_usage():
   """Example of how to use the MobilityOptimizer."""
   print("=== DYNAMIC PROGRAMMING OPTIMIZER EXAMPLE ===\n")
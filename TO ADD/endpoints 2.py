@@ -709,6 +709,60 @@ async def get_best_zone(
     ) from e
 
 
+@router.get(
+  "/cities/{city_id}/strategy",
+  status_code=status.HTTP_200_OK,
+  summary="Get shift strategy",
+  description="Get the best route for a shift, solved within a latency budget",
+  response_description="Expected earnings and route with the time grid they were solved on",
+  tags=["recommendations"],
+)
+async def get_strategy(
+  city_id: int,
+  start_cluster: str = Query(..., description="Starting cluster ID"),
+  start_hour: int = Query(..., description="Starting hour (0-23)", ge=0, le=23),
+  work_hours: int = Query(..., description="Hours to work", ge=1, le=24),
+  date: datetime | None = Query(None, description="Date of the shift, or None for today"),
+  budget_ms: int = Query(200, description="Latency budget in milliseconds", ge=10, le=10000),
+) -> dict[str, Any]:
+  """Get the best route for a shift.
+
+  Returns the full-resolution optimum if it is cached or solved within the
+  budget, else the best route found on a coarser time grid; the full solve
+  then finishes in the background for the next request.
+
+  Args:
+    city_id: City identifier
+    start_cluster: Starting cluster ID
+    start_hour: Starting hour (0-23)
+    work_hours: Number of hours to work
+    date: Date of the shift, today if None
+    budget_ms: Latency budget in milliseconds
+
+  Returns:
+    Success response with the expected earnings and route
+
+  Raises:
+    HTTPException: 400 if the city or cluster is unknown, 500 if the solve fails
+
+  """
+  try:
+    result = await data_service.get_strategy(
+      city_id, start_cluster, start_hour, work_hours, date or datetime.now(), budget_ms / 1000.0
+    )
+    return {"status": "success", "data": result}
+  except ValueError as e:
+    raise HTTPException(
+      status_code=status.HTTP_400_BAD_REQUEST,
+      detail=str(e),
+    ) from e
+  except Exception as e:
+    raise HTTPException(
+      status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+      detail=f"Failed to get strategy: {e!s}",
+    ) from e
+
+
 @router.get(
   "/drivers/{driver_id}/selections",
   status_code=status.HTTP_200_OK,
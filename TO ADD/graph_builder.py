@@ -4,6 +4,9 @@ This module reads the ride trips CSV and constructs per-city directed graphs.
 Nodes represent clusters from the ride data, and edges carry average duration and fare
 between nodes (including self-edges). Utilities are provided to convert graphs
 to Cytoscape elements for interactive UI rendering.
+
+The ride table is read on first use of ``rides`` (or ``datasets.get_rides``),
+not at import.
 """
 
 import networkx as nx
@@ -11,114 +14,230 @@ import numpy as np
 import pandas as pd
 
 import os
+from collections.abc import Iterable
+
+from app.datasets import RIDES_CSV_PATH as CSV_PATH
+from app.datasets import get_rides
+from app.ride_accumulator import RideAccumulator
+
+# Ride columns build_city_graphs reads; "hour" can stand in for "start_time"
+GRAPH_COLUMNS = (
+  "city_id",
+  "pickup_cluster",
+  "dropoff_cluster",
+  "pickup_lat",
+  "pickup_lon",
+  "drop_lat",
+  "drop_lon",
+  "duration_mins",
+  "fare_amount",
+  "hour",
+)
+
+# Ride columns build_hex_index reads
+HEX_COLUMNS = (
+  "city_id",
+  "pickup_hex_id9",
+  "drop_hex_id9",
+  "pickup_cluster",
+  "dropoff_cluster",
+  "pickup_lat",
+  "pickup_lon",
+  "drop_lat",
+  "drop_lon",
+)
+
+HexKey = tuple[int, str]  # (city_id, hexagon id)
 
-CSV_PATH = "/workspace/server/data/ride_trips_with_clusters.csv"
 
-# Read CSV
-rides = pd.read_csv(CSV_PATH)
+def __getattr__(name: str):
+  """Load the ``rides`` table on first access instead of at import."""
+  if name == "rides":
+    return get_rides(CSV_PATH)
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Build graphs per city
 def build_city_graphs(rides: pd.DataFrame) -> dict[int, nx.DiGraph]:
-  """Build a directed graph per city where nodes are clusters and edges carry averages."""
-  city_graphs: dict[int, nx.DiGraph] = {}
-  for city_id in rides["city_id"].unique():
-    city_df = rides[rides["city_id"] == city_id].copy()
-    city_df["pickup_node"] = city_df["pickup_cluster"]
-    city_df["dropoff_node"] = city_df["dropoff_cluster"]
-    
-    g: nx.DiGraph = nx.DiGraph()
-    # Add nodes
-    nodes = set(city_df["pickup_node"]).union(set(city_df["dropoff_node"]))
-
-    # Store node positions (average lat/lon of all rides in this cluster) for UI positioning
-    for node_id in nodes:
-      # Get average coordinates for pickup clusters
-      pickup_coords = city_df[city_df["pickup_cluster"] == node_id][["pickup_lat", "pickup_lon"]]
-      dropoff_coords = city_df[city_df["dropoff_cluster"] == node_id][["drop_lat", "drop_lon"]]
-      
-      # Combine coordinates from both pickup and dropoff instances
-      all_lats = []
-      all_lons = []
-      
-      if not pickup_coords.empty:
-        all_lats.extend(pickup_coords["pickup_lat"].tolist())
-        all_lons.extend(pickup_coords["pickup_lon"].tolist())
-      
-      if not dropoff_coords.empty:
-        all_lats.extend(dropoff_coords["drop_lat"].tolist())
-        all_lons.extend(dropoff_coords["drop_lon"].tolist())
-      
-      # Calculate average position
-      if all_lats and all_lons:
-        avg_lat = np.mean(all_lats)
-        avg_lon = np.mean(all_lons)
-      else:
-        avg_lat = avg_lon = 0.0
-      
-      g.add_node(node_id, lat=avg_lat, lon=avg_lon)
-
-    # Add edges with average time and price, plus hourly statistics
-    # First convert start_time to datetime and extract hour
-    city_df["start_time"] = pd.to_datetime(city_df["start_time"])
-    city_df["hour"] = city_df["start_time"].dt.hour
-    
-    # Group by pickup/dropoff nodes and calculate overall averages
-    edge_stats = (
-      city_df.groupby(["pickup_node", "dropoff_node"])
-      .agg({
-        "duration_mins": "mean", 
-        "fare_amount": "mean",
-        "ride_id": "count"  # total trips
-      })
-      .reset_index()
-    )
-    
-    # Calculate hourly statistics for each edge
-    hourly_stats = (
-      city_df.groupby(["pickup_node", "dropoff_node", "hour"])
-      .agg({
-        "ride_id": "count",
-        "duration_mins": "mean",
-        "fare_amount": "mean"
-      })
-      .reset_index()
+  """Build a directed graph per city where nodes are clusters and edges carry averages.
+
+  Every statistic comes from one groupby over the whole ride table, so the
+  build is linear in the number of rides:
+  - node positions: mean of the stacked pickup and dropoff coordinates of
+    each (city, cluster)
+  - edge averages and trip counts per (city, pickup, dropoff)
+  - hourly statistics per (city, pickup, dropoff, hour), sorted by edge then
+    hour, and sliced per edge
+  Nodes and edges are then bulk-inserted, both in sorted cluster order, and
+  cities in order of first appearance. Typed tables from ``datasets.get_rides``
+  already hold categorical clusters and the start hour; raw CSV frames work too.
+  """
+  n_rides = len(rides)
+  if "hour" in rides.columns:
+    hour = rides["hour"]
+  else:
+    hour = pd.to_datetime(rides["start_time"]).dt.hour.rename("hour")
+
+  # Factorize cluster names once, unless already categorical with shared
+  # categories; groupbys then work on integer codes
+  clusters = pd.Categorical(
+    pd.concat([rides["pickup_cluster"], rides["dropoff_cluster"]], ignore_index=True)
+  )
+  pickup = pd.Series(clusters[:n_rides], index=rides.index, name="pickup_node")
+  dropoff = pd.Series(clusters[n_rides:], index=rides.index, name="dropoff_node")
+
+  # Store node positions (average lat/lon of all rides in this cluster) for UI positioning.
+  # np.mean per node over its pickups then dropoffs keeps the rounding of a plain mean.
+  node_coords = pd.DataFrame(
+    {
+      "city_id": np.concatenate([rides["city_id"].to_numpy()] * 2),
+      "node": clusters,
+      "lat": np.concatenate([rides["pickup_lat"].to_numpy(), rides["drop_lat"].to_numpy()]),
+      "lon": np.concatenate([rides["pickup_lon"].to_numpy(), rides["drop_lon"].to_numpy()]),
+    }
+  )
+  node_rows = node_coords.groupby(["city_id", "node"], observed=True, sort=True).indices
+  lats, lons = node_coords["lat"].to_numpy(), node_coords["lon"].to_numpy()
+
+  # Overall averages and trip counts per edge
+  edge_keys = [rides["city_id"], pickup, dropoff]
+  edge_groups = rides.groupby(edge_keys, observed=True)
+  edge_stats = edge_groups.agg({"duration_mins": "mean", "fare_amount": "mean"})
+  edge_stats["trips"] = edge_groups.size()
+
+  # Hourly statistics per edge, one row per (edge, hour) with trips
+  hourly_groups = rides.groupby([*edge_keys, hour], observed=True)
+  hourly_stats = hourly_groups.agg({"duration_mins": "mean", "fare_amount": "mean"})
+  hourly_stats["trips"] = hourly_groups.size()
+  hourly_counts = (
+    hourly_stats.groupby(level=[0, 1, 2], observed=True)
+    .size()
+    .reindex(edge_stats.index, fill_value=0)
+  )
+  offsets = np.concatenate([[0], np.cumsum(hourly_counts.to_numpy())]).tolist()
+  hours = hourly_stats.index.get_level_values("hour").astype(int).tolist()
+  hourly_trips = hourly_stats["trips"].astype(int).tolist()
+  hourly_time = hourly_stats["duration_mins"].tolist()
+  hourly_price = hourly_stats["fare_amount"].tolist()
+
+  city_graphs: dict[int, nx.DiGraph] = {
+    int(city_id): nx.DiGraph() for city_id in rides["city_id"].unique()
+  }
+  for city_id, node_id in sorted(node_rows):
+    rows = node_rows[city_id, node_id]
+    city_graphs[int(city_id)].add_node(node_id, lat=np.mean(lats[rows]), lon=np.mean(lons[rows]))
+
+  edges: dict[int, list] = {city_id: [] for city_id in city_graphs}
+  for e, ((city_id, pickup_node, dropoff_node), avg_time, avg_price, total_trips) in enumerate(
+    zip(
+      edge_stats.index,
+      edge_stats["duration_mins"].tolist(),
+      edge_stats["fare_amount"].tolist(),
+      edge_stats["trips"].tolist(),
+      strict=True,
     )
-    
-    for _, row in edge_stats.iterrows():
-      pickup_node = row["pickup_node"]
-      dropoff_node = row["dropoff_node"]
-      
-      # Get hourly data for this edge
-      edge_hourly = hourly_stats[
-        (hourly_stats["pickup_node"] == pickup_node) & 
-        (hourly_stats["dropoff_node"] == dropoff_node)
-      ]
-      
-      # Create hourly maps
-      hourly_trips = {}
-      hourly_avg_time = {}
-      hourly_avg_price = {}
-      
-      for _, hourly_row in edge_hourly.iterrows():
-        hour = int(hourly_row["hour"])
-        hourly_trips[hour] = int(hourly_row["ride_id"])
-        hourly_avg_time[hour] = float(hourly_row["duration_mins"])
-        hourly_avg_price[hour] = float(hourly_row["fare_amount"])
-      
-      g.add_edge(
+  ):
+    start, stop = offsets[e], offsets[e + 1]
+    edge_hours = hours[start:stop]
+    edges[int(city_id)].append(
+      (
         pickup_node,
         dropoff_node,
-        avg_time=float(row["duration_mins"]),
-        avg_price=float(row["fare_amount"]),
-        total_trips=int(row["ride_id"]),
-        hourly_trips=hourly_trips,
-        hourly_avg_time=hourly_avg_time,
-        hourly_avg_price=hourly_avg_price,
+        {
+          "avg_time": avg_time,
+          "avg_price": avg_price,
+          "total_trips": total_trips,
+          "hourly_trips": dict(zip(edge_hours, hourly_trips[start:stop], strict=True)),
+          "hourly_avg_time": dict(zip(edge_hours, hourly_time[start:stop], strict=True)),
+          "hourly_avg_price": dict(zip(edge_hours, hourly_price[start:stop], strict=True)),
+        },
       )
-    city_graphs[int(city_id)] = g
+    )
+  for city_id, city_edges in edges.items():
+    city_graphs[city_id].add_edges_from(city_edges)
   return city_graphs
 
 
+def build_city_graphs_streaming(chunks: Iterable[pd.DataFrame]) -> dict[int, nx.DiGraph]:
+  """Build the city graphs from rides streamed in chunks.
+
+  Each chunk is folded into per-edge, per-hour sums (``RideAccumulator``), so
+  peak memory is set by the chunk size and the number of edges, not by the
+  length of the history. The graphs have the same structure as those of
+  ``build_city_graphs``, with averages equal up to floating-point rounding.
+
+  Args:
+      chunks: Ride tables with the ``GRAPH_COLUMNS`` (or ``start_time``
+        instead of ``hour``), e.g. from ``datasets.iter_rides``
+
+  Returns:
+      Directed graph per city
+
+  """
+  accumulator = RideAccumulator()
+  for chunk in chunks:
+    accumulator.add_rides(chunk)
+  return accumulator.to_graphs()
+
+
+def build_hex_index(chunks: Iterable[pd.DataFrame]) -> dict[HexKey, tuple[str, float, float]]:
+  """Map every hexagon of the ride history to a cluster and a coordinate.
+
+  Live trips report hexagons, while graph nodes are clusters. A hexagon maps
+  to the cluster most of its pickups and dropoffs fell in (ties to the first
+  in sorted order), and to the mean coordinate of those pickups and dropoffs.
+
+  Args:
+      chunks: Ride tables with the ``HEX_COLUMNS``, e.g. ``[rides]`` or
+        ``datasets.iter_rides(columns=HEX_COLUMNS)``
+
+  Returns:
+      (city_id, hexagon id) -> (cluster, lat, lon)
+
+  """
+  sums = []
+  for rides in chunks:
+    stacked = pd.DataFrame(
+      {
+        "city_id": np.concatenate([rides["city_id"].to_numpy()] * 2),
+        "hex": pd.concat(
+          [rides["pickup_hex_id9"].astype(object), rides["drop_hex_id9"].astype(object)],
+          ignore_index=True,
+        ),
+        "node": pd.concat(
+          [rides["pickup_cluster"].astype(object), rides["dropoff_cluster"].astype(object)],
+          ignore_index=True,
+        ),
+        "lat": np.concatenate([rides["pickup_lat"].to_numpy(), rides["drop_lat"].to_numpy()]),
+        "lon": np.concatenate([rides["pickup_lon"].to_numpy(), rides["drop_lon"].to_numpy()]),
+      }
+    )
+    groups = stacked.groupby(["city_id", "hex", "node"])
+    chunk_sums = groups[["lat", "lon"]].sum()
+    chunk_sums["count"] = groups.size()
+    sums.append(chunk_sums)
+  if not sums:
+    return {}
+
+  per_node = pd.concat(sums).groupby(level=[0, 1, 2]).sum()
+  per_hex = per_node.groupby(level=[0, 1]).sum()
+  # Stable sort by count, so ties keep the sorted cluster order
+  majority = (
+    per_node["count"].sort_values(ascending=False, kind="stable").groupby(level=[0, 1]).head(1)
+  )
+  clusters = dict(zip(majority.index.droplevel(2), majority.index.get_level_values(2), strict=True))
+  return {
+    (int(city_id), hexagon): (clusters[city_id, hexagon], lat / count, lon / count)
+    for (city_id, hexagon), lat, lon, count in zip(
+      per_hex.index,
+      per_hex["lat"].tolist(),
+      per_hex["lon"].tolist(),
+      per_hex["count"].tolist(),
+      strict=True,
+    )
+  }
+
+
 def graph_to_cytoscape_elements(g: nx.DiGraph) -> list[dict]:
   """Convert a NetworkX graph to Cytoscape elements list for interactive UI rendering."""
   elements: list[dict] = []
@@ -183,7 +302,7 @@ def save_graphs(graphs, output_dir="graphs"):
   return pickle_path
 
 if __name__ == "__main__":
-  graphs = build_city_graphs(rides)
+  graphs = build_city_graphs(get_rides(CSV_PATH))
   
   # Save graphs
   save_graphs(graphs)
@@ -1,13 +1,20 @@
 """FastAPI application for JunctionX Uber Challenge."""
 
+import asyncio
+import os
 from collections.abc import AsyncIterator
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app import update_feed
 from app.database import db_manager
 from app.endpoints import router
+from app.service import apply_optimizer_update, get_optimizer
+
+# Worker processes running the async optimizer solves, none to run them in threads
+COMPUTE_POOL_WORKERS = int(os.environ.get("COMPUTE_POOL_WORKERS", "0"))
 
 
 @asynccontextmanager
@@ -15,7 +22,26 @@ async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
   """Manage application lifecycle - startup and shutdown."""
   await db_manager.init_redis()
   await db_manager.init_sqlite()
+
+  # Serve the nightly precomputed recommendations, if built
+  from app.dynamic_programming_optimizer import load_recommendations
+
+  await asyncio.to_thread(load_recommendations)
+
+  # Move DP solves off the event loop and across cores
+  optimizer = None
+  if COMPUTE_POOL_WORKERS > 0:
+    optimizer = await asyncio.to_thread(get_optimizer)
+    await optimizer.start_compute_pool(max_workers=COMPUTE_POOL_WORKERS)
+
+  # Apply the live updates other workers receive
+  updates = asyncio.create_task(update_feed.listen(db_manager.redis, apply_optimizer_update))
   yield
+  updates.cancel()
+  with suppress(asyncio.CancelledError):
+    await updates
+  if optimizer is not None:
+    await asyncio.to_thread(optimizer.stop_compute_pool)
   await db_manager.close_redis()
 
 
@@ -0,0 +1,292 @@
+"""Precomputed recommendation tables for serving without a live DP solve.
+
+The nightly precompute (``dp_precompute.py``) solves every city x start hour
+x shift length x date of a horizon and writes a ``RecommendationStore``: for
+each distinct shift, every start cluster ranked by expected earnings, with
+its optimal path, and the shift's full value and policy table. Shifts are
+keyed like the optimizer's caches, by
+``"{city}:{start_hour}:{work_hours}:{scenario}"`` where the scenario key
+covers forecast weather, surge and a version of the graphs and solver
+parameters. Dates with the same forecast share one row, and a row goes
+unused as soon as a live surge update or different parameters change the
+key, so lookups never serve stale values.
+
+The store is an ``array_store`` directory of flat arrays, memory-mapped
+read-only so every worker process serves from the same pages:
+- row_keys, row_city: shift key and city per row
+- row_offsets: CSR offsets of each row's entries, ranked best first
+- entry_node, entry_value: start cluster index and expected earnings
+- path_offsets, path_nodes: CSR paths of the entries, as cluster indices
+- table_offsets, table_rows: start and row count of each row's value table
+  in the flattened table arrays
+- table_values, table_next_node, table_next_steps: the value tables, each
+  (rows, n_nodes) block flattened
+The manifest metadata holds the cluster names per city and build information.
+"""
+
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.array_store import load_arrays, save_arrays
+from app.dp_engine import ValueTable
+
+# Where the API looks for the nightly store at startup
+DEFAULT_STORE_PATH = Path(__file__).parent.parent / "data" / "cache" / "recommendations"
+
+
+class RecommendationStore:
+  """Read-only ranked start clusters and paths per precomputed shift."""
+
+  def __init__(self, arrays: dict[str, np.ndarray], metadata: dict[str, Any]):
+    """Wrap loaded arrays; use ``build`` or ``load`` to create a store.
+
+    Args:
+        arrays: Flat arrays as described in the module docstring
+        metadata: Build information, with "nodes" mapping city ids to cluster names
+
+    """
+    self.arrays = arrays
+    self.metadata = metadata
+    self.nodes = {int(city_id): names for city_id, names in metadata["nodes"].items()}
+    self.node_index = {
+      city_id: {node: k for k, node in enumerate(names)} for city_id, names in self.nodes.items()
+    }
+    self.row_index = {key: row for row, key in enumerate(arrays["row_keys"].tolist())}
+    self.hits = 0
+    self.misses = 0
+
+  @staticmethod
+  def shift_key(city_id: int, start_hour: int, work_hours: int, scenario: str) -> str:
+    """Key of a shift's row, matching the optimizer's scenario-based cache keys."""
+    return f"{city_id}:{start_hour}:{work_hours}:{scenario}"
+
+  @classmethod
+  def build(
+    cls,
+    shifts: Iterable[tuple[str, int, list[tuple[str, float, list[str]]], ValueTable]],
+    nodes: dict[int, list[str]],
+    metadata: dict[str, Any] | None = None,
+  ) -> "RecommendationStore":
+    """Pack ranked results and value tables into a store.
+
+    Args:
+        shifts: (shift_key, city_id, ranked (cluster, earnings, path) results,
+          value table) per distinct shift
+        nodes: Cluster names per city, in the compiled graph's order
+        metadata: Extra build information to keep with the store
+
+    Returns:
+        Store holding every given shift
+
+    """
+    row_keys, row_city, row_offsets = [], [], [0]
+    entry_node, entry_value, path_offsets, path_nodes = [], [], [0], []
+    table_offsets, table_rows, tables, table_size = [], [], [], 0
+    index = {city_id: {node: k for k, node in enumerate(names)} for city_id, names in nodes.items()}
+
+    for key, city_id, ranked, table in shifts:
+      row_keys.append(key)
+      row_city.append(city_id)
+      for cluster, earnings, path in ranked:
+        entry_node.append(index[city_id][cluster])
+        entry_value.append(earnings)
+        path_nodes.extend(index[city_id][node] for node in path)
+        path_offsets.append(len(path_nodes))
+      row_offsets.append(len(entry_node))
+      table_offsets.append(table_size)
+      table_rows.append(len(table.values))
+      tables.append(table)
+      table_size += table.values.size
+
+    arrays = {
+      "row_keys": np.array(row_keys, dtype=str),
+      "row_city": np.array(row_city, dtype=np.int32),
+      "row_offsets": np.array(row_offsets, dtype=np.int64),
+      "entry_node": np.array(entry_node, dtype=np.int32),
+      "entry_value": np.array(entry_value, dtype=np.float64),
+      "path_offsets": np.array(path_offsets, dtype=np.int64),
+      "path_nodes": np.array(path_nodes, dtype=np.int32),
+      "table_offsets": np.array(table_offsets, dtype=np.int64),
+      "table_rows": np.array(table_rows, dtype=np.int64),
+    }
+    # Same dtypes as the engine's tables, so served tables match live ones exactly
+    for name, dtype in (("values", np.float64), ("next_node", np.int64), ("next_steps", np.int64)):
+      arrays[f"table_{name}"] = np.concatenate(
+        [np.ravel(getattr(table, name)) for table in tables] or [np.empty(0)]
+      ).astype(dtype)
+    metadata = {**(metadata or {}), "nodes": {str(city): names for city, names in nodes.items()}}
+    return cls(arrays, metadata)
+
+  def save(self, path: Path | str) -> Path:
+    """Write the store to an array store directory, replacing it atomically.
+
+    Args:
+        path: Destination directory
+
+    Returns:
+        Path written
+
+    """
+    return save_arrays(path, self.arrays, self.metadata)
+
+  @classmethod
+  def load(cls, path: Path | str) -> "RecommendationStore":
+    """Memory-map a store written by ``save``.
+
+    Args:
+        path: Store directory
+
+    Returns:
+        Store reading the mapped arrays
+
+    """
+    arrays, metadata = load_arrays(path)
+    return cls(arrays, metadata)
+
+  def __len__(self) -> int:
+    """Number of precomputed shifts."""
+    return len(self.row_index)
+
+  def _entries(self, key: str) -> slice | None:
+    """Entry range of a shift row, counting the lookup."""
+    row = self.row_index.get(key)
+    if row is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    offsets = self.arrays["row_offsets"]
+    return slice(int(offsets[row]), int(offsets[row + 1]))
+
+  def _result(self, city_id: int, entry: int) -> tuple[str, float, list[str]]:
+    """(cluster, earnings, path) of one entry."""
+    names = self.nodes[city_id]
+    offsets = self.arrays["path_offsets"]
+    path = self.arrays["path_nodes"][offsets[entry] : offsets[entry + 1]]
+    return (
+      names[int(self.arrays["entry_node"][entry])],
+      float(self.arrays["entry_value"][entry]),
+      [names[k] for k in path.tolist()],
+    )
+
+  def best_starting_positions(
+    self, city_id: int, start_hour: int, work_hours: int, scenario: str, top_k: int
+  ) -> list[tuple[str, float, list[str]]] | None:
+    """Look up the top start clusters of a shift.
+
+    Args:
+        city_id: City identifier
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work
+        scenario: The shift's scenario key
+        top_k: Number of top positions to return
+
+    Returns:
+        List of (cluster, expected_earnings, optimal_path), best first, or
+        None if the shift was not precomputed
+
+    """
+    entries = self._entries(self.shift_key(city_id, start_hour, work_hours, scenario))
+    if entries is None:
+      return None
+    stop = min(entries.stop, entries.start + top_k)
+    return [self._result(city_id, entry) for entry in range(entries.start, stop)]
+
+  def lookup(
+    self, city_id: int, start_cluster: str, start_hour: int, work_hours: int, scenario: str
+  ) -> tuple[float, list[str]] | None:
+    """Look up the result of one start cluster, as returned by ``solve_dp``.
+
+    Returns:
+        (total_expected_earnings, optimal_strategy), or None if not precomputed
+
+    """
+    entries = self._entries(self.shift_key(city_id, start_hour, work_hours, scenario))
+    node = self.node_index.get(city_id, {}).get(start_cluster)
+    if entries is None or node is None:
+      return None
+    matches = np.flatnonzero(self.arrays["entry_node"][entries] == node)
+    if not len(matches):
+      return None
+    _, earnings, path = self._result(city_id, entries.start + int(matches[0]))
+    return earnings, path
+
+  def value_table(
+    self, city_id: int, start_hour: int, work_hours: int, scenario: str
+  ) -> ValueTable | None:
+    """Look up the full value and policy table of a shift.
+
+    Args:
+        city_id: City identifier
+        start_hour: Starting hour (0-23)
+        work_hours: Number of hours to work
+        scenario: The shift's scenario key
+
+    Returns:
+        Read-only value table of shape (n_steps + 1, n_nodes), or None if the
+        shift was not precomputed
+
+    """
+    row = self.row_index.get(self.shift_key(city_id, start_hour, work_hours, scenario))
+    if row is None:
+      return None
+    n_rows = int(self.arrays["table_rows"][row])
+    start = int(self.arrays["table_offsets"][row])
+    stop = start + n_rows * len(self.nodes[city_id])
+    return ValueTable(
+      *(
+        self.arrays[f"table_{name}"][start:stop].reshape(n_rows, -1)
+        for name in ValueTable._fields
+      )
+    )
+
+  async def load_into_redis(self, db, ttl_seconds: int = 26 * 3600, top_k: int = 100) -> int:
+    """Write every precomputed shift to Redis under the optimizer's cache keys.
+
+    Async solves check Redis first, so this turns them into lookups in every
+    worker process.
+
+    Args:
+        db: Database manager with the optimizer's Redis cache methods
+        ttl_seconds: Expiry of the entries, by default until after the next nightly run
+        top_k: Start clusters stored per best-positions entry
+
+    Returns:
+        Number of shifts written
+
+    """
+    for key, row in self.row_index.items():
+      city_id, start_hour, work_hours, scenario = key.split(":", 3)
+      city_id, start_hour, work_hours = int(city_id), int(start_hour), int(work_hours)
+      offsets = self.arrays["row_offsets"]
+      ranked = [
+        self._result(city_id, entry) for entry in range(int(offsets[row]), int(offsets[row + 1]))
+      ]
+      await db.set_best_starting_positions(
+        city_id, start_hour, work_hours, scenario, ranked[:top_k], ttl_seconds=ttl_seconds
+      )
+      # Same key format as MobilityOptimizer._get_dp_cache_key
+      for cluster, earnings, path in ranked:
+        await db.set_dp_result(
+          f"dp:{city_id}:{cluster}:{start_hour}:{work_hours}:{scenario}",
+          earnings,
+          path,
+          ttl_seconds=ttl_seconds,
+        )
+    return len(self.row_index)
+
+  def stats(self) -> dict[str, Any]:
+    """Report the store's size, build information and lookup counts."""
+    lookups = self.hits + self.misses
+    return {
+      "shifts": len(self),
+      "entries": len(self.arrays["entry_node"]),
+      "bytes": sum(array.nbytes for array in self.arrays.values()),
+      "built_at": self.metadata.get("built_at"),
+      "hits": self.hits,
+      "misses": self.misses,
+      "hit_rate": self.hits / lookups if lookups else 0.0,
+    }
+
@@ -0,0 +1,207 @@
+"""Bounded in-memory caches for optimizer results.
+
+``BoundedCache`` is an LRU mapping capped by entry count and/or estimated
+bytes, with an optional per-entry TTL and hit/miss/eviction counters. The
+optimizer uses one instance per kind of cached result so that a long-lived
+worker keeps a fixed memory ceiling, and ``stats()`` exposes hit rates for
+tuning the limits under real traffic.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+import numpy as np
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+  """Estimate the resident size of a cached value in bytes.
+
+  NumPy arrays count their buffers; tuples, lists and dicts are walked one
+  level deep per nesting, which covers the (earnings, path) results and
+  transition matrices the optimizer stores.
+  """
+  if isinstance(value, np.ndarray):
+    return value.nbytes + sys.getsizeof(value)
+  if isinstance(value, (tuple, list)):
+    return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+  if isinstance(value, dict):
+    return sys.getsizeof(value) + sum(
+      estimate_size(key) + estimate_size(item) for key, item in value.items()
+    )
+  nbytes = getattr(value, "nbytes", None)
+  if isinstance(nbytes, int):
+    return nbytes
+  return sys.getsizeof(value)
+
+
+class BoundedCache:
+  """Thread-safe LRU cache with size, byte and TTL limits."""
+
+  def __init__(
+    self,
+    name: str,
+    max_entries: int | None = None,
+    max_bytes: int | None = None,
+    ttl_seconds: float | None = None,
+    sizeof: Callable[[Any], int] = estimate_size,
+    clock: Callable[[], float] = time.monotonic,
+  ):
+    """Create an empty cache.
+
+    Args:
+        name: Name reported in stats
+        max_entries: Maximum number of entries, unbounded if None
+        max_bytes: Maximum estimated bytes across entries, unbounded if None
+        ttl_seconds: Default time to live per entry, no expiry if None
+        sizeof: Function estimating the size of a value in bytes
+        clock: Monotonic time source, in seconds
+
+    """
+    self.name = name
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.ttl_seconds = ttl_seconds
+    self._sizeof = sizeof
+    self._clock = clock
+    self._lock = threading.Lock()
+
+    # key -> (value, size_bytes, expires_at or None), least recently used first
+    self._entries: OrderedDict[Hashable, tuple[Any, int, float | None]] = OrderedDict()
+    self._bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+
+  def get(self, key: Hashable, default: Any = None) -> Any:
+    """Get a value and mark it as recently used, counting a hit or miss."""
+    with self._lock:
+      entry = self._live_entry(key)
+      if entry is None:
+        self.misses += 1
+        return default
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return entry[0]
+
+  def peek(self, key: Hashable, default: Any = None) -> Any:
+    """Get a value without marking it used or counting a lookup."""
+    with self._lock:
+      entry = self._live_entry(key)
+      return default if entry is None else entry[0]
+
+  def set(self, key: Hashable, value: Any, ttl_seconds: float | None = None) -> None:
+    """Store a value, evicting least recently used entries to stay within limits.
+
+    Args:
+        key: Cache key
+        value: Value to store
+        ttl_seconds: Time to live for this entry, the cache default if None
+
+    """
+    ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+    expires_at = self._clock() + ttl if ttl is not None else None
+    size = self._sizeof(value)
+
+    with self._lock:
+      if key in self._entries:
+        self._remove(key)
+      if self.max_bytes is not None and size > self.max_bytes:
+        # Larger than the whole budget: caching it would flush everything else
+        self.evictions += 1
+        return
+
+      self._entries[key] = (value, size, expires_at)
+      self._bytes += size
+      self._enforce_limits()
+
+  def pop(self, key: Hashable, default: Any = None) -> Any:
+    """Remove a value and return it, or default if absent."""
+    with self._lock:
+      if key not in self._entries:
+        return default
+      value = self._entries[key][0]
+      self._remove(key)
+      return value
+
+  def clear(self) -> None:
+    """Drop every entry; counters are kept."""
+    with self._lock:
+      self._entries.clear()
+      self._bytes = 0
+
+  def keys(self) -> list[Hashable]:
+    """Snapshot of the keys currently stored, least recently used first."""
+    with self._lock:
+      return list(self._entries)
+
+  def stats(self) -> dict[str, Any]:
+    """Report size and hit/miss/eviction counters."""
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {
+        "name": self.name,
+        "entries": len(self._entries),
+        "bytes": self._bytes,
+        "max_entries": self.max_entries,
+        "max_bytes": self.max_bytes,
+        "ttl_seconds": self.ttl_seconds,
+        "hits": self.hits,
+        "misses": self.misses,
+        "hit_rate": self.hits / lookups if lookups else 0.0,
+        "evictions": self.evictions,
+        "expirations": self.expirations,
+      }
+
+  def __contains__(self, key: Hashable) -> bool:
+    """Whether a live entry exists; does not count as a lookup."""
+    with self._lock:
+      return self._live_entry(key) is not None
+
+  def __getitem__(self, key: Hashable) -> Any:
+    """Get a value, raising KeyError if absent or expired."""
+    value = self.get(key, _MISSING)
+    if value is _MISSING:
+      raise KeyError(key)
+    return value
+
+  def __setitem__(self, key: Hashable, value: Any) -> None:
+    """Store a value with the default TTL."""
+    self.set(key, value)
+
+  def __len__(self) -> int:
+    """Number of stored entries, including ones not yet found expired."""
+    return len(self._entries)
+
+  def _live_entry(self, key: Hashable) -> tuple[Any, int, float | None] | None:
+    """Get an entry, dropping it if expired. Caller holds the lock."""
+    entry = self._entries.get(key)
+    if entry is None:
+      return None
+    expires_at = entry[2]
+    if expires_at is not None and self._clock() >= expires_at:
+      self._remove(key)
+      self.expirations += 1
+      return None
+    return entry
+
+  def _remove(self, key: Hashable) -> None:
+    """Remove an entry and release its bytes. Caller holds the lock."""
+    _, size, _ = self._entries.pop(key)
+    self._bytes -= size
+
+  def _enforce_limits(self) -> None:
+    """Evict least recently used entries until within limits. Caller holds the lock."""
+    while self._entries and (
+      (self.max_entries is not None and len(self._entries) > self.max_entries)
+      or (self.max_bytes is not None and self._bytes > self.max_bytes)
+    ):
+      oldest = next(iter(self._entries))
+      self._remove(oldest)
+      self.evictions += 1
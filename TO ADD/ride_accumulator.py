@@ -0,0 +1,287 @@
+"""Mergeable running ride statistics for building city graphs without the full history.
+
+``RideAccumulator`` keeps sums, not means:
+- per (city, pickup, dropoff) edge and hour of day: trip count, total
+  duration and total fare, as (n_edges, 24) arrays
+- per (city, cluster) node: number of pickup and dropoff coordinates and
+  their sums
+
+Ride tables are folded in one chunk at a time, so memory grows with the
+number of edges, not with the number of rides, and two accumulators merge by
+adding their sums. ``to_graphs`` finalizes the sums into the graph structure
+built by ``graph_builder.build_city_graphs``; averages are sums divided by
+counts, equal to the in-memory build's up to floating-point rounding.
+``from_graphs`` goes the other way, so that completed trips can be added
+one at a time (``add_trip``) to graphs loaded from the cache.
+"""
+
+from collections.abc import Hashable, Iterable
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+HOURS_PER_DAY = 24
+
+EdgeKey = tuple[int, str, str]  # (city_id, pickup cluster, dropoff cluster)
+NodeKey = tuple[int, str]  # (city_id, cluster)
+
+
+class RideAccumulator:
+  """Per-edge, per-hour and per-node ride sums, growing as new keys appear."""
+
+  def __init__(self):
+    """Start with no rides."""
+    # City ids in order of first appearance
+    self.cities: dict[int, None] = {}
+    self.edge_index: dict[EdgeKey, int] = {}
+    self.node_index: dict[NodeKey, int] = {}
+    self.trips = np.zeros((0, HOURS_PER_DAY), dtype=np.int64)
+    self.duration_sum = np.zeros((0, HOURS_PER_DAY))
+    self.fare_sum = np.zeros((0, HOURS_PER_DAY))
+    self.coord_count = np.zeros(0, dtype=np.int64)
+    self.lat_sum = np.zeros(0)
+    self.lon_sum = np.zeros(0)
+
+  @classmethod
+  def from_graphs(cls, city_graphs: dict[int, nx.DiGraph]) -> "RideAccumulator":
+    """Recover the sums behind built city graphs, to keep adding rides to them.
+
+    Hourly sums are the hourly averages times the hourly trip counts. Every
+    ride adds one coordinate to its pickup node and one to its dropoff node,
+    so a node's coordinate count is its outgoing plus incoming trips.
+
+    Args:
+        city_graphs: Graphs built by ``graph_builder.build_city_graphs``
+
+    Returns:
+        Accumulator whose ``to_graphs`` reproduces the graphs up to rounding
+
+    """
+    accumulator = cls()
+    for city_id, graph in city_graphs.items():
+      accumulator.cities.setdefault(int(city_id), None)
+      edge_ids = accumulator._ids(
+        accumulator.edge_index, ((int(city_id), u, v) for u, v in graph.edges())
+      )
+      node_ids = accumulator._ids(
+        accumulator.node_index, ((int(city_id), node) for node in graph.nodes())
+      )
+      accumulator._reserve()
+      node_position = {node: k for k, node in enumerate(graph.nodes())}
+      for e, (u, v, data) in zip(edge_ids, graph.edges(data=True), strict=True):
+        for hour, count in data.get("hourly_trips", {}).items():
+          accumulator.trips[e, hour] = count
+          accumulator.duration_sum[e, hour] = data["hourly_avg_time"][hour] * count
+          accumulator.fare_sum[e, hour] = data["hourly_avg_price"][hour] * count
+        total_trips = data.get("total_trips", 0)
+        accumulator.coord_count[node_ids[node_position[u]]] += total_trips
+        accumulator.coord_count[node_ids[node_position[v]]] += total_trips
+      for n, (_, data) in zip(node_ids, graph.nodes(data=True), strict=True):
+        accumulator.lat_sum[n] = data.get("lat", 0.0) * accumulator.coord_count[n]
+        accumulator.lon_sum[n] = data.get("lon", 0.0) * accumulator.coord_count[n]
+    return accumulator
+
+  @property
+  def n_edges(self) -> int:
+    """Number of edges seen so far."""
+    return len(self.edge_index)
+
+  @staticmethod
+  def _grown(array: np.ndarray, size: int) -> np.ndarray:
+    """Zero-padded copy of array with room for at least size rows, doubling capacity."""
+    if size <= len(array):
+      return array
+    grown = np.zeros((max(size, 2 * len(array)), *array.shape[1:]), dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+  def _ids(self, index: dict, keys: Iterable[Hashable]) -> np.ndarray:
+    """Look up the ids of keys, assigning new ids to unseen ones."""
+    return np.array([index.setdefault(key, len(index)) for key in keys], dtype=np.int64)
+
+  def _reserve(self) -> None:
+    """Grow the arrays to fit every assigned edge and node id."""
+    n_edges, n_nodes = len(self.edge_index), len(self.node_index)
+    self.trips = self._grown(self.trips, n_edges)
+    self.duration_sum = self._grown(self.duration_sum, n_edges)
+    self.fare_sum = self._grown(self.fare_sum, n_edges)
+    self.coord_count = self._grown(self.coord_count, n_nodes)
+    self.lat_sum = self._grown(self.lat_sum, n_nodes)
+    self.lon_sum = self._grown(self.lon_sum, n_nodes)
+
+  def add_rides(self, rides: pd.DataFrame) -> None:
+    """Fold a chunk of rides into the sums.
+
+    Args:
+        rides: Rides with city_id, pickup/dropoff clusters and coordinates,
+          duration_mins, fare_amount, and hour or start_time
+
+    """
+    for city_id in rides["city_id"].unique():
+      self.cities.setdefault(int(city_id), None)
+    if "hour" in rides.columns:
+      hour = rides["hour"]
+    else:
+      hour = pd.to_datetime(rides["start_time"]).dt.hour.rename("hour")
+
+    # One row per (edge, hour) of the chunk
+    groups = rides.groupby(
+      [rides["city_id"], rides["pickup_cluster"], rides["dropoff_cluster"], hour], observed=True
+    )
+    sums = groups[["duration_mins", "fare_amount"]].sum()
+    counts = groups.size().to_numpy()
+    edge_codes, edges = pd.factorize(sums.index.droplevel(-1))
+    edge_ids = self._ids(self.edge_index, ((int(c), p, d) for c, p, d in edges))[edge_codes]
+    hours = sums.index.get_level_values(-1).to_numpy().astype(np.int64)
+
+    # One row per (city, cluster) of the stacked pickup and dropoff coordinates
+    coords = pd.DataFrame(
+      {
+        "city_id": np.concatenate([rides["city_id"].to_numpy()] * 2),
+        "node": pd.concat(
+          [rides["pickup_cluster"].astype(object), rides["dropoff_cluster"].astype(object)],
+          ignore_index=True,
+        ),
+        "lat": np.concatenate([rides["pickup_lat"].to_numpy(), rides["drop_lat"].to_numpy()]),
+        "lon": np.concatenate([rides["pickup_lon"].to_numpy(), rides["drop_lon"].to_numpy()]),
+      }
+    )
+    node_groups = coords.groupby(["city_id", "node"])
+    node_sums = node_groups[["lat", "lon"]].sum()
+    node_ids = self._ids(self.node_index, ((int(c), n) for c, n in node_sums.index))
+
+    self._reserve()
+    np.add.at(self.trips, (edge_ids, hours), counts)
+    np.add.at(self.duration_sum, (edge_ids, hours), sums["duration_mins"].to_numpy())
+    np.add.at(self.fare_sum, (edge_ids, hours), sums["fare_amount"].to_numpy())
+    np.add.at(self.coord_count, node_ids, node_groups.size().to_numpy())
+    np.add.at(self.lat_sum, node_ids, node_sums["lat"].to_numpy())
+    np.add.at(self.lon_sum, node_ids, node_sums["lon"].to_numpy())
+
+  def add_trip(
+    self,
+    city_id: int,
+    pickup_cluster: str,
+    dropoff_cluster: str,
+    hour: int,
+    duration_mins: float,
+    fare_amount: float,
+    pickup: tuple[float, float],
+    dropoff: tuple[float, float],
+  ) -> EdgeKey:
+    """Fold in a single trip in O(1).
+
+    Args:
+        city_id: City identifier
+        pickup_cluster: Pickup cluster ID
+        dropoff_cluster: Dropoff cluster ID
+        hour: Hour of day the trip started (0-23)
+        duration_mins: Trip duration in minutes
+        fare_amount: Trip fare
+        pickup: Pickup (lat, lon)
+        dropoff: Dropoff (lat, lon)
+
+    Returns:
+        Key of the updated edge
+
+    """
+    self.cities.setdefault(int(city_id), None)
+    key = (int(city_id), pickup_cluster, dropoff_cluster)
+    edge_id = self.edge_index.setdefault(key, len(self.edge_index))
+    node_ids = [
+      self.node_index.setdefault((int(city_id), node), len(self.node_index))
+      for node in (pickup_cluster, dropoff_cluster)
+    ]
+    self._reserve()
+    self.trips[edge_id, hour] += 1
+    self.duration_sum[edge_id, hour] += duration_mins
+    self.fare_sum[edge_id, hour] += fare_amount
+    for node_id, (lat, lon) in zip(node_ids, (pickup, dropoff), strict=True):
+      self.coord_count[node_id] += 1
+      self.lat_sum[node_id] += lat
+      self.lon_sum[node_id] += lon
+    return key
+
+  def merge(self, other: "RideAccumulator") -> None:
+    """Add the sums of another accumulator, e.g. one built from another chunk.
+
+    Args:
+        other: Accumulator to fold in; it is not modified
+
+    """
+    for city_id in other.cities:
+      self.cities.setdefault(city_id, None)
+    edge_ids = self._ids(self.edge_index, other.edge_index)
+    node_ids = self._ids(self.node_index, other.node_index)
+    self._reserve()
+    n_edges, n_nodes = other.n_edges, len(other.node_index)
+    np.add.at(self.trips, edge_ids, other.trips[:n_edges])
+    np.add.at(self.duration_sum, edge_ids, other.duration_sum[:n_edges])
+    np.add.at(self.fare_sum, edge_ids, other.fare_sum[:n_edges])
+    np.add.at(self.coord_count, node_ids, other.coord_count[:n_nodes])
+    np.add.at(self.lat_sum, node_ids, other.lat_sum[:n_nodes])
+    np.add.at(self.lon_sum, node_ids, other.lon_sum[:n_nodes])
+
+  def edge_attributes(self, key: EdgeKey) -> dict:
+    """Graph edge attributes of one edge, as set by ``build_city_graphs``.
+
+    Args:
+        key: (city_id, pickup cluster, dropoff cluster)
+
+    Returns:
+        Dictionary with avg_time, avg_price, total_trips and the hourly maps
+
+    """
+    e = self.edge_index[key]
+    return self._attributes(
+      self.trips[e].tolist(), self.duration_sum[e].tolist(), self.fare_sum[e].tolist()
+    )
+
+  @staticmethod
+  def _attributes(trips: list[int], duration_sum: list[float], fare_sum: list[float]) -> dict:
+    """Edge attributes from one edge's hourly counts and sums."""
+    hours = [hour for hour in range(HOURS_PER_DAY) if trips[hour]]
+    total_trips = sum(trips)
+    return {
+      "avg_time": sum(duration_sum) / total_trips,
+      "avg_price": sum(fare_sum) / total_trips,
+      "total_trips": total_trips,
+      "hourly_trips": {hour: trips[hour] for hour in hours},
+      "hourly_avg_time": {hour: duration_sum[hour] / trips[hour] for hour in hours},
+      "hourly_avg_price": {hour: fare_sum[hour] / trips[hour] for hour in hours},
+    }
+
+  def node_position(self, key: NodeKey) -> tuple[float, float]:
+    """Mean (lat, lon) of a node's pickups and dropoffs."""
+    n = self.node_index[key]
+    return self.lat_sum[n] / self.coord_count[n], self.lon_sum[n] / self.coord_count[n]
+
+  def to_graphs(self) -> dict[int, nx.DiGraph]:
+    """Finalize the sums into one directed graph per city.
+
+    Returns:
+        City graphs with the nodes and edge attributes of ``build_city_graphs``,
+        nodes and edges in sorted cluster order and cities in order of first
+        appearance
+
+    """
+    city_graphs = {city_id: nx.DiGraph() for city_id in self.cities}
+    for city_id, node_id in sorted(self.node_index):
+      lat, lon = self.node_position((city_id, node_id))
+      city_graphs[city_id].add_node(node_id, lat=lat, lon=lon)
+
+    n_edges = self.n_edges
+    trips = self.trips[:n_edges].tolist()
+    duration_sum = self.duration_sum[:n_edges].tolist()
+    fare_sum = self.fare_sum[:n_edges].tolist()
+    edges: dict[int, list] = {city_id: [] for city_id in self.cities}
+    for key in sorted(self.edge_index):
+      e = self.edge_index[key]
+      city_id, pickup_node, dropoff_node = key
+      edges[city_id].append(
+        (pickup_node, dropoff_node, self._attributes(trips[e], duration_sum[e], fare_sum[e]))
+      )
+    for city_id, city_edges in edges.items():
+      city_graphs[city_id].add_edges_from(city_edges)
+    return city_graphs
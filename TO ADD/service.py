@@ -1,6 +1,7 @@
 """Service layer for real-time operational data and inference."""
 
-from datetime import UTC, datetime
+import asyncio
+from datetime import UTC, datetime, timedelta
 from typing import Any
 
 from sqlalchemy import select
@@ -26,6 +27,27 @@ from app.models import (
 )
 from app.schemas.input import CompletedTripRequest
 from app.schemas.internal import Coordinate
+from app.update_feed import publish_update
+
+
+def get_optimizer():
+  """Get the default DP optimizer instance (lazy import, built on first use)."""
+  from app.dynamic_programming_optimizer import get_optimizer as get_registered_optimizer
+
+  return get_registered_optimizer()
+
+
+def apply_optimizer_update(method: str, kwargs: dict[str, Any]) -> None:
+  """Apply a live update to the optimizer, if it serves the city (blocking).
+
+  Args:
+      method: Optimizer method applying the update, see ``update_feed.UPDATE_METHODS``
+      kwargs: Keyword arguments of the method, including city_id
+
+  """
+  optimizer = get_optimizer()
+  if kwargs["city_id"] in optimizer.graphs:
+    getattr(optimizer, method)(**kwargs)
 
 
 class DataService:
@@ -365,6 +387,22 @@ class DataService:
       session.add(surge_record)
       await session.commit()
 
+    # Optimizer: reprice only the cached DP tables covering this hour, here and
+    # in the other workers. Runs off the event loop, since the first call loads
+    # the dataset; the reading is already stored, so a failure here does not
+    # fail the request
+    reading = {
+      "city_id": city_id,
+      "hexagon_id": hexagon_id,
+      "surge_multiplier": surge_multiplier,
+      "timestamp": timestamp,
+    }
+    try:
+      await asyncio.to_thread(apply_optimizer_update, "record_hexagon_surge", reading)
+      await publish_update(db_manager.redis, "record_hexagon_surge", reading)
+    except Exception as e:
+      print(f"Warning: Failed to update optimizer surge: {e}")
+
     return {
       "city_id": city_id,
       "hexagon_id": hexagon_id,
@@ -405,6 +443,25 @@ class DataService:
       session.add(trip_record)
       await session.commit()
 
+    # Optimizer: add the trip to the graph statistics of its pickup-dropoff edge,
+    # here and in the other workers. Runs off the event loop, since the first
+    # call reads the ride data; the trip is already stored, so a failure here
+    # does not fail the request
+    trip = {
+      "city_id": trip_request.city_id,
+      "pickup_hex": trip_request.pickup_hex,
+      "drop_hex": trip_request.drop_hex,
+      # Trips are timestamped on completion
+      "start_time": timestamp - timedelta(minutes=trip_request.duration_mins),
+      "duration_mins": trip_request.duration_mins,
+      "fare_amount": trip_request.earnings,
+    }
+    try:
+      await asyncio.to_thread(apply_optimizer_update, "record_completed_trip", trip)
+      await publish_update(db_manager.redis, "record_completed_trip", trip)
+    except Exception as e:
+      print(f"Warning: Failed to update optimizer graphs with trip: {e}")
+
     return {
       "driver_id": trip_request.driver_id,
       "trip_id": trip_request.trip_id,
@@ -737,6 +794,48 @@ class DataService:
       city_id=city_id,
     )
 
+  async def get_strategy(
+    self,
+    city_id: int,
+    start_cluster: str,
+    start_hour: int,
+    work_hours: int,
+    start_date: datetime,
+    budget_seconds: float,
+  ) -> dict[str, Any]:
+    """Get the best route for a shift within a latency budget.
+
+    Args:
+        city_id: City identifier.
+        start_cluster: Starting cluster ID.
+        start_hour: Starting hour (0-23).
+        work_hours: Number of hours to work.
+        start_date: Date of the shift.
+        budget_seconds: Latency budget of the solve.
+
+    Returns:
+        Expected earnings and route, with the time grid they were solved on.
+
+    """
+    # The first call loads the dataset
+    optimizer = await asyncio.to_thread(get_optimizer)
+    if city_id not in optimizer.graphs:
+      raise ValueError(f"City {city_id} not found.")
+
+    result = await optimizer.solve_dp_anytime(
+      city_id, start_cluster, start_hour, work_hours, start_date, budget_seconds=budget_seconds
+    )
+    return {
+      "city_id": city_id,
+      "start_cluster": start_cluster,
+      "start_hour": start_hour,
+      "work_hours": work_hours,
+      "expected_earnings": result.earnings,
+      "path": result.path,
+      "step_minutes": result.step_minutes,
+      "exact": result.exact,
+    }
+
   async def get_driver_selections(self, driver_id: str) -> dict[str, Any]:
     """Get driver's current selections.
 
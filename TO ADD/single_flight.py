@@ -0,0 +1,149 @@
+"""Request coalescing for expensive optimizer calls.
+
+When a shift change starts, many drivers ask for the same recommendation at
+once and every request misses the cache before the first one writes back.
+``SingleFlight`` makes concurrent coroutines with the same key await one
+shared computation inside a process. ``redis_single_flight`` extends that
+across uvicorn workers: one worker takes a short-lived Redis lock and
+computes, the others poll the cache until the value appears.
+"""
+
+import asyncio
+import math
+import uuid
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# Deletes the lock only if this worker still owns it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+  return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+  """Coalesce concurrent async calls that share a key into one computation."""
+
+  def __init__(self, name: str):
+    """Create an empty group.
+
+    Args:
+        name: Name reported in stats
+
+    """
+    self.name = name
+    self._inflight: dict[Hashable, asyncio.Task] = {}
+    self.leaders = 0
+    self.followers = 0
+
+  async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+    """Await the in-flight computation for key, starting it if there is none.
+
+    The computation runs as its own task, so a caller being cancelled does not
+    cancel it for the other callers waiting on the same key.
+
+    Args:
+        key: Coalescing key, typically the result cache key
+        factory: Zero-argument function returning the awaitable to run
+
+    Returns:
+        Result of the shared computation
+
+    """
+    task = self._inflight.get(key)
+    if task is None:
+      task = asyncio.ensure_future(factory())
+      self._inflight[key] = task
+      task.add_done_callback(lambda done: self._finish(key, done))
+      self.leaders += 1
+    else:
+      self.followers += 1
+    return await asyncio.shield(task)
+
+  def stats(self) -> dict[str, Any]:
+    """Report in-flight keys and how many calls were coalesced."""
+    calls = self.leaders + self.followers
+    return {
+      "name": self.name,
+      "in_flight": len(self._inflight),
+      "leaders": self.leaders,
+      "followers": self.followers,
+      "coalesced_rate": self.followers / calls if calls else 0.0,
+    }
+
+  def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+    """Forget a finished task so the next call for its key starts afresh."""
+    if self._inflight.get(key) is task:
+      del self._inflight[key]
+    if not task.cancelled():
+      # Mark the exception retrieved in case every waiter was cancelled
+      task.exception()
+
+
+async def redis_single_flight(
+  redis,
+  key: str,
+  read_cached: Callable[[], Awaitable[T | None]],
+  compute: Callable[[], Awaitable[T]],
+  lock_ttl_seconds: float = 30.0,
+  poll_interval_seconds: float = 0.05,
+  wait_timeout_seconds: float | None = None,
+) -> T:
+  """Compute a cached value in one worker while the others wait for it.
+
+  The worker that takes the lock re-checks the cache, then computes and must
+  write the value to the cache from ``compute``. Waiting workers poll the
+  cache and compute themselves if the value has not appeared once the lock
+  expires or ``wait_timeout_seconds`` passes, so a crashed holder only costs
+  a delay.
+
+  Args:
+      redis: Async Redis client
+      key: Cache key of the value; the lock is stored under "lock:{key}"
+      read_cached: Returns the cached value, or None if absent
+      compute: Computes the value and stores it in the cache
+      lock_ttl_seconds: Lock expiry, an upper bound on one computation
+      poll_interval_seconds: Delay between cache checks while waiting
+      wait_timeout_seconds: Longest wait before computing anyway,
+        lock_ttl_seconds if None
+
+  Returns:
+      The cached or computed value
+
+  """
+  loop = asyncio.get_running_loop()
+  lock_key = f"lock:{key}"
+  token = uuid.uuid4().hex
+  timeout = lock_ttl_seconds if wait_timeout_seconds is None else wait_timeout_seconds
+  give_up_at = loop.time() + timeout
+
+  while True:
+    try:
+      acquired = await redis.set(lock_key, token, nx=True, ex=max(1, math.ceil(lock_ttl_seconds)))
+    except Exception as e:
+      print(f"Redis lock error: {e}")
+      return await compute()
+
+    if acquired:
+      try:
+        # Another worker may have written the value between our miss and the lock
+        cached = await read_cached()
+        if cached is not None:
+          return cached
+        return await compute()
+      finally:
+        try:
+          await redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+          print(f"Redis lock release error: {e}")
+
+    await asyncio.sleep(poll_interval_seconds)
+    cached = await read_cached()
+    if cached is not None:
+      return cached
+    if loop.time() >= give_up_at:
+      return await compute()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Benchmark import and startup time of the optimizer, and which CSVs each path reads.
+
+Every measurement runs in a fresh interpreter:
+- import: importing the optimizer module, as the API and CLIs do
+- warm start: import plus loading the dataset from the graph cache
+- cold start: import plus building the dataset from the ride data
+- graph build from CSV / from store: building the city graphs from the raw
+  ride CSV, and from the columnar typed ride store (datasets)
+
+Importing and a warm start must not read any CSV; the benchmark exits with
+an error if they do.
+
+Usage examples:
+    python3 startup_bench.py
+    python3 startup_bench.py --repeats 5 --skip-cold
+    python3 startup_bench.py --rides-csv /data/rides_2023.csv
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from datasets import RIDES_CSV_PATH
+
+# Runs in the child interpreter; {load} is replaced by the statement to time
+PROBE = """
+import json, resource, time
+started = time.perf_counter()
+import app.dynamic_programming_optimizer as dpo
+from app.datasets import RIDES_CSV_PATH, ingest_rides, load_ride_store, loaded_datasets
+from app.graph_builder import GRAPH_COLUMNS, build_city_graphs
+import pandas as pd
+imported = time.perf_counter()
+{load}
+ready = time.perf_counter()
+print(json.dumps({{
+  "import_seconds": imported - started,
+  "load_seconds": ready - imported,
+  "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+  "datasets": loaded_datasets(),
+}}))
+"""
+
+SCENARIOS = {
+  "import": "",
+  "warm start": "dpo.get_dataset(use_cache=True)",
+  "cold start": "dpo.get_dataset(use_cache=False)",
+  "graph build from CSV": "build_city_graphs(pd.read_csv({csv!r}))",
+  "graph build from store": "build_city_graphs(load_ride_store(GRAPH_COLUMNS, {store!r}))",
+}
+
+
+def run_probe(load: str) -> dict:
+  """Run one measurement in a fresh interpreter.
+
+  Args:
+      load: Statement run after the import
+
+  Returns:
+      Dictionary with the import and load seconds, the peak resident memory
+      and the datasets read
+
+  """
+  env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+  output = subprocess.run(
+    [sys.executable, "-c", PROBE.format(load=load)],
+    env=env,
+    capture_output=True,
+    text=True,
+    check=True,
+  ).stdout
+  # The probe's JSON is the last line; loading messages come before it
+  return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark optimizer import and startup")
+  parser.add_argument(
+    "--repeats", type=int, default=3, help="Runs per scenario; the median counts (default: 3)"
+  )
+  parser.add_argument("--skip-cold", action="store_true", help="Skip the cold start from CSV")
+  parser.add_argument(
+    "--rides-csv", type=str, default=RIDES_CSV_PATH, help="Ride CSV for the graph build runs"
+  )
+  args = parser.parse_args()
+
+  # One warm start first, so that the graph cache exists
+  run_probe(SCENARIOS["warm start"])
+
+  rows = []
+  with tempfile.TemporaryDirectory() as tmp:
+    store = os.path.join(tmp, "rides")
+    run_probe(f"ingest_rides({args.rides_csv!r}, {store!r})")
+
+    for name, load in SCENARIOS.items():
+      if name == "cold start" and args.skip_cold:
+        continue
+      load = load.format(csv=args.rides_csv, store=store)
+      runs = [run_probe(load) for _ in range(args.repeats)]
+      rows.append(
+        {
+          "scenario": name,
+          "import_seconds": pd.Series([run["import_seconds"] for run in runs]).median(),
+          "load_seconds": pd.Series([run["load_seconds"] for run in runs]).median(),
+          "peak_rss_mb": pd.Series([run["peak_rss_mb"] for run in runs]).median(),
+          "datasets_read": ", ".join(sorted({d for run in runs for d in run["datasets"]}))
+          or "-",
+        }
+      )
+
+  results = pd.DataFrame(rows)
+  print(results.to_string(index=False, float_format="%.3f"))
+
+  warm = results[results["scenario"].isin(["import", "warm start"])]
+  if (warm["datasets_read"] != "-").any():
+    print("✗ Importing or a warm start read a CSV")
+    sys.exit(1)
+  print("✓ Importing and warm starts read no CSV")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,126 @@
+"""Shared fixtures: the ``app`` package and small synthetic cities.
+
+The modules import each other as ``app.<module>``, so the directory above
+this one is registered as the ``app`` package. Cities are built from random
+ride tables with ``build_city_graphs``; short edges in the busy morning hours
+give zero-bucket moves, which the solvers treat specially.
+"""
+
+import sys
+import tempfile
+import types
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+if "app" not in sys.modules:
+  app = types.ModuleType("app")
+  app.__path__ = [str(Path(__file__).resolve().parent.parent)]
+  sys.modules["app"] = app
+
+import app.dynamic_programming_optimizer as dpo  # noqa: E402
+from app.graph_builder import build_city_graphs, build_hex_index  # noqa: E402
+
+SHIFT_DATE = datetime(2023, 1, 16)
+
+
+def make_rides(
+  seed: int, city_ids=(1, 2), n_clusters: int = 6, n_rides: int = 6000
+) -> pd.DataFrame:
+  """Random rides between the clusters of some cities, one hexagon per cluster.
+
+  Args:
+      seed: Random seed
+      city_ids: Cities to spread the rides over
+      n_clusters: Clusters per city
+      n_rides: Number of rides
+
+  Returns:
+      Ride table with the columns of ``GRAPH_COLUMNS`` and ``HEX_COLUMNS``,
+      plus start_time
+
+  """
+  rng = np.random.default_rng(seed)
+  city = rng.choice(city_ids, n_rides)
+  pickup = rng.integers(0, n_clusters, n_rides)
+  dropoff = rng.integers(0, n_clusters, n_rides)
+  # A morning peak with waits under a minute, quiet hours around it
+  peak = rng.random(n_rides) < 0.7
+  hour = np.where(peak, rng.integers(7, 11, n_rides), rng.integers(0, 24, n_rides))
+  # Each cluster sits at one point, so hexagons map back to it exactly
+  lat = rng.uniform(12.0, 13.0, (max(city_ids) + 1, n_clusters))
+  lon = rng.uniform(77.0, 78.0, (max(city_ids) + 1, n_clusters))
+  edge_minutes = rng.uniform(0.1, 15.0, (max(city_ids) + 1, n_clusters, n_clusters))
+  return pd.DataFrame(
+    {
+      "city_id": city,
+      "pickup_cluster": [f"c{c}_{k}" for c, k in zip(city, pickup, strict=True)],
+      "dropoff_cluster": [f"c{c}_{k}" for c, k in zip(city, dropoff, strict=True)],
+      "pickup_hex_id9": [f"h{c}_{k}" for c, k in zip(city, pickup, strict=True)],
+      "drop_hex_id9": [f"h{c}_{k}" for c, k in zip(city, dropoff, strict=True)],
+      "pickup_lat": lat[city, pickup],
+      "pickup_lon": lon[city, pickup],
+      "drop_lat": lat[city, dropoff],
+      "drop_lon": lon[city, dropoff],
+      # Short edges round to zero buckets; whole-cent fares make ties likely
+      "duration_mins": edge_minutes[city, pickup, dropoff] * rng.uniform(0.8, 1.2, n_rides),
+      "fare_amount": rng.integers(200, 4000, n_rides) / 100.0,
+      "hour": hour,
+      "start_time": [SHIFT_DATE + timedelta(hours=int(h)) for h in hour],
+    }
+  )
+
+
+class SyntheticDataset(dpo.CityDataset):
+  """City dataset built from a ride table instead of the ride CSV and graph cache."""
+
+  def __init__(self, rides: pd.DataFrame, surge_lookup: dict[tuple[int, int], float] | None = None):
+    """Build the graphs of a ride table.
+
+    Args:
+        rides: Rides, as returned by ``make_rides``
+        surge_lookup: (city_id, hour) -> surge multiplier, 1.0 if None
+
+    """
+    self._rides = rides
+    self._surge = dict(surge_lookup or {})
+    super().__init__(use_cache=False)
+
+  def _get_cache_path(self) -> Path:
+    # Only consulted for its name: with caching off nothing is read or written
+    return Path(tempfile.gettempdir()) / "synthetic_city_graphs.pkl"
+
+  def _load_data(self):
+    self.graphs = build_city_graphs(self._rides)
+    self.surge_lookup = dict(self._surge)
+
+  def _load_hex_index(self):
+    return build_hex_index([self._rides])
+
+
+def fake_weather(city_id, date):
+  """Weather that changes with the city and date, without the forecast table."""
+  day = date.toordinal() if hasattr(date, "toordinal") else 0
+  return "Cloudy", 1.0 + 0.05 * ((city_id + day) % 4)
+
+
+def serve_synthetic_cities():
+  """Compute pool worker setup: serve the cities of the ``rides`` fixture."""
+  dpo.get_weather_for_date = fake_weather
+  for use_cache in (True, False):
+    dpo._datasets[use_cache] = SyntheticDataset(make_rides(seed=7))
+
+
+@pytest.fixture(autouse=True)
+def synthetic_weather(monkeypatch):
+  """Replace the forecast lookup of the optimizer."""
+  monkeypatch.setattr(dpo, "get_weather_for_date", fake_weather)
+
+
+@pytest.fixture
+def rides():
+  """Rides of two small cities."""
+  return make_rides(seed=7)
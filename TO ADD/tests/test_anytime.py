@@ -0,0 +1,96 @@
+"""Anytime solves under a latency budget."""
+
+import asyncio
+import time
+
+import pytest
+from conftest import SHIFT_DATE, SyntheticDataset
+
+import app.dynamic_programming_optimizer as dpo
+from app.dynamic_programming_optimizer import MobilityOptimizer
+
+
+class NoRedis:
+  """Database manager whose result cache is always empty."""
+
+  async def get_dp_result(self, key):
+    return None
+
+  async def set_dp_result(self, key, earnings, path, ttl_seconds=None):
+    pass
+
+
+@pytest.fixture
+def optimizer(rides, monkeypatch):
+  monkeypatch.setattr(dpo, "_db_manager", NoRedis())
+  return MobilityOptimizer(dataset=SyntheticDataset(rides))
+
+
+def slowed(monkeypatch, optimizer, method, seconds):
+  """Make an optimizer method sleep before it runs."""
+  run = getattr(optimizer, method)
+
+  def slow(*args, **kwargs):
+    time.sleep(seconds)
+    return run(*args, **kwargs)
+
+  monkeypatch.setattr(optimizer, method, slow)
+
+
+def solve_anytime(optimizer, budget_seconds):
+  """Run an anytime solve and its background work; return the result and its latency."""
+
+  async def run():
+    started = time.monotonic()
+    result = await optimizer.solve_dp_anytime(
+      1, "c1_0", 7, 3, SHIFT_DATE, budget_seconds=budget_seconds
+    )
+    elapsed = time.monotonic() - started
+    await asyncio.gather(*optimizer._background_solves, return_exceptions=True)
+    return result, elapsed
+
+  return asyncio.run(run())
+
+
+def test_budget_returns_coarse_result_then_exact(optimizer, monkeypatch):
+  expected = optimizer.solve_dp(1, "c1_0", 7, 3, SHIFT_DATE)
+  optimizer._dp_cache.clear()
+  slowed(monkeypatch, optimizer, "solve_dp", 1.0)
+
+  result, elapsed = solve_anytime(optimizer, 0.2)
+  assert elapsed < 0.8
+  assert not result.exact
+  assert (result.earnings, result.path) == optimizer._solve_on_grid(
+    1, "c1_0", 7, 3, SHIFT_DATE, result.step_minutes
+  )
+
+  # The full solve finished in the background
+  result, _ = solve_anytime(optimizer, 0.2)
+  assert result.exact
+  assert (result.earnings, result.path) == expected
+
+
+def test_first_level_is_capped_by_budget(optimizer, monkeypatch):
+  expected = optimizer.solve_dp(1, "c1_0", 7, 3, SHIFT_DATE)
+  optimizer._dp_cache.clear()
+  slowed(monkeypatch, optimizer, "_solve_on_grid", 2.0)
+  slowed(monkeypatch, optimizer, "solve_dp", 0.3)
+
+  # Neither solve meets the budget: the full one finishes first
+  result, elapsed = solve_anytime(optimizer, 0.01)
+  assert elapsed < 1.5
+  assert result.exact
+  assert (result.earnings, result.path) == expected
+
+
+def test_failed_coarse_level_falls_back_to_full_solve(optimizer, monkeypatch):
+  expected = optimizer.solve_dp(1, "c1_0", 7, 3, SHIFT_DATE)
+  optimizer._dp_cache.clear()
+
+  def fail(*args):
+    raise RuntimeError("coarse engine unavailable")
+
+  monkeypatch.setattr(optimizer, "_solve_on_grid", fail)
+  result, _ = solve_anytime(optimizer, 0.05)
+  assert result.exact
+  assert (result.earnings, result.path) == expected
@@ -0,0 +1,68 @@
+"""Array stores written, replaced and mapped back."""
+
+import json
+
+import numpy as np
+import pytest
+
+from app.array_store import MANIFEST_NAME, load_arrays, read_manifest, save_arrays
+
+
+def sample_arrays(offset: int = 0) -> dict[str, np.ndarray]:
+  return {
+    "values": np.arange(12, dtype=np.float64).reshape(3, 4) + offset,
+    "next_node": np.arange(6, dtype=np.int32)[::2] - offset,  # not contiguous
+    "empty": np.zeros((0, 3), dtype=np.int64),
+    "names": np.array(["c1_0", "c1_10"]),
+  }
+
+
+def assert_arrays_equal(loaded, expected):
+  assert loaded.keys() == expected.keys()
+  for name, array in expected.items():
+    assert loaded[name].dtype == array.dtype
+    np.testing.assert_array_equal(loaded[name], array)
+
+
+@pytest.mark.parametrize("mmap_mode", ["r", None])
+def test_round_trip(tmp_path, mmap_mode):
+  store = tmp_path / "store"
+  assert save_arrays(store, sample_arrays(), {"source": "rides.csv", "cities": [1, 2]}) == store
+
+  arrays, metadata = load_arrays(store, mmap_mode=mmap_mode)
+  assert_arrays_equal(arrays, sample_arrays())
+  assert metadata == {"source": "rides.csv", "cities": [1, 2]}
+  assert isinstance(arrays["values"], np.memmap) == (mmap_mode is not None)
+
+
+def test_missing_or_mismatched_store(tmp_path):
+  assert read_manifest(tmp_path / "store") is None
+  with pytest.raises(FileNotFoundError):
+    load_arrays(tmp_path / "store")
+
+  save_arrays(tmp_path / "store", sample_arrays())
+  manifest = read_manifest(tmp_path / "store")
+  manifest["arrays"]["values"]["shape"] = [4, 3]
+  (tmp_path / "store" / MANIFEST_NAME).write_text(json.dumps(manifest))
+  with pytest.raises(ValueError, match="values"):
+    load_arrays(tmp_path / "store")
+
+
+def test_replacing_keeps_mapped_versions_readable(tmp_path):
+  store = tmp_path / "store"
+  # A store directory from before versioning is replaced too
+  store.mkdir()
+  (store / "stale.npy").write_bytes(b"")
+
+  save_arrays(store, sample_arrays(0))
+  mapped, _ = load_arrays(store)
+  for offset in (1, 2, 3):
+    save_arrays(store, sample_arrays(offset))
+    assert_arrays_equal(load_arrays(store)[0], sample_arrays(offset))
+
+  # Arrays mapped before the swaps still read their own version
+  assert_arrays_equal(mapped, sample_arrays(0))
+  assert store.is_symlink()
+  # Only the current version and the one it replaced are kept
+  assert len(list((tmp_path / ".store.versions").iterdir())) == 2
+  assert sorted(path.name for path in tmp_path.iterdir()) == [".store.versions", "store"]
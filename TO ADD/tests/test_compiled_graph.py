@@ -0,0 +1,66 @@
+"""CSR city graphs against the NetworkX graphs they are compiled from."""
+
+import networkx as nx
+import numpy as np
+import pytest
+from conftest import SyntheticDataset
+
+from app.compiled_graph import HOURS_PER_DAY, CompiledCityGraph
+
+
+@pytest.fixture
+def graph(rides):
+  """A synthetic city graph with some edges and hourly statistics missing."""
+  graph = SyntheticDataset(rides).graphs[1].copy()
+  edges = list(graph.edges())
+  graph.remove_edges_from(edges[::5])
+  u, v = edges[1]
+  del graph.edges[u, v]["hourly_avg_time"][next(iter(graph.edges[u, v]["hourly_avg_time"]))]
+  return graph
+
+
+def test_compile_matches_graph(graph):
+  compiled = CompiledCityGraph.from_graph(graph)
+  nodes = list(graph.nodes())
+  assert compiled.nodes == nodes
+  assert compiled.n_edges == graph.number_of_edges()
+
+  for i, node in enumerate(nodes):
+    row = compiled.indices[compiled.edge_range(i)]
+    assert list(row) == sorted(nodes.index(succ) for succ in graph.successors(node))
+    for j, succ in enumerate(nodes):
+      e = compiled.edge_id(i, j)
+      if not graph.has_edge(node, succ):
+        assert e == -1
+        continue
+      data = graph.edges[node, succ]
+      for hour in range(HOURS_PER_DAY):
+        assert compiled.hourly_trips[e, hour] == data["hourly_trips"].get(hour, 0)
+        assert compiled.hourly_time[e, hour] == data["hourly_avg_time"].get(hour, data["avg_time"])
+        assert compiled.hourly_fare[e, hour] == data["hourly_avg_price"].get(
+          hour, data["avg_price"]
+        )
+    assert compiled.lat[i] == graph.nodes[node]["lat"]
+    assert compiled.lon[i] == graph.nodes[node]["lon"]
+
+  np.testing.assert_array_equal(
+    compiled.adjacency(), nx.to_numpy_array(graph, nodelist=nodes, weight=None) > 0
+  )
+  dense_trips = compiled.to_dense(compiled.hourly_trips)
+  np.testing.assert_allclose(compiled.out_demand, dense_trips.sum(axis=2))
+
+
+def test_arrays_round_trip(graph):
+  compiled = CompiledCityGraph.from_graph(graph)
+  rebuilt = CompiledCityGraph.from_arrays(list(compiled.nodes), compiled.to_arrays())
+  for name, array in compiled.to_arrays().items():
+    np.testing.assert_array_equal(getattr(rebuilt, name), array)
+  assert rebuilt.fingerprint() == compiled.fingerprint()
+
+  # Any statistic changes the fingerprint
+  changed = compiled.to_arrays()
+  changed["hourly_fare"] = changed["hourly_fare"].copy()
+  changed["hourly_fare"][0, 8] += 0.01
+  assert CompiledCityGraph.from_arrays(compiled.nodes, changed).fingerprint() != (
+    compiled.fingerprint()
+  )
@@ -0,0 +1,85 @@
+"""Optimizer calls run in pool workers."""
+
+import asyncio
+from pathlib import Path
+
+from conftest import SHIFT_DATE, SyntheticDataset, serve_synthetic_cities
+
+import app.dynamic_programming_optimizer as dpo
+from app import compute_pool
+from app.dynamic_programming_optimizer import MobilityOptimizer
+
+
+class InlinePool:
+  """Runs pool calls in this process, against one worker optimizer."""
+
+  running = True
+
+  def __init__(self):
+    self.calls = 0
+
+  async def run(
+    self, optimizer_kwargs, method, args=(), kwargs=None, surge=None, data_version=None
+  ):
+    self.calls += 1
+    return compute_pool._call_optimizer(
+      optimizer_kwargs, method, args, kwargs or {}, surge, data_version
+    )
+
+
+def test_cities_with_published_trips_are_solved_locally(rides, monkeypatch):
+  history, completed = rides.iloc[:-300], rides.iloc[-300:]
+  dataset = SyntheticDataset(history)
+  dataset.trip_publish_seconds = 0.0
+  optimizer = MobilityOptimizer(dataset=dataset)
+  worker = MobilityOptimizer(dataset=SyntheticDataset(history))
+  monkeypatch.setattr(dpo, "get_optimizer", lambda **params: worker)
+  pool = optimizer.compute_pool = InlinePool()
+  node = next(iter(dataset.graphs[1].nodes()))
+
+  def solve(city_id):
+    return asyncio.run(optimizer._run_blocking("solve_dp", city_id, node, 7, 3, SHIFT_DATE))
+
+  assert solve(1) == optimizer.solve_dp(1, node, 7, 3, SHIFT_DATE)
+  assert pool.calls == 1
+
+  for trip in completed[completed["city_id"] == 1].itertuples():
+    dataset.record_completed_trip(
+      1,
+      trip.pickup_hex_id9,
+      trip.drop_hex_id9,
+      trip.start_time.to_pydatetime(),
+      trip.duration_mins,
+      trip.fare_amount,
+    )
+  # The worker refuses the updated city, which is then solved on the new graph
+  expected = optimizer.solve_dp(1, node, 7, 3, SHIFT_DATE)
+  assert expected != worker.solve_dp(1, node, 7, 3, SHIFT_DATE)
+  assert solve(1) == expected
+  assert pool.calls == 2
+  assert solve(1) == expected
+  assert pool.calls == 2
+
+  # Cities without new trips stay in the pool
+  node = next(iter(dataset.graphs[2].nodes()))
+  assert solve(2) == optimizer.solve_dp(2, node, 7, 3, SHIFT_DATE)
+  assert pool.calls == 3
+
+
+def test_solve_runs_in_worker_process(rides, tmp_path, monkeypatch):
+  # Spawned workers start from this sys.path and import the modules as ``app``
+  (tmp_path / "app").symlink_to(Path(__file__).resolve().parent.parent)
+  monkeypatch.syspath_prepend(tmp_path)
+  optimizer = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  node = next(iter(optimizer.graphs[1].nodes()))
+
+  async def solve():
+    pool = await optimizer.start_compute_pool(max_workers=1, worker_setup=serve_synthetic_cities)
+    try:
+      return await optimizer._run_blocking("solve_dp", 1, node, 7, 3, SHIFT_DATE), pool.stats()
+    finally:
+      optimizer.stop_compute_pool()
+
+  result, stats = asyncio.run(solve())
+  assert stats["completed"] == 1
+  assert result == optimizer.solve_dp(1, node, 7, 3, SHIFT_DATE)
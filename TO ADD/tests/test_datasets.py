@@ -0,0 +1,124 @@
+"""Input tables loaded on first use, and the columnar ride store."""
+
+import json
+import pickle
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import SyntheticDataset
+
+import app.dynamic_programming_optimizer as dpo
+from app import datasets, graph_builder
+from app.datasets import (
+  get_rides,
+  ingest_rides,
+  iter_ride_store,
+  iter_rides,
+  load_ride_store,
+  loaded_datasets,
+  read_rides_csv,
+)
+from app.graph_builder import GRAPH_COLUMNS
+
+SAMPLE_CSV = Path(__file__).resolve().parent.parent / "Data" / "ride_trips_with_clusters.csv"
+
+
+@pytest.fixture
+def no_datasets(tmp_path, monkeypatch):
+  """An empty dataset registry, and the ride store in a temporary directory."""
+  monkeypatch.setattr(datasets, "_datasets", {})
+  monkeypatch.setattr(datasets, "RIDES_STORE_PATH", tmp_path / "rides")
+
+
+def assert_rides_equal(rides, expected):
+  """Same columns, dtypes and values; stored categories may differ in index dtype."""
+  assert list(rides.columns) == list(expected.columns)
+  for name, column in expected.items():
+    if isinstance(column.dtype, pd.CategoricalDtype):
+      assert rides[name].tolist() == column.tolist()
+    else:
+      assert rides[name].dtype == column.dtype
+      np.testing.assert_array_equal(rides[name].to_numpy(), column.to_numpy())
+
+
+def test_import_reads_no_data(tmp_path):
+  (tmp_path / "app").symlink_to(Path(__file__).resolve().parent.parent)
+  probe = (
+    "import json\n"
+    "import app.dynamic_programming_optimizer, app.graph_builder\n"
+    "from app.datasets import loaded_datasets\n"
+    "from app.weather_predictor import _weather_cache\n"
+    "print(json.dumps([loaded_datasets(), _weather_cache['df'] is None]))\n"
+  )
+  output = subprocess.run(
+    [sys.executable, "-c", probe], cwd=tmp_path, capture_output=True, text=True, check=True
+  ).stdout
+  assert json.loads(output.strip().splitlines()[-1]) == [[], True]
+
+
+def test_rides_load_once(no_datasets):
+  columns = list(GRAPH_COLUMNS)
+  rides = get_rides(str(SAMPLE_CSV), columns)
+  assert get_rides(str(SAMPLE_CSV), columns) is rides
+  assert list(rides.columns) == columns
+  assert loaded_datasets() == [f"rides[{','.join(columns)}]:{SAMPLE_CSV}"]
+
+
+def test_rides_module_attribute_loads_on_access(no_datasets, monkeypatch):
+  monkeypatch.setattr(graph_builder, "CSV_PATH", str(SAMPLE_CSV))
+  assert loaded_datasets() == []
+  assert len(graph_builder.rides) == 3000
+  assert loaded_datasets() == [f"rides:{SAMPLE_CSV}"]
+  with pytest.raises(AttributeError):
+    graph_builder.trips  # noqa: B018
+
+
+def test_warm_start_reads_no_csv(rides, no_datasets, tmp_path, monkeypatch):
+  cache_path = tmp_path / "city_graphs.pkl"
+  built = SyntheticDataset(rides, {(1, 8): 1.3})
+  with open(cache_path, "wb") as f:
+    pickle.dump({"graphs": built.graphs, "surge_lookup": built.surge_lookup}, f)
+  monkeypatch.setattr(dpo.CityDataset, "_get_cache_path", lambda self: cache_path)
+
+  dataset = dpo.CityDataset(use_cache=True)
+  assert sorted(dataset.graphs) == sorted(built.graphs)
+  assert dataset.surge_lookup == {(1, 8): 1.3}
+  assert loaded_datasets() == []
+
+
+def test_ride_store_round_trip(tmp_path):
+  ingest_rides(str(SAMPLE_CSV), tmp_path / "rides")
+  expected = read_rides_csv(str(SAMPLE_CSV))
+  stored = load_ride_store(store_path=tmp_path / "rides")
+  assert_rides_equal(stored, expected)
+  # Clusters share categories, so their codes compare
+  np.testing.assert_array_equal(
+    stored["pickup_cluster"].cat.categories, stored["dropoff_cluster"].cat.categories
+  )
+  assert stored["hour"].dtype == np.int8
+  assert not stored["fare_amount"].to_numpy().flags.writeable
+
+  columns = ["city_id", "pickup_cluster", "hour"]
+  assert_rides_equal(load_ride_store(columns, tmp_path / "rides"), expected[columns])
+  chunks = list(iter_ride_store(columns, chunk_rows=700, store_path=tmp_path / "rides"))
+  assert [len(chunk) for chunk in chunks] == [700] * 4 + [200]
+  assert_rides_equal(pd.concat(chunks, ignore_index=True), expected[columns])
+  with pytest.raises(ValueError, match="fare"):
+    load_ride_store(["fare"], tmp_path / "rides")
+
+
+def test_changed_csv_is_ingested_again(no_datasets, tmp_path):
+  csv_path = tmp_path / "rides.csv"
+  shutil.copy(SAMPLE_CSV, csv_path)
+  assert len(get_rides(str(csv_path), ["city_id", "hour"])) == 3000
+
+  pd.read_csv(SAMPLE_CSV).head(1000).to_csv(csv_path, index=False)
+  datasets.clear_datasets()
+  assert len(get_rides(str(csv_path), ["city_id", "hour"])) == 1000
+  chunks = list(iter_rides(str(csv_path), ["city_id"], chunk_rows=400))
+  assert [len(chunk) for chunk in chunks] == [400, 400, 200]
@@ -0,0 +1,216 @@
+"""Dense DP engine against a per-state reference solve."""
+
+import networkx as nx
+import numpy as np
+import pytest
+from conftest import SHIFT_DATE, SyntheticDataset
+
+from app import dp_kernels
+from app.compiled_graph import CompiledCityGraph
+from app.dp_engine import (
+  TIME_STEP_MINUTES,
+  CityDPEngine,
+  TimeGrid,
+  first_affected_bucket,
+  validate_step_schedule,
+)
+from app.dynamic_programming_optimizer import MobilityOptimizer
+
+GAMMA = 0.95
+LAMBDA_FLOOR = 0.5
+
+
+def reference_values(
+  graph: nx.DiGraph,
+  surge: np.ndarray,
+  hours: np.ndarray,
+  weather: np.ndarray,
+  grid: TimeGrid | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+  """Solve the DP one (bucket, cluster) state at a time, straight off the graph.
+
+  V_r(i) = max(0, max over j: fare_ij * weather_r + γ * V_{r - steps_ij}(j)),
+  with the engine's conventions: moves running past the end of the shift are
+  dropped, a zero-bucket move sees its destination's value for the same
+  bucket only if the destination comes earlier in node order, and the first
+  best destination wins ties. On a grid of mixed bucket lengths a move is
+  rounded to its row's bucket length and lands on the last row not after it.
+
+  Returns:
+      Tuple of (values, next_node), each of shape (n_steps + 1, n_nodes)
+
+  """
+  nodes = list(graph.nodes())
+  index = {node: k for k, node in enumerate(nodes)}
+  n_steps = len(hours) - 1
+  values = np.zeros((n_steps + 1, len(nodes)))
+  next_node = np.full((n_steps + 1, len(nodes)), -1)
+
+  def outgoing_trips(node, hour):
+    edges = graph.out_edges(node, data=True)
+    return sum(data.get("hourly_trips", {}).get(hour, 0) for _, _, data in edges)
+
+  for r in range(1, n_steps + 1):
+    hour = int(hours[r])
+    for i, node in enumerate(nodes):
+      best, best_j = -np.inf, -1
+      for j in sorted(index[succ] for succ in graph.successors(node)):
+        data = graph.edges[node, nodes[j]]
+        fare = data["hourly_avg_price"].get(hour, data["avg_price"]) * surge[hour] * weather[r]
+        travel = data["hourly_avg_time"].get(hour, data["avg_time"])
+        wait = 60.0 / max(outgoing_trips(nodes[j], hour), LAMBDA_FLOOR)
+        if grid is None:
+          steps = int(np.rint((travel + wait) / TIME_STEP_MINUTES))
+          landing = r - steps
+        else:
+          bucket = grid.minutes[r] - grid.minutes[r - 1]
+          steps = int(np.rint((travel + wait) / bucket))
+          left = grid.minutes[r] - steps * bucket
+          landing = max((k for k in range(r + 1) if grid.minutes[k] <= left), default=-1)
+        if landing < 0:
+          continue
+        if steps > 0:
+          future = values[landing, j]
+        else:
+          future = values[r, j] if j < i else 0.0
+        candidate = fare + GAMMA * future
+        if candidate > best:
+          best, best_j = candidate, j
+      if best > 0.0:
+        values[r, i], next_node[r, i] = best, best_j
+  return values, next_node
+
+
+@pytest.mark.parametrize("start_hour, work_hours", [(0, 2), (7, 3), (22, 4)])
+def test_engine_matches_reference(rides, start_hour, work_hours):
+  graph = SyntheticDataset(rides).graphs[1]
+  rng = np.random.default_rng(start_hour)
+  surge = rng.uniform(0.8, 2.0, 24)
+  grid = TimeGrid.for_shift(work_hours)
+  hours = grid.hours(start_hour)
+  weather = rng.uniform(0.9, 1.3, grid.n_steps + 1)
+
+  engine = CityDPEngine(
+    CompiledCityGraph.from_graph(graph), surge, GAMMA, LAMBDA_FLOOR, backend="numpy"
+  )
+  table = engine.solve(hours, weather)
+  values, next_node = reference_values(graph, surge, hours, weather)
+
+  assert (engine.steps == 0).any(), "no zero-bucket moves to exercise"
+  np.testing.assert_allclose(table.values, values, rtol=1e-12, atol=0.0)
+  np.testing.assert_array_equal(table.next_node, next_node)
+
+
+@pytest.mark.parametrize("schedule", [((0, 5), (60, 15)), ((0, 10), (45, 30)), 7])
+def test_mixed_resolution_grid_matches_reference(engine, rides, schedule):
+  grid = TimeGrid.for_shift(3, schedule)
+  hours = grid.hours(8)
+  weather = np.random.default_rng(6).uniform(0.9, 1.3, grid.n_steps + 1)
+
+  table = engine.solve(hours, weather, grid=grid)
+  graph = SyntheticDataset(rides).graphs[1]
+  values, next_node = reference_values(graph, engine.surge_by_hour, hours, weather, grid)
+  np.testing.assert_allclose(table.values, values, rtol=1e-12, atol=0.0)
+  np.testing.assert_array_equal(table.next_node, next_node)
+
+
+def test_time_grids():
+  grid = TimeGrid.for_shift(3, ((60, 15), (0, 5)))
+  assert grid.n_steps == 12 + 8
+  assert grid.minutes[-1] == 180
+  assert grid.step_minutes is None
+  # Buckets that do not divide the shift leave its tail out
+  grid = TimeGrid.for_shift(1, 7)
+  assert (grid.n_steps, grid.minutes[-1], grid.step_minutes) == (8, 56, 7)
+  np.testing.assert_array_equal(grid.hours(23), [0] + [23] * 8)
+  np.testing.assert_array_equal(TimeGrid.for_shift(2, 30).hours(23), [0, 0, 0, 23, 23])
+
+  for schedule in [((5, 15),), ((0, 15), (60, 0)), ()]:
+    with pytest.raises(ValueError):
+      validate_step_schedule(schedule)
+
+
+def test_solve_dp_matches_reference(rides):
+  dataset = SyntheticDataset(rides, {(2, 8): 1.4, (2, 9): 1.2})
+  optimizer = MobilityOptimizer(dataset=dataset)
+  graph = dataset.graphs[2]
+  grid = TimeGrid.for_shift(3)
+  hours, weather = optimizer._shift_conditions(2, 8, SHIFT_DATE, grid)
+  values, _ = reference_values(graph, dataset.surge_by_hour(2), hours, weather)
+
+  for k, node in enumerate(graph.nodes()):
+    earnings, path = optimizer.solve_dp(2, node, 8, 3, SHIFT_DATE)
+    assert earnings == pytest.approx(values[grid.n_steps, k], rel=1e-12)
+    assert path[0] == node
+
+
+@pytest.fixture
+def engine(rides):
+  """NumPy engine of a synthetic city, with surge."""
+  graph = SyntheticDataset(rides).graphs[1]
+  surge = np.random.default_rng(3).uniform(0.8, 2.0, 24)
+  return CityDPEngine(
+    CompiledCityGraph.from_graph(graph), surge, GAMMA, LAMBDA_FLOOR, backend="numpy"
+  )
+
+
+def assert_tables_equal(a, b):
+  for x, y in zip(a, b, strict=True):
+    np.testing.assert_array_equal(x, y)
+
+
+@pytest.mark.skipif(dp_kernels.fill_table is None, reason="numba is not installed")
+def test_numba_kernel_matches_numpy(engine):
+  compiled = engine.with_backend("numba")
+  grid = TimeGrid.for_shift(5)
+  hours = grid.hours(6)
+  weather = np.random.default_rng(4).uniform(0.9, 1.3, grid.n_steps + 1)
+
+  table = engine.solve(hours, weather)
+  assert_tables_equal(compiled.solve(hours, weather), table)
+  assert_tables_equal(
+    compiled.solve_gammas(hours, weather, [0.5, 0.9, 1.0]),
+    engine.solve_gammas(hours, weather, [0.5, 0.9, 1.0]),
+  )
+  deadlines = np.array([120, 150, 200])
+  assert_tables_equal(
+    compiled.solve_deadlines(deadlines, 60, 1.1), engine.solve_deadlines(deadlines, 60, 1.1)
+  )
+
+  # Refills from a surge change reuse the rows below it
+  repriced = engine.with_surge(np.where(np.arange(24) == 9, 2.5, engine.surge_by_hour))
+  from_bucket = first_affected_bucket(hours, {9})
+  assert_tables_equal(
+    repriced.with_backend("numba").solve(hours, weather, reuse=table, from_bucket=from_bucket),
+    repriced.solve(hours, weather, reuse=table, from_bucket=from_bucket),
+  )
+
+
+@pytest.mark.parametrize("schedule", [TIME_STEP_MINUTES, ((0, 5), (60, 15))])
+def test_labels_match_grid(engine, schedule):
+  grid = TimeGrid.for_shift(4, schedule)
+  hours = grid.hours(7)
+  weather = np.random.default_rng(5).uniform(0.9, 1.3, grid.n_steps + 1)
+  table = engine.solve(hours, weather, grid=grid)
+  n = grid.n_steps
+
+  for start in range(len(engine.nodes)):
+    labels, n_labels = engine.solve_reachable(start, hours, weather, grid=grid)
+    assert 0 < n_labels <= (n + 1) * len(engine.nodes)
+    assert labels.values[n, start] == table.values[n, start]
+    assert engine.extract_path(labels, start, n, 16) == engine.extract_path(table, start, n, 16)
+    # Every cell the labels filled matches the full table
+    filled = labels.next_node >= 0
+    np.testing.assert_array_equal(labels.values[filled], table.values[filled])
+    np.testing.assert_array_equal(labels.next_node[filled], table.next_node[filled])
+
+
+def test_solve_dp_solvers_agree(rides):
+  dataset = SyntheticDataset(rides)
+  grid_solver = MobilityOptimizer(dataset=dataset)
+  label_solver = MobilityOptimizer(dataset=dataset)
+  for city_id, graph in dataset.graphs.items():
+    for node in graph.nodes():
+      assert label_solver.solve_dp(city_id, node, 9, 2, SHIFT_DATE, solver="labels") == (
+        grid_solver.solve_dp(city_id, node, 9, 2, SHIFT_DATE)
+      )
@@ -0,0 +1,327 @@
+"""MobilityOptimizer updates and batch solves against fresh solves."""
+
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from conftest import SHIFT_DATE, SyntheticDataset
+
+import app.dynamic_programming_optimizer as dpo
+from app.compiled_graph import CompiledCityGraph
+from app.dynamic_programming_optimizer import DPQuery, MobilityOptimizer
+
+SHIFTS = [(5, 6), (7, 3), (8, 2), (20, 4)]
+SURGE = {8: 1.7, 9: 0.9}
+
+
+def assert_tables_equal(a, b):
+  for x, y in zip(a, b, strict=True):
+    np.testing.assert_array_equal(x, y)
+
+
+def solve_all(optimizer, city_id):
+  return {
+    (node, start_hour, work_hours): optimizer.solve_dp(
+      city_id, node, start_hour, work_hours, SHIFT_DATE
+    )
+    for node in optimizer.graphs[city_id].nodes()
+    for start_hour, work_hours in SHIFTS
+  }
+
+
+@pytest.mark.parametrize("top_k", [3, 6])
+def test_best_starting_positions_match_solve_dp(rides, top_k):
+  dataset = SyntheticDataset(rides, {(1, 8): 1.3})
+  optimizer = MobilityOptimizer(dataset=dataset)
+  single = MobilityOptimizer(dataset=dataset)
+  for start_hour, work_hours in SHIFTS:
+    best = optimizer.analyze_best_starting_positions(1, start_hour, work_hours, SHIFT_DATE, top_k)
+
+    # Per-start solves, ranked as before the shared table
+    expected = [
+      (node, *single.solve_dp(1, node, start_hour, work_hours, SHIFT_DATE))
+      for node in dataset.graphs[1].nodes()
+    ]
+    expected.sort(key=lambda result: result[1], reverse=True)
+    assert best == expected[:top_k]
+    # The ranked starts were cached for solve_dp
+    hits = optimizer._dp_cache.hits
+    for node, earnings, path in best:
+      assert optimizer.solve_dp(1, node, start_hour, work_hours, SHIFT_DATE) == (earnings, path)
+    assert optimizer._dp_cache.hits == hits + top_k
+
+
+def test_day_tables_match_solve_dp(rides):
+  dataset = SyntheticDataset(rides, {(1, 8): 1.3, (1, 23): 1.5})
+  optimizer = MobilityOptimizer(dataset=dataset)
+  single = MobilityOptimizer(dataset=dataset)
+  # Shifts running past midnight, and a whole day
+  schedules = [*SHIFTS, (22, 6), (13, 12), (0, 24)]
+
+  for node in dataset.graphs[1].nodes():
+    expected = [single.solve_dp(1, node, *schedule, SHIFT_DATE) for schedule in schedules]
+    assert optimizer.solve_schedules(1, node, schedules, SHIFT_DATE) == expected
+  for schedule in schedules:
+    table, n_steps = optimizer.solve_day(1, SHIFT_DATE, schedules).shift_table(*schedule)
+    expected, expected_steps = single._solve_table(1, *schedule, SHIFT_DATE)
+    assert n_steps == expected_steps
+    assert_tables_equal(table, expected)
+
+  # A shift the cached table does not cover re-solves it for both
+  day = optimizer.solve_day(1, SHIFT_DATE, [(3, 5)])
+  assert day.covers({(3, 5), *schedules})
+  assert optimizer.solve_day(1, SHIFT_DATE, schedules) is day
+
+
+def test_days_with_equal_conditions_share_cached_results(rides, monkeypatch):
+  # Forecast per table day, which times after midnight take from the next day:
+  # shifts on days 0 and 2 see the same weather, shifts on day 1 do not
+  multipliers = [1.0, 1.1, 1.0, 1.1, 1.2]
+
+  def weather(city_id, date):
+    day = (date.date() - SHIFT_DATE.date()).days + (date.time() != SHIFT_DATE.time())
+    return "Cloudy", multipliers[min(day, 4)]
+
+  monkeypatch.setattr(dpo, "get_weather_for_date", weather)
+  optimizer = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  fresh = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  day_0, day_2 = SHIFT_DATE, SHIFT_DATE + timedelta(days=2)
+
+  def key(start_hour, work_hours, date, solver=optimizer):
+    return solver._get_scenario_key(1, start_hour, work_hours, date)
+
+  assert key(7, 3, day_0) == key(7, 3, day_2)
+  assert key(7, 3, day_0) != key(7, 3, SHIFT_DATE + timedelta(days=1))
+  assert key(7, 3, day_0) != key(7, 3, day_0, MobilityOptimizer(gamma=0.9, dataset=fresh.dataset))
+
+  node = next(iter(optimizer.graphs[1].nodes()))
+  optimizer.solve_dp(1, node, 7, 3, day_0)
+  hits = optimizer._dp_cache.hits
+  assert optimizer.solve_dp(1, node, 7, 3, day_2) == fresh.solve_dp(1, node, 7, 3, day_2)
+  assert optimizer._dp_cache.hits == hits + 1
+
+
+def test_surge_update_matches_fresh_solve(rides):
+  dataset = SyntheticDataset(rides)
+  optimizer = MobilityOptimizer(dataset=dataset)
+  before = solve_all(optimizer, 1)
+  day = optimizer.solve_day(1, SHIFT_DATE, SHIFTS)
+
+  assert dataset.update_surge(1, SURGE) == set(SURGE)
+  fresh = MobilityOptimizer(
+    dataset=SyntheticDataset(rides, {(1, hour): value for hour, value in SURGE.items()})
+  )
+
+  # Cached tables are refilled from their first repriced row
+  for start_hour, work_hours in SHIFTS:
+    table, n_steps = optimizer._solve_table(1, start_hour, work_hours, SHIFT_DATE)
+    expected, _ = fresh._solve_table(1, start_hour, work_hours, SHIFT_DATE)
+    assert_tables_equal(table, expected)
+  after = solve_all(optimizer, 1)
+  assert after == solve_all(fresh, 1)
+  assert after != before
+  assert solve_all(optimizer, 2) == solve_all(fresh, 2)
+
+  fresh_day = fresh.solve_day(1, SHIFT_DATE, SHIFTS)
+  assert optimizer.solve_day(1, SHIFT_DATE, SHIFTS) is day
+  for start_hour, work_hours in SHIFTS:
+    assert_tables_equal(
+      day.shift_table(start_hour, work_hours)[0], fresh_day.shift_table(start_hour, work_hours)[0]
+    )
+
+
+def test_expired_live_surge_restores_fresh_solve(rides):
+  dataset = SyntheticDataset(rides, {(1, 8): 1.2})
+  dataset.live_surge_ttl_seconds = 60.0
+  optimizer = MobilityOptimizer(dataset=dataset)
+  fresh = MobilityOptimizer(dataset=SyntheticDataset(rides, {(1, 8): 1.2}))
+  before = solve_all(optimizer, 1)
+
+  reading_time = SHIFT_DATE.replace(hour=8)
+  dataset.record_hexagon_surge(1, "h1_0", 2.0, reading_time)
+  dataset.record_hexagon_surge(1, "h1_1", 1.0, reading_time)
+  for timer in dataset._timers.values():
+    timer.cancel()
+  assert dataset.get_surge_multiplier(1, 8) == pytest.approx(1.5)
+  assert solve_all(optimizer, 1) != before
+
+  # Age the readings past their time to live instead of waiting on the timer
+  for readings in dataset._live_surge.values():
+    for hexagon_id, (multiplier, received_at) in readings.items():
+      readings[hexagon_id] = (multiplier, received_at - 120.0)
+  assert dataset.expire_live_surge(1) == {8}
+  assert dataset.get_surge_multiplier(1, 8) == 1.2
+  # Results cached before the readings are served again
+  hits = optimizer._dp_cache.hits
+  assert solve_all(optimizer, 1) == solve_all(fresh, 1) == before
+  assert optimizer._dp_cache.hits == hits + len(before)
+
+
+def test_scenario_keys_depend_on_surge_values_only(rides):
+  first = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  second = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  first.dataset.update_surge(1, {8: 1.5})
+  first.dataset.update_surge(1, {8: 1.7, 9: 0.9})
+  second.dataset.update_surge(1, SURGE)
+  for start_hour, work_hours in SHIFTS:
+    assert first._get_scenario_key(1, start_hour, work_hours, SHIFT_DATE) == (
+      second._get_scenario_key(1, start_hour, work_hours, SHIFT_DATE)
+    )
+
+
+def test_results_solved_across_an_update_are_not_cached(rides, monkeypatch):
+  dataset = SyntheticDataset(rides)
+  optimizer = MobilityOptimizer(dataset=dataset)
+  node = next(iter(dataset.graphs[1].nodes()))
+  solve_table = optimizer._solve_table
+
+  # The surge changes after the solve computed its key but before it reads prices
+  def solve_table_during_update(*args):
+    monkeypatch.setattr(optimizer, "_solve_table", solve_table)
+    dataset.update_surge(1, SURGE)
+    return solve_table(*args)
+
+  monkeypatch.setattr(optimizer, "_solve_table", solve_table_during_update)
+  optimizer.solve_dp(1, node, 7, 3, SHIFT_DATE)
+  dataset.update_surge(1, {hour: 1.0 for hour in SURGE})
+  fresh = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  assert optimizer.solve_dp(1, node, 7, 3, SHIFT_DATE) == fresh.solve_dp(1, node, 7, 3, SHIFT_DATE)
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_solve_many_matches_solve_dp(rides, max_workers):
+  dataset = SyntheticDataset(rides, {(2, 9): 1.3})
+  rng = np.random.default_rng(max_workers)
+  queries = []
+  for _ in range(60):
+    city_id = int(rng.choice([1, 2]))
+    nodes = list(dataset.graphs[city_id].nodes())
+    queries.append(
+      DPQuery(
+        city_id,
+        nodes[rng.integers(len(nodes))],
+        int(rng.choice([0, 7, 8, 23])),
+        int(rng.choice([1, 3])),
+        SHIFT_DATE + timedelta(days=int(rng.integers(2))),
+      )
+    )
+  # Plain tuples are accepted too
+  queries[0] = tuple(queries[0])
+
+  batch = MobilityOptimizer(dataset=dataset)
+  single = MobilityOptimizer(dataset=dataset)
+  expected = [single.solve_dp(*query) for query in queries]
+  assert batch.solve_many(queries, max_workers=max_workers) == expected
+  # Second time round every result comes from the cache
+  assert batch.solve_many(queries, max_workers=max_workers) == expected
+
+
+def test_solve_many_rejects_unknown_cluster(rides):
+  optimizer = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  with pytest.raises(ValueError, match="Cluster"):
+    optimizer.solve_many([(1, "c2_0", 7, 2, SHIFT_DATE)])
+
+
+def test_completed_trips_match_full_rebuild(rides):
+  history, completed = rides.iloc[:-300], rides.iloc[-300:]
+  dataset = SyntheticDataset(history)
+  dataset.trip_publish_seconds = 0.0
+  optimizer = MobilityOptimizer(dataset=dataset)
+  before = solve_all(optimizer, 1)
+
+  for trip in completed.itertuples():
+    key = dataset.record_completed_trip(
+      trip.city_id,
+      trip.pickup_hex_id9,
+      trip.drop_hex_id9,
+      trip.start_time.to_pydatetime(),
+      trip.duration_mins,
+      trip.fare_amount,
+    )
+    assert key == (trip.city_id, trip.pickup_cluster, trip.dropoff_cluster)
+  assert dataset.record_completed_trip(1, "unknown", "h1_0", SHIFT_DATE, 5.0, 10.0) is None
+
+  rebuilt = SyntheticDataset(rides)
+  for city_id, expected in rebuilt.graphs.items():
+    graph = dataset.graphs[city_id]
+    assert set(graph.edges()) == set(expected.edges())
+    for node, data in expected.nodes(data=True):
+      assert graph.nodes[node] == pytest.approx(data)
+    for u, v, data in expected.edges(data=True):
+      for name, value in data.items():
+        assert graph.edges[u, v][name] == pytest.approx(value)
+
+    # Rows patched in place equal a full compile of the updated graph
+    compiled = dataset.compiled[city_id]
+    recompiled = CompiledCityGraph.from_graph(graph)
+    for name, array in recompiled.to_arrays().items():
+      np.testing.assert_array_equal(compiled.to_arrays()[name], array)
+
+  after = solve_all(optimizer, 1)
+  assert after != before
+  expected = solve_all(MobilityOptimizer(dataset=rebuilt), 1)
+  for key, (earnings, _) in after.items():
+    assert earnings == pytest.approx(expected[key][0], rel=1e-9)
+
+
+def test_completed_trips_wait_for_publish_window(rides):
+  dataset = SyntheticDataset(rides)
+  dataset.trip_publish_seconds = 3600.0
+  dataset.publish_trip_updates(1)
+  version = dataset.city_version(1)
+  trip = rides[rides["city_id"] == 1].iloc[0]
+
+  for _ in range(3):
+    dataset.record_completed_trip(1, trip.pickup_hex_id9, trip.drop_hex_id9, SHIFT_DATE, 4.0, 12.5)
+  for timer in dataset._timers.values():
+    timer.cancel()
+  assert dataset.is_current(1, version)
+
+  # The deferred flush publishes the edge once for all three trips
+  assert dataset.publish_trip_updates(1) == 1
+  assert not dataset.is_current(1, version)
+
+
+def test_sweep_matches_single_optimizers(rides):
+  dataset = SyntheticDataset(rides, {(1, 7): 1.2})
+  optimizer = MobilityOptimizer(dataset=dataset)
+  grid = {"gammas": [0.8, 1.0], "lambda_floors": [0.5, 2.0], "epsilons": [0.1, 1.0]}
+  results = optimizer.sweep(1, 7, 3, SHIFT_DATE, **grid)
+  assert len(results) == 8 * len(dataset.graphs[1])
+
+  for (gamma, lambda_floor, epsilon), rows in results.groupby(
+    ["gamma", "lambda_floor", "epsilon"]
+  ):
+    single = MobilityOptimizer(
+      gamma=gamma, lambda_floor=lambda_floor, epsilon=epsilon, dataset=dataset
+    )
+    for row in rows.itertuples():
+      earnings, _ = single.solve_dp(1, row.start_cluster, 7, 3, SHIFT_DATE)
+      assert row.expected_earnings == pytest.approx(earnings, rel=1e-12)
+      assert row.hourly_rate == pytest.approx(earnings / 3, rel=1e-12)
+      rate = single.compute_earning_rate(dataset.graphs[1], row.start_cluster, 7, 1, SHIFT_DATE)
+      assert row.earning_rate == pytest.approx(rate, rel=1e-12)
+
+
+def test_resolutions_match_optimizers_solving_at_them(rides):
+  dataset = SyntheticDataset(rides, {(1, 8): 1.3})
+  schedule = ((0, 5), (60, 15))
+  report = MobilityOptimizer(dataset=dataset).compare_resolutions(
+    1, 7, 3, SHIFT_DATE, [5, schedule, 15, 30]
+  )
+  assert report["buckets"].tolist() == [36, 20, 12, 6]
+  assert report.loc[0, ["mean_abs_error", "max_abs_error", "max_rel_error"]].tolist() == [0, 0, 0]
+
+  for row in report.itertuples():
+    optimizer = MobilityOptimizer(step_minutes=row.resolution, dataset=dataset)
+    earnings, path = optimizer.solve_dp(1, row.best_cluster, 7, 3, SHIFT_DATE)
+    assert earnings == pytest.approx(row.best_earnings, rel=1e-12)
+    assert path[0] == row.best_cluster
+  # A one-breakpoint schedule is the uniform grid
+  nodes = list(dataset.graphs[1].nodes())
+  uniform = MobilityOptimizer(step_minutes=((0, 15),), dataset=dataset)
+  default = MobilityOptimizer(step_minutes=15, dataset=dataset)
+  for node in nodes:
+    assert uniform.solve_dp(1, node, 7, 3, SHIFT_DATE) == default.solve_dp(
+      1, node, 7, 3, SHIFT_DATE
+    )
@@ -0,0 +1,117 @@
+"""Vectorized and streaming graph builds against the original per-city, per-edge loops."""
+
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.datasets import iter_rides, read_rides_csv
+from app.graph_builder import GRAPH_COLUMNS, build_city_graphs, build_city_graphs_streaming
+from app.ride_accumulator import RideAccumulator
+
+SAMPLE_CSV = Path(__file__).resolve().parent.parent / "Data" / "ride_trips_with_clusters.csv"
+
+
+def original_city_graphs(rides: pd.DataFrame) -> dict[int, nx.DiGraph]:
+  """The build as it was before vectorizing: filters per city, node and edge."""
+  city_graphs = {}
+  for city_id in rides["city_id"].unique():
+    city_df = rides[rides["city_id"] == city_id].copy()
+    g = nx.DiGraph()
+    for node_id in set(city_df["pickup_cluster"]).union(set(city_df["dropoff_cluster"])):
+      pickups = city_df[city_df["pickup_cluster"] == node_id]
+      dropoffs = city_df[city_df["dropoff_cluster"] == node_id]
+      lats = pickups["pickup_lat"].tolist() + dropoffs["drop_lat"].tolist()
+      lons = pickups["pickup_lon"].tolist() + dropoffs["drop_lon"].tolist()
+      g.add_node(node_id, lat=np.mean(lats), lon=np.mean(lons))
+
+    city_df["hour"] = pd.to_datetime(city_df["start_time"]).dt.hour
+    agg = {"ride_id": "count", "duration_mins": "mean", "fare_amount": "mean"}
+    edge_stats = city_df.groupby(["pickup_cluster", "dropoff_cluster"]).agg(agg).reset_index()
+    hourly_stats = (
+      city_df.groupby(["pickup_cluster", "dropoff_cluster", "hour"]).agg(agg).reset_index()
+    )
+    for _, row in edge_stats.iterrows():
+      edge_hourly = hourly_stats[
+        (hourly_stats["pickup_cluster"] == row["pickup_cluster"])
+        & (hourly_stats["dropoff_cluster"] == row["dropoff_cluster"])
+      ]
+      hours = [int(hour) for hour in edge_hourly["hour"]]
+      g.add_edge(
+        row["pickup_cluster"],
+        row["dropoff_cluster"],
+        avg_time=float(row["duration_mins"]),
+        avg_price=float(row["fare_amount"]),
+        total_trips=int(row["ride_id"]),
+        hourly_trips=dict(zip(hours, map(int, edge_hourly["ride_id"]), strict=True)),
+        hourly_avg_time=dict(zip(hours, map(float, edge_hourly["duration_mins"]), strict=True)),
+        hourly_avg_price=dict(zip(hours, map(float, edge_hourly["fare_amount"]), strict=True)),
+      )
+    city_graphs[int(city_id)] = g
+  return city_graphs
+
+
+def assert_graphs_equal(graphs, expected):
+  assert list(graphs) == list(expected)
+  for city_id, graph in graphs.items():
+    assert list(graph.nodes()) == sorted(expected[city_id].nodes())
+    for node, data in expected[city_id].nodes(data=True):
+      assert graph.nodes[node]["lat"] == pytest.approx(data["lat"], rel=1e-12)
+      assert graph.nodes[node]["lon"] == pytest.approx(data["lon"], rel=1e-12)
+    assert set(graph.edges()) == set(expected[city_id].edges())
+    for u, v, data in expected[city_id].edges(data=True):
+      built = graph.edges[u, v]
+      assert built == data
+      for name in ("hourly_trips", "hourly_avg_time", "hourly_avg_price"):
+        assert list(built[name]) == list(data[name])
+
+
+def test_sample_rides_match_original_build():
+  raw = pd.read_csv(SAMPLE_CSV)
+  expected = original_city_graphs(raw)
+  assert_graphs_equal(build_city_graphs(raw), expected)
+  # Typed tables: categorical clusters and a precomputed hour
+  assert_graphs_equal(build_city_graphs(read_rides_csv(str(SAMPLE_CSV))), expected)
+
+
+def test_synthetic_rides_match_original_build(rides):
+  rides = rides.assign(ride_id=np.arange(len(rides))).drop(columns="hour")
+  assert_graphs_equal(build_city_graphs(rides), original_city_graphs(rides))
+
+
+def assert_graphs_close(graphs, expected):
+  """Same structure and counts as ``assert_graphs_equal``, averages up to rounding."""
+  assert sorted(graphs) == sorted(expected)
+  for city_id, graph in graphs.items():
+    assert list(graph.nodes()) == list(expected[city_id].nodes())
+    for node, data in expected[city_id].nodes(data=True):
+      assert graph.nodes[node]["lat"] == pytest.approx(data["lat"], rel=1e-12)
+      assert graph.nodes[node]["lon"] == pytest.approx(data["lon"], rel=1e-12)
+    assert list(graph.edges()) == list(expected[city_id].edges())
+    for u, v, data in expected[city_id].edges(data=True):
+      built = graph.edges[u, v]
+      assert built["total_trips"] == data["total_trips"]
+      assert built["hourly_trips"] == data["hourly_trips"]
+      for name in ("avg_time", "avg_price"):
+        assert built[name] == pytest.approx(data[name], rel=1e-12)
+      for name in ("hourly_avg_time", "hourly_avg_price"):
+        assert list(built[name]) == list(data[name])
+        assert list(built[name].values()) == pytest.approx(list(data[name].values()), rel=1e-12)
+
+
+@pytest.mark.parametrize("chunk_rows", [7, 1000, 5000])
+def test_streaming_build_matches_in_memory_build(chunk_rows):
+  rides = pd.read_csv(SAMPLE_CSV, nrows=500 if chunk_rows < 100 else None)
+  chunks = (rides[start : start + chunk_rows] for start in range(0, len(rides), chunk_rows))
+  assert_graphs_close(build_city_graphs_streaming(chunks), build_city_graphs(rides))
+
+
+def test_merged_accumulators_match_in_memory_build():
+  merged = RideAccumulator()
+  for chunk in iter_rides(str(SAMPLE_CSV), list(GRAPH_COLUMNS), chunk_rows=700):
+    accumulator = RideAccumulator()
+    accumulator.add_rides(chunk)
+    merged.merge(accumulator)
+  assert_graphs_close(merged.to_graphs(), build_city_graphs(pd.read_csv(SAMPLE_CSV)))
@@ -0,0 +1,44 @@
+"""Optimizers keyed by parameter set, sharing one dataset."""
+
+import pytest
+from conftest import SHIFT_DATE, SyntheticDataset
+
+from app.dynamic_programming_optimizer import MobilityOptimizer, OptimizerRegistry
+
+
+def test_equal_parameters_share_an_instance(rides):
+  dataset = SyntheticDataset(rides)
+  registry = OptimizerRegistry(dataset)
+
+  default = registry.get(use_cache=False)
+  assert registry.get(use_cache=False, gamma=0.95, epsilon=0.1) is default
+  weighted = registry.get(use_cache=False, weather_multipliers={"Rain": 1.2, "Snow": 1.3})
+  assert registry.get(use_cache=False, weather_multipliers={"Snow": 1.3, "Rain": 1.2}) is weighted
+  discounted = registry.get(use_cache=False, gamma=0.9)
+  assert discounted is not default
+  assert len(registry) == 3
+  assert registry.optimizers() == [default, weighted, discounted]
+  assert all(optimizer.dataset is dataset for optimizer in registry.optimizers())
+
+  with pytest.raises(ValueError, match="use_cache"):
+    registry.get(use_cache=True)
+
+
+def test_registered_optimizers_follow_dataset_updates(rides):
+  dataset = SyntheticDataset(rides)
+  registry = OptimizerRegistry(dataset)
+  optimizers = [registry.get(use_cache=False, gamma=gamma) for gamma in (0.8, 0.95)]
+  node = next(iter(dataset.graphs[1].nodes()))
+  for optimizer in optimizers:
+    optimizer.solve_dp(1, node, 7, 3, SHIFT_DATE)
+
+  dataset.update_surge(1, {8: 1.6})
+  updated = SyntheticDataset(rides, {(1, 8): 1.6})
+  results = [optimizer.solve_dp(1, node, 7, 3, SHIFT_DATE) for optimizer in optimizers]
+  assert results == [
+    MobilityOptimizer(use_cache=False, gamma=gamma, dataset=updated).solve_dp(
+      1, node, 7, 3, SHIFT_DATE
+    )
+    for gamma in (0.8, 0.95)
+  ]
+  assert results[0] != results[1]
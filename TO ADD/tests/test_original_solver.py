@@ -0,0 +1,114 @@
+"""The array-based optimizer against the original dict-based recursion."""
+
+from datetime import datetime, timedelta
+
+import networkx as nx
+import pytest
+from conftest import SHIFT_DATE, SyntheticDataset
+
+import app.dynamic_programming_optimizer as dpo
+from app.dynamic_programming_optimizer import MobilityOptimizer
+
+# Shifts in the quiet hours, across the morning peak and past midnight
+SHIFTS = [(5, 6), (7, 3), (21, 5)]
+
+
+def original_solve_dp(
+  optimizer: MobilityOptimizer,
+  graph: nx.DiGraph,
+  city_id: int,
+  start_cluster: str,
+  start_hour: int,
+  work_hours: int,
+  start_date: datetime,
+) -> tuple[float, list[str]]:
+  """``solve_dp`` as it was before the DP engine: dicts over 5-minute intervals.
+
+  Kept to the original's loops and arithmetic, without its cache and
+  argument checks.
+
+  """
+  nodes = list(graph.nodes())
+  total_work_minutes = work_hours * 60
+  V = {0: dict.fromkeys(nodes, 0.0)}
+  strategy = {}
+
+  for time_remaining in range(5, total_work_minutes + 5, 5):
+    V[time_remaining] = {}
+    strategy[time_remaining] = {}
+    for i in nodes:
+      best_value, best_next_cluster, best_transition_time = 0.0, None, 0
+      for j in nodes:
+        if not graph.has_edge(i, j):
+          continue
+        minutes_elapsed = total_work_minutes - time_remaining
+        current_hour = (start_hour + minutes_elapsed // 60) % 24
+        current_date = start_date + timedelta(minutes=minutes_elapsed)
+
+        edge_data = graph[i][j]
+        base_fare = edge_data["hourly_avg_price"].get(current_hour, edge_data["avg_price"])
+        travel_time = edge_data["hourly_avg_time"].get(current_hour, edge_data["avg_time"])
+        surge_mult = optimizer.get_surge_multiplier(city_id, current_hour)
+        _, weather_mult = dpo.get_weather_for_date(city_id, current_date)
+        fare = base_fare * surge_mult * weather_mult
+
+        total_outgoing_demand_j = 0
+        for k in nodes:
+          if graph.has_edge(j, k):
+            total_outgoing_demand_j += graph[j][k]["hourly_trips"].get(current_hour, 0)
+        wait_time_j = 60.0 / max(total_outgoing_demand_j, optimizer.lambda_floor)
+
+        transition_minutes = int(round((travel_time + wait_time_j) / 5.0)) * 5
+        if transition_minutes <= time_remaining:
+          future_value = V[time_remaining - transition_minutes].get(j, 0.0)
+          total_value = fare + optimizer.gamma * future_value
+          if total_value > best_value:
+            best_value, best_next_cluster, best_transition_time = (
+              total_value,
+              j,
+              transition_minutes,
+            )
+      V[time_remaining][i] = best_value
+      strategy[time_remaining][i] = (best_next_cluster, best_transition_time)
+
+  optimal_path = []
+  current_cluster = start_cluster
+  time_remaining = total_work_minutes
+  total_earnings = V[time_remaining][current_cluster]
+  while time_remaining > 0:
+    optimal_path.append(current_cluster)
+    next_cluster, transition_time = strategy[time_remaining][current_cluster]
+    if next_cluster is None or transition_time >= time_remaining:
+      break
+    current_cluster = next_cluster
+    time_remaining -= transition_time
+    if len(optimal_path) > work_hours * 4:
+      break
+  return total_earnings, optimal_path
+
+
+@pytest.mark.parametrize("parameters", [{}, {"gamma": 0.8, "lambda_floor": 2.0}])
+def test_solve_dp_matches_original(rides, parameters):
+  dataset = SyntheticDataset(rides, {(1, 8): 1.3, (1, 23): 1.5, (2, 9): 0.8})
+  optimizer = MobilityOptimizer(dataset=dataset, **parameters)
+  assert optimizer.step_minutes == 5
+
+  for city_id, graph in dataset.graphs.items():
+    for start_hour, work_hours in SHIFTS:
+      expected = []
+      for node in graph.nodes():
+        earnings, path = original_solve_dp(
+          optimizer, graph, city_id, node, start_hour, work_hours, SHIFT_DATE
+        )
+        assert optimizer.solve_dp(city_id, node, start_hour, work_hours, SHIFT_DATE) == (
+          earnings,
+          path,
+        )
+        expected.append((node, earnings, path))
+
+      # Ranked like the original: per-start solves, stable sort by earnings
+      expected.sort(key=lambda result: result[1], reverse=True)
+      best = optimizer.analyze_best_starting_positions(
+        city_id, start_hour, work_hours, SHIFT_DATE, top_k=3
+      )
+      assert best == expected[:3]
@@ -0,0 +1,82 @@
+"""Nightly precomputed store against live solves."""
+
+import importlib
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+from conftest import SHIFT_DATE, SyntheticDataset
+
+from app.dynamic_programming_optimizer import MobilityOptimizer
+from app.recommendation_store import RecommendationStore
+
+SURGE = {(1, 8): 1.3, (2, 23): 1.5}
+START_HOURS = [7, 22]
+DURATIONS = [3, 6]
+
+
+@pytest.fixture
+def precompute(monkeypatch):
+  """``dp_precompute.precompute``; the script imports its siblings as top-level modules."""
+  monkeypatch.syspath_prepend(str(Path(__file__).resolve().parent.parent))
+  return importlib.import_module("dp_precompute").precompute
+
+
+def shifts():
+  for city_id in (1, 2):
+    for offset in range(2):
+      for start_hour in START_HOURS:
+        for work_hours in DURATIONS:
+          yield city_id, start_hour, work_hours, SHIFT_DATE + timedelta(days=offset)
+
+
+def test_served_results_match_live_solves(rides, precompute, tmp_path):
+  store = precompute(
+    MobilityOptimizer(dataset=SyntheticDataset(rides, SURGE)),
+    [1, 2],
+    SHIFT_DATE,
+    2,
+    START_HOURS,
+    DURATIONS,
+    max_workers=2,
+  )
+  store.save(tmp_path / "recommendations")
+  loaded = RecommendationStore.load(tmp_path / "recommendations")
+  assert len(loaded) == len(store) <= 2 * 2 * len(START_HOURS) * len(DURATIONS)
+
+  dataset = SyntheticDataset(rides, SURGE)
+  dataset.recommendations = loaded
+  served = MobilityOptimizer(dataset=dataset)
+  live = MobilityOptimizer(dataset=SyntheticDataset(rides, SURGE))
+  for shift in shifts():
+    assert served.analyze_best_starting_positions(*shift, top_k=3) == (
+      live.analyze_best_starting_positions(*shift, top_k=3)
+    )
+    city_id, *schedule = shift
+    for node in dataset.graphs[city_id].nodes():
+      assert served.solve_dp(city_id, node, *schedule) == live.solve_dp(city_id, node, *schedule)
+    table, n_steps = served._solve_table(*shift)
+    expected, _ = live._solve_table(*shift)
+    assert not table.values.flags.writeable
+    for name in ("values", "next_node", "next_steps"):
+      np.testing.assert_array_equal(getattr(table, name), getattr(expected, name))
+  stats = loaded.stats()
+  assert stats["misses"] == 0
+  assert stats["hits"] > 0
+
+
+def test_changed_surge_falls_back_to_live_solves(rides, precompute):
+  dataset = SyntheticDataset(rides, SURGE)
+  dataset.recommendations = precompute(
+    MobilityOptimizer(dataset=SyntheticDataset(rides, SURGE)), [1], SHIFT_DATE, 1, [7], [3]
+  )
+  served = MobilityOptimizer(dataset=dataset)
+  dataset.update_surge(1, {9: 1.8})
+
+  updated = MobilityOptimizer(dataset=SyntheticDataset(rides, {**SURGE, (1, 9): 1.8}))
+  assert served.analyze_best_starting_positions(1, 7, 3, SHIFT_DATE) == (
+    updated.analyze_best_starting_positions(1, 7, 3, SHIFT_DATE)
+  )
+  assert dataset.recommendations.stats()["hits"] == 0
+  assert dataset.recommendations.stats()["misses"] > 0
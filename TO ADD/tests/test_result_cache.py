@@ -0,0 +1,70 @@
+"""Bounded LRU caches: limits, expiry and counters."""
+
+import numpy as np
+import pytest
+
+from app.result_cache import BoundedCache, estimate_size
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+  cache = BoundedCache("results", max_entries=2)
+  cache["a"] = 1
+  cache["b"] = 2
+  assert cache["a"] == 1  # b is now the least recently used
+  cache["c"] = 3
+  assert cache.keys() == ["a", "c"]
+  assert "b" not in cache
+  with pytest.raises(KeyError):
+    cache["b"]
+
+  stats = cache.stats()
+  assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+  assert stats["hit_rate"] == 0.5
+
+
+def test_byte_limit():
+  cache = BoundedCache("tables", max_bytes=1000, sizeof=len)
+  cache["a"] = "x" * 400
+  cache["b"] = "x" * 400
+  cache["c"] = "x" * 400
+  assert cache.keys() == ["b", "c"]
+  assert cache.stats()["bytes"] == 800
+
+  # A value over the whole budget is not cached and evicts nothing
+  cache["d"] = "x" * 1001
+  assert cache.keys() == ["b", "c"]
+  # Replacing an entry releases its old size
+  cache["b"] = "x" * 100
+  assert cache.stats()["bytes"] == 500
+  assert cache.pop("c") == "x" * 400
+  assert cache.pop("c", "gone") == "gone"
+  assert cache.stats()["bytes"] == 100
+
+
+def test_entries_expire():
+  clock = FakeClock()
+  cache = BoundedCache("results", ttl_seconds=10.0, clock=clock)
+  cache["a"] = 1
+  cache.set("b", 2, ttl_seconds=30.0)
+  clock.now = 10.0
+  assert cache.get("a") is None
+  assert cache.peek("b") == 2
+  clock.now = 30.0
+  assert "b" not in cache
+  assert cache.stats()["expirations"] == 2
+  assert len(cache) == 0
+
+
+def test_estimate_size():
+  values = np.zeros(1000)
+  assert estimate_size(values) >= values.nbytes
+  assert estimate_size((1.5, ["c1_0", "c1_1"])) > estimate_size((1.5, ["c1_0"]))
+  assert estimate_size({"table": values}) > values.nbytes
@@ -0,0 +1,160 @@
+"""Concurrent calls coalesced within a process and across workers."""
+
+import asyncio
+
+import pytest
+from conftest import SHIFT_DATE, SyntheticDataset
+
+import app.dynamic_programming_optimizer as dpo
+from app.dynamic_programming_optimizer import MobilityOptimizer
+from app.single_flight import SingleFlight, redis_single_flight
+
+
+class FakeRedis:
+  """Strings with expiry ignored, and the lock release script."""
+
+  def __init__(self):
+    self.values = {}
+
+  async def get(self, key):
+    return self.values.get(key)
+
+  async def set(self, key, value, nx=False, ex=None):
+    if nx and key in self.values:
+      return None
+    self.values[key] = value
+    return True
+
+  async def eval(self, script, n_keys, key, token):
+    if self.values.get(key) == token:
+      del self.values[key]
+      return 1
+    return 0
+
+
+def test_concurrent_calls_share_one_computation():
+  group = SingleFlight("solves")
+  calls = []
+
+  async def compute(value):
+    calls.append(value)
+    await asyncio.sleep(0.01)
+    return value
+
+  async def run():
+    first = await asyncio.gather(*(group.do("a", lambda: compute(1)) for _ in range(5)))
+    # The next call after the computation finished starts a new one
+    second = await group.do("a", lambda: compute(2))
+    return first, second
+
+  first, second = asyncio.run(run())
+  assert first == [1] * 5
+  assert second == 2
+  assert calls == [1, 2]
+  assert group.stats() == {
+    "name": "solves",
+    "in_flight": 0,
+    "leaders": 2,
+    "followers": 4,
+    "coalesced_rate": 4 / 6,
+  }
+
+
+def test_cancelled_caller_leaves_computation_running():
+  group = SingleFlight("solves")
+
+  async def compute():
+    await asyncio.sleep(0.05)
+    raise ValueError("no path")
+
+  async def run():
+    leader = asyncio.ensure_future(group.do("a", compute))
+    follower = asyncio.ensure_future(group.do("a", compute))
+    await asyncio.sleep(0)
+    leader.cancel()
+    with pytest.raises(ValueError, match="no path"):
+      await follower
+    assert leader.cancelled()
+
+  asyncio.run(run())
+
+
+def test_one_worker_computes_while_others_wait():
+  redis = FakeRedis()
+  calls = []
+
+  async def read_cached():
+    return await redis.get("dp:1")
+
+  async def compute():
+    calls.append(1)
+    await asyncio.sleep(0.05)
+    await redis.set("dp:1", "result")
+    return "result"
+
+  async def run():
+    return await asyncio.gather(
+      *(
+        redis_single_flight(redis, "dp:1", read_cached, compute, poll_interval_seconds=0.01)
+        for _ in range(3)
+      )
+    )
+
+  assert asyncio.run(run()) == ["result"] * 3
+  assert calls == [1]
+  assert "lock:dp:1" not in redis.values
+
+
+def test_waiters_compute_once_the_lock_holder_is_gone():
+  redis = FakeRedis()
+  redis.values["lock:dp:1"] = "crashed worker"
+
+  async def read_cached():
+    return None
+
+  async def compute():
+    return "result"
+
+  result = asyncio.run(
+    redis_single_flight(
+      redis,
+      "dp:1",
+      read_cached,
+      compute,
+      poll_interval_seconds=0.01,
+      wait_timeout_seconds=0.05,
+    )
+  )
+  assert result == "result"
+  assert redis.values["lock:dp:1"] == "crashed worker"
+
+
+def test_concurrent_async_solves_run_once(rides, monkeypatch):
+  class NoRedis:
+    async def get_dp_result(self, key):
+      return None
+
+    async def set_dp_result(self, key, earnings, path, ttl_seconds=None):
+      pass
+
+  monkeypatch.setattr(dpo, "_db_manager", NoRedis())
+  optimizer = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  node = next(iter(optimizer.graphs[1].nodes()))
+  solve_dp = optimizer.solve_dp
+  calls = []
+
+  def counted(*args, **kwargs):
+    calls.append(args)
+    return solve_dp(*args, **kwargs)
+
+  monkeypatch.setattr(optimizer, "solve_dp", counted)
+
+  async def run():
+    return await asyncio.gather(
+      *(optimizer.solve_dp_async(1, node, 7, 3, SHIFT_DATE) for _ in range(8))
+    )
+
+  results = asyncio.run(run())
+  assert len(calls) == 1
+  assert results == [solve_dp(1, node, 7, 3, SHIFT_DATE)] * 8
+  assert optimizer.cache_stats()["async_solves"]["followers"] == 7
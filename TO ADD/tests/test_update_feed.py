@@ -0,0 +1,125 @@
+"""Live updates shared between workers over a Redis channel."""
+
+import asyncio
+
+from conftest import SHIFT_DATE, SyntheticDataset
+
+from app import update_feed
+from app.dynamic_programming_optimizer import MobilityOptimizer
+
+
+class FakeRedis:
+  """In-process stand-in for the pub/sub calls of an async Redis client."""
+
+  def __init__(self):
+    self.queues: list[asyncio.Queue] = []
+
+  async def publish(self, channel, message):
+    for queue in self.queues:
+      queue.put_nowait({"type": "message", "channel": channel, "data": message})
+
+  def pubsub(self):
+    return FakePubSub(self)
+
+
+class FakePubSub:
+  def __init__(self, redis):
+    self.redis = redis
+    self.queue = asyncio.Queue()
+
+  async def subscribe(self, channel):
+    self.redis.queues.append(self.queue)
+    self.queue.put_nowait({"type": "subscribe", "channel": channel, "data": 1})
+
+  async def unsubscribe(self, channel):
+    self.redis.queues.remove(self.queue)
+
+  async def aclose(self):
+    pass
+
+  async def listen(self):
+    while True:
+      yield await self.queue.get()
+
+
+def as_other_worker(monkeypatch, method, kwargs):
+  """Encode an update as if another worker had published it."""
+  with monkeypatch.context() as patch:
+    patch.setattr(update_feed, "_ORIGIN", "other-worker")
+    return update_feed.encode_update(method, kwargs)
+
+
+def test_updates_round_trip_from_other_workers_only(monkeypatch):
+  reading = {
+    "city_id": 1,
+    "hexagon_id": "h1_0",
+    "surge_multiplier": 1.5,
+    "timestamp": SHIFT_DATE.replace(hour=8),
+  }
+  message = as_other_worker(monkeypatch, "record_hexagon_surge", reading)
+  assert update_feed.decode_update(message) == ("record_hexagon_surge", reading)
+  # A worker's own updates were applied before they were published
+  own = update_feed.encode_update("record_hexagon_surge", reading)
+  assert update_feed.decode_update(own) is None
+
+  trip = {
+    "city_id": 1,
+    "pickup_hex": "h1_0",
+    "drop_hex": "h1_1",
+    "start_time": SHIFT_DATE.replace(hour=9, minute=41),
+    "duration_mins": 12.5,
+    "fare_amount": 18.0,
+  }
+  message = as_other_worker(monkeypatch, "record_completed_trip", trip)
+  assert update_feed.decode_update(message) == ("record_completed_trip", trip)
+
+
+def test_listener_applies_surge_readings_of_other_workers(rides, monkeypatch):
+  receiving = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  listening = MobilityOptimizer(dataset=SyntheticDataset(rides))
+  redis = FakeRedis()
+  applied = []
+
+  def apply(method, kwargs):
+    applied.append(method)
+    if kwargs["city_id"] == 9:
+      raise ValueError("City 9 not found in graphs")
+    getattr(listening, method)(**kwargs)
+
+  async def run():
+    listener = asyncio.create_task(update_feed.listen(redis, apply))
+    await asyncio.sleep(0)
+    for city_id, hexagon_id in ((9, "h9_0"), (1, "h1_0")):
+      reading = {
+        "city_id": city_id,
+        "hexagon_id": hexagon_id,
+        "surge_multiplier": 1.8,
+        "timestamp": SHIFT_DATE.replace(hour=8),
+      }
+      if city_id == 1:
+        receiving.record_hexagon_surge(**reading)
+      await redis.publish(
+        update_feed.UPDATE_CHANNEL, as_other_worker(monkeypatch, "record_hexagon_surge", reading)
+      )
+    # The worker's own messages are skipped
+    await update_feed.publish_update(redis, "record_hexagon_surge", reading)
+    while len(applied) < 2 or not redis.queues[0].empty():
+      await asyncio.sleep(0.01)
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+
+  asyncio.run(run())
+  for optimizer in (receiving, listening):
+    for timer in optimizer.dataset._timers.values():
+      timer.cancel()
+
+  assert applied == ["record_hexagon_surge"] * 2
+  assert redis.queues == []
+  assert listening.dataset.get_surge_multiplier(1, 8) == 1.8
+  node = next(iter(listening.graphs[1].nodes()))
+  assert listening._get_scenario_key(1, 7, 3, SHIFT_DATE) == (
+    receiving._get_scenario_key(1, 7, 3, SHIFT_DATE)
+  )
+  assert listening.solve_dp(1, node, 7, 3, SHIFT_DATE) == (
+    receiving.solve_dp(1, node, 7, 3, SHIFT_DATE)
+  )
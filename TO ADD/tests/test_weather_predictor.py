@@ -0,0 +1,100 @@
+"""Weather forecast table against the per-query predictions."""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from app import weather_predictor
+from app.weather_predictor import (
+  _chain_distribution,
+  build_forecast_table,
+  build_weather_chains,
+  get_weather_for_date,
+  get_weather_multiplier,
+  predict_weather,
+  train_weather_model,
+)
+
+CYCLE = ["Clear", "Rain", "Snow"]
+
+
+def make_weather(seed: int, n_days: int = 60, gaps=()) -> pd.DataFrame:
+  """Daily weather of two cities, mostly cycling Clear, Rain, Snow; days in gaps left out.
+
+  In a cycle, a forecast two or more days ahead differs from the next-day one.
+
+  Args:
+      seed: Random seed
+      n_days: Days of history
+      gaps: Day offsets with no observation in either city
+
+  Returns:
+      Weather table with date, city_id and weather columns
+
+  """
+  rng = np.random.default_rng(seed)
+  start = pd.Timestamp("2023-01-01")
+  rows = [
+    {
+      "date": start + timedelta(days=offset),
+      "city_id": city_id,
+      "weather": CYCLE[offset % 3] if rng.random() < 0.9 else "Cloudy",
+    }
+    for city_id in (1, 2)
+    for offset in range(n_days)
+    if offset not in gaps
+  ]
+  return pd.DataFrame(rows)
+
+
+def build_table(weather_df):
+  transitions = train_weather_model(weather_df)
+  chains = build_weather_chains(weather_df, transitions)
+  forecasts, bounds = build_forecast_table(weather_df, transitions, chains, horizon_days=5)
+  return transitions, chains, forecasts, bounds
+
+
+def test_lookups_match_predict_weather(tmp_path, monkeypatch):
+  weather_df = make_weather(seed=2)
+  weather_df.to_csv(tmp_path / "weather_daily.csv", index=False)
+  cache = dict.fromkeys(weather_predictor._weather_cache)
+  monkeypatch.setattr(weather_predictor, "_weather_cache", cache)
+  weather_predictor.load_weather_data(tmp_path / "weather_daily.csv")
+  transitions = train_weather_model(weather_df)
+
+  # Every time up to the day after the history, whose forecast is still one step ahead
+  start = weather_df["date"].min()
+  targets = [
+    start + timedelta(days=offset, hours=hours) for offset in range(-3, 60) for hours in (0, 8.5)
+  ]
+  for target in [*targets, start + timedelta(days=60)]:
+    for city_id in (1, 2):
+      expected = predict_weather(city_id, target, weather_df, transitions)
+      assert get_weather_for_date(city_id, target.to_pydatetime()) == (
+        expected,
+        get_weather_multiplier(expected),
+      )
+  assert get_weather_for_date(1, start.strftime("%Y-%m-%d")) == get_weather_for_date(
+    1, start.to_pydatetime()
+  )
+
+
+def test_gap_days_take_one_step_prediction():
+  weather_df = make_weather(seed=1, gaps={10, 20, 21, 22, 35})
+  transitions, chains, forecasts, bounds = build_table(weather_df)
+
+  for city_id in (1, 2):
+    last_observed = weather_df[weather_df["city_id"] == city_id]["date"].max().date()
+    day = bounds[city_id][0]
+    while day <= last_observed + timedelta(days=1):
+      expected = predict_weather(city_id, pd.Timestamp(day), weather_df, transitions)
+      assert forecasts[(city_id, day)][0] == expected, day
+      day += timedelta(days=1)
+
+    # Past the history the forecast looks several steps ahead
+    chain = chains[city_id]
+    while day <= bounds[city_id][1]:
+      expected = chain["states"][int(np.argmax(_chain_distribution(chain, day)))]
+      assert forecasts[(city_id, day)][0] == expected
+      day += timedelta(days=1)
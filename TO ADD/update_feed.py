@@ -0,0 +1,108 @@
+"""Live optimizer updates shared between uvicorn workers over Redis pub/sub.
+
+Every worker process holds its own city dataset, but a live surge reading or
+completed trip is POSTed to one of them. The worker that receives an update applies it and
+publishes it on ``UPDATE_CHANNEL``; ``listen`` runs in every worker and
+applies the updates published by the others, so all workers price and key
+their solves the same way. An update names the ``MobilityOptimizer`` method
+that applies it and that method's keyword arguments, sent as JSON with
+datetimes as ISO strings.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+UPDATE_CHANNEL = "optimizer:updates"
+
+# Optimizer methods an update may name -> their datetime arguments
+UPDATE_METHODS: dict[str, tuple[str, ...]] = {
+  "record_hexagon_surge": ("timestamp",),
+  "record_completed_trip": ("start_time",),
+}
+
+# Tags this worker's own updates, which it applied before publishing them
+_ORIGIN = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+
+def encode_update(method: str, kwargs: dict[str, Any]) -> str:
+  """Serialize an update of this worker.
+
+  Args:
+      method: Optimizer method applying the update, one of ``UPDATE_METHODS``
+      kwargs: Keyword arguments of the method
+
+  Returns:
+      JSON message
+
+  """
+  if method not in UPDATE_METHODS:
+    raise ValueError(f"Unknown update method {method!r}")
+  kwargs = {
+    name: value.isoformat() if name in UPDATE_METHODS[method] else value
+    for name, value in kwargs.items()
+  }
+  return json.dumps({"origin": _ORIGIN, "method": method, "kwargs": kwargs})
+
+
+def decode_update(message: str | bytes) -> tuple[str, dict[str, Any]] | None:
+  """Parse an update published by another worker.
+
+  Args:
+      message: JSON message from ``encode_update``
+
+  Returns:
+      Tuple of (method, kwargs), or None for this worker's own updates and
+      unknown methods
+
+  """
+  update = json.loads(message)
+  method = update.get("method")
+  if update.get("origin") == _ORIGIN or method not in UPDATE_METHODS:
+    return None
+  kwargs = dict(update["kwargs"])
+  for name in UPDATE_METHODS[method]:
+    kwargs[name] = datetime.fromisoformat(kwargs[name])
+  return method, kwargs
+
+
+async def publish_update(redis, method: str, kwargs: dict[str, Any]) -> None:
+  """Send an update this worker has applied to the other workers.
+
+  Args:
+      redis: Async Redis client
+      method: Optimizer method applying the update
+      kwargs: Keyword arguments of the method
+
+  """
+  await redis.publish(UPDATE_CHANNEL, encode_update(method, kwargs))
+
+
+async def listen(redis, apply: Callable[[str, dict[str, Any]], Any]) -> None:
+  """Apply the updates published by other workers until cancelled.
+
+  Args:
+      redis: Async Redis client
+      apply: Blocking function applying one (method, kwargs) update; runs in
+        a thread, and its errors are reported without stopping the listener
+
+  """
+  pubsub = redis.pubsub()
+  await pubsub.subscribe(UPDATE_CHANNEL)
+  try:
+    async for message in pubsub.listen():
+      if message.get("type") != "message":
+        continue
+      try:
+        update = decode_update(message["data"])
+        if update is not None:
+          await asyncio.to_thread(apply, *update)
+      except Exception as e:
+        print(f"Warning: Failed to apply a shared optimizer update: {e}")
+  finally:
+    await pubsub.unsubscribe(UPDATE_CHANNEL)
+    await pubsub.aclose()
@@ -1,7 +1,19 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
 import pandas as pd
 
+# Days past the last observation that get an explicit forecast table entry
+FORECAST_HORIZON_DAYS = 14
+
 # Global cache for weather data
-_weather_cache = {"df": None, "transitions": None}
+_weather_cache = {
+  "df": None,
+  "transitions": None,
+  "chains": None,
+  "forecasts": None,
+  "bounds": None,
+}
 
 
 def train_weather_model(weather_df):
@@ -22,11 +34,11 @@ def train_weather_model(weather_df):
 
 def predict_weather(city_id, target_date, weather_df, transitions):
   """Predict next weather for city_id on target_date using transition probs."""
-  weather_df["date"] = pd.to_datetime(weather_df["date"])
+  dates = pd.to_datetime(weather_df["date"])
   target_date = pd.to_datetime(target_date)
 
   # Get last known weather before target date
-  recent = weather_df[(weather_df["city_id"] == city_id) & (weather_df["date"] < target_date)]
+  recent = weather_df[(weather_df["city_id"] == city_id) & (dates < target_date)]
   if recent.empty:
     # fallback to most frequent
     most_common = weather_df[weather_df["city_id"] == city_id]["weather"].mode()[0]
@@ -54,29 +66,213 @@ def get_weather_multiplier(weather_condition):
   return weather_multipliers.get(weather_condition, 1.0)
 
 
+def build_weather_chains(weather_df, transitions):
+  """Turn the per-city transition DataFrames into square NumPy Markov chains.
+
+  States are every condition observed in the city, in sorted order. States
+  never followed by another observation transition to the city's overall
+  condition frequencies, so every row is a proper distribution.
+
+  Returns:
+      Dict of city_id -> chain, where a chain holds the states, the transition
+      matrix, a cache of its powers per horizon, the overall frequencies and
+      the observed (day, state index) history.
+
+  """
+  chains = {}
+  for city, group in weather_df.groupby("city_id"):
+    group = group.sort_values("date")
+    states = sorted(group["weather"].unique())
+    frequencies = group["weather"].value_counts(normalize=True).reindex(states).to_numpy()
+
+    trans = transitions.get(city, pd.DataFrame())
+    matrix = (
+      trans.reindex(index=states, columns=states, fill_value=0.0)
+      .fillna(0.0)
+      .to_numpy(dtype=float, copy=True)
+    )
+    unseen = matrix.sum(axis=1) == 0
+    matrix[unseen] = frequencies
+
+    chains[int(city)] = {
+      "states": states,
+      "matrix": matrix,
+      "powers": {0: np.eye(len(states)), 1: matrix},
+      "frequencies": frequencies,
+      "days": pd.to_datetime(group["date"]).to_numpy(dtype="datetime64[D]"),
+      "conditions": [states.index(condition) for condition in group["weather"]],
+    }
+  return chains
+
+
+def transition_matrix_power(chain, horizon):
+  """Get P^horizon of a weather chain, cached per horizon."""
+  powers = chain["powers"]
+  if horizon not in powers:
+    if horizon - 1 in powers:
+      powers[horizon] = powers[horizon - 1] @ chain["matrix"]
+    else:
+      powers[horizon] = np.linalg.matrix_power(chain["matrix"], horizon)
+  return powers[horizon]
+
+
+def _chain_distribution(chain, day):
+  """Distribution over a chain's states for a table day, from the last prior observation."""
+  days = chain["days"]
+  day = np.datetime64(day, "D")
+  n_recent = int(np.searchsorted(days, day))
+  if n_recent == 0:
+    return chain["frequencies"]
+
+  last_state = chain["conditions"][n_recent - 1]
+  horizon = int((day - days[n_recent - 1]).astype(int))
+  return transition_matrix_power(chain, horizon)[last_state]
+
+
+def forecast_weather_distribution(city_id, target_date):
+  """Forecast the weather distribution of a city at any distance from its history.
+
+  A forecast k days past the last observation is one vector-matrix product with
+  the cached k-th power of the transition matrix.
+
+  Args:
+      city_id: City ID
+      target_date: Date string (YYYY-MM-DD) or datetime object
+
+  Returns:
+      Tuple of (probabilities, expected_multiplier), where probabilities maps
+      each weather condition to its probability
+
+  """
+  load_weather_data()
+  chain = _weather_cache["chains"][city_id]
+  distribution = _chain_distribution(chain, _forecast_day(target_date))
+
+  probabilities = dict(zip(chain["states"], distribution.tolist(), strict=True))
+  expected_multiplier = sum(
+    probability * get_weather_multiplier(condition)
+    for condition, probability in probabilities.items()
+  )
+  return probabilities, expected_multiplier
+
+
+def forecast_weather_range(city_id, start_date, n_days):
+  """Forecast consecutive days, e.g. a week ahead, with the cached matrix powers.
+
+  Returns:
+      List of (probabilities, expected_multiplier), one per day from start_date
+
+  """
+  start_date = pd.Timestamp(start_date).to_pydatetime()
+  return [
+    forecast_weather_distribution(city_id, start_date + timedelta(days=offset))
+    for offset in range(n_days)
+  ]
+
+
+def build_forecast_table(weather_df, transitions, chains, horizon_days=FORECAST_HORIZON_DAYS):
+  """Precompute the forecast of every city and day, as predict_weather would give it.
+
+  Covers each city's observed history plus horizon_days past its last
+  observation. Days within the history, gap days included, take the one-step
+  prediction from the last prior observation, as predict_weather does. Days
+  after the first one past the history take the most probable condition of
+  the multi-step Markov forecast, which converges to the chain's long-run
+  distribution, so later days share the last entry.
+
+  Returns:
+      Tuple of (forecasts, bounds): forecasts maps (city_id, date) to
+      (weather_condition, weather_multiplier), bounds maps city_id to the
+      (first, last) date of its table.
+
+  """
+  forecasts = {}
+  bounds = {}
+
+  for city, group in weather_df.groupby("city_id"):
+    city_id = int(city)
+    group = group.sort_values("date")
+    days = pd.to_datetime(group["date"]).dt.date.tolist()
+    conditions = group["weather"].tolist()
+    fallback = group["weather"].mode()[0]
+    city_transitions = transitions.get(city)
+
+    first_day = days[0]
+    last_day = days[-1] + timedelta(days=1 + horizon_days)
+    day = first_day
+    n_recent = 0
+    while day <= last_day:
+      # Observations strictly before this day
+      while n_recent < len(days) and days[n_recent] < day:
+        n_recent += 1
+
+      if n_recent == 0:
+        prediction = fallback
+      elif n_recent == len(days) and (day - days[-1]).days > 1:
+        chain = chains[city_id]
+        prediction = chain["states"][int(np.argmax(_chain_distribution(chain, day)))]
+      else:
+        last_weather = conditions[n_recent - 1]
+        if city_transitions is not None and last_weather in city_transitions.index:
+          prediction = city_transitions.loc[last_weather].idxmax()
+        else:
+          prediction = pd.Series(conditions[:n_recent]).mode()[0]
+
+      forecasts[(city_id, day)] = (prediction, get_weather_multiplier(prediction))
+      day += timedelta(days=1)
+
+    bounds[city_id] = (first_day, last_day)
+
+  return forecasts, bounds
+
+
 def load_weather_data(csv_path="data/weather_daily.csv"):
-  """Load weather data and train transition model.
+  """Load weather data, train transition model and build the forecast table.
 
-  OPTIMIZED: Caches data in memory to avoid repeated CSV reads.
+  OPTIMIZED: Caches data in memory to avoid repeated CSV reads. The cached
+  DataFrame is never modified after loading.
   """
   # Check cache first
   if _weather_cache["df"] is not None and _weather_cache["transitions"] is not None:
     return _weather_cache["df"], _weather_cache["transitions"]
 
   # Load and cache
-  weather_df = pd.read_csv(csv_path)
+  weather_df = pd.read_csv(csv_path, parse_dates=["date"])
   transitions = train_weather_model(weather_df)
+  chains = build_weather_chains(weather_df, transitions)
+  forecasts, bounds = build_forecast_table(weather_df, transitions, chains)
 
   _weather_cache["df"] = weather_df
   _weather_cache["transitions"] = transitions
+  _weather_cache["chains"] = chains
+  _weather_cache["forecasts"] = forecasts
+  _weather_cache["bounds"] = bounds
 
   return weather_df, transitions
 
 
+def _forecast_day(target_date):
+  """Map a target time to the table day sharing its forecast.
+
+  A forecast uses the daily observations strictly before the target, so any
+  time after midnight of day d sees the same data as midnight of d + 1.
+  """
+  if isinstance(target_date, str):
+    target_date = pd.Timestamp(target_date).to_pydatetime()
+  if isinstance(target_date, datetime):
+    day = target_date.date()
+    if target_date.time() != datetime.min.time():
+      day += timedelta(days=1)
+    return day
+  if isinstance(target_date, date):
+    return target_date
+  return _forecast_day(pd.Timestamp(target_date).to_pydatetime())
+
+
 def get_weather_for_date(city_id, date):
   """Get weather prediction and multiplier for a city on a specific date.
 
-  OPTIMIZED: Uses cached weather data.
+  OPTIMIZED: Constant-time lookup in the precomputed forecast table.
 
   Args:
       city_id: City ID
@@ -86,7 +282,7 @@ def get_weather_for_date(city_id, date):
       Tuple of (weather_condition, weather_multiplier)
 
   """
-  weather_df, transitions = load_weather_data()
-  pred = predict_weather(city_id, date, weather_df, transitions)
-  multiplier = get_weather_multiplier(pred)
-  return pred, multiplier
+  load_weather_data()
+  first_day, last_day = _weather_cache["bounds"][city_id]
+  day = min(max(_forecast_day(date), first_day), last_day)
+  return _weather_cache["forecasts"][(city_id, day)]